@@ -9,11 +9,14 @@ if _root not in sys.path:
 os.chdir(_root)
 
 from src.agent import generate_search_queries
-from src.search import search_web
-from src.scraper import fetch_and_clean
-from src.chunker import chunk_pages
-from src.vector_store import embed_and_store, retrieve_relevant_chunks
+from src.search import search_web, merge_result_sets
+from src.pipeline import stream_pages_to_store
+from src.speculation import SpeculativeFetch, ENABLED as SPECULATE
+from src import page_cache
+from src.dedup import NearDuplicateFilter
+from src.vector_store import retrieve_relevant_chunks, RETRIEVAL_MODE
 from src.synthesizer import synthesize_report
+from src import resources, llm, report_cache
 
 st.set_page_config(
     page_title="Synapse AI Research",
@@ -22,9 +25,17 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Streamlit reruns this script per interaction; cache_resource makes the
+# model warm-up start once per server process, shared by every session.
+@st.cache_resource(show_spinner=False)
+def _start_warm_up():
+    return resources.warm_up_in_background()
+
+_start_warm_up()
+
 for k, v in {
     "history": [], "viewing": None,
-    "deep_mode": False, "show_think": True,
+    "deep_mode": False, "show_think": True, "compress": False,
     "show_map": False, "run_query": "",
 }.items():
     if k not in st.session_state:
@@ -178,29 +189,8 @@ st.markdown(CSS, unsafe_allow_html=True)
 _MINDMAP_TEMPLATE = "<!DOCTYPE html><html><head><style>* {box-sizing:border-box;margin:0;padding:0;}body {background:#1c1d26;font-family:'Space Grotesk','Segoe UI',sans-serif;overflow:hidden;}#wrap {width:100%;height:480px;position:relative;}svg {position:absolute;top:0;left:0;width:100%;height:100%;pointer-events:none;overflow:visible;}.nd {position:absolute;display:flex;align-items:center;gap:8px;transform:translate(-50%,-50%);}.box {background:#272a38;border:1px solid #353848;border-radius:10px;padding:10px 16px;font-size:13px;font-weight:500;color:#dde2f0;white-space:nowrap;max-width:175px;overflow:hidden;text-overflow:ellipsis;transition:all 0.2s;cursor:default;}.box.root {background:#1e1a3d;border:1.5px solid #4a3fa0;font-size:14px;font-weight:600;color:#e8e4ff;padding:13px 22px;max-width:210px;white-space:normal;text-align:center;line-height:1.4;border-radius:12px;}.box:not(.root):hover {background:#2e3148;border-color:#6060a0;}.btn {width:28px;height:28px;border-radius:50%;background:#1e1e30;border:1px solid #353848;color:#7070a8;font-size:16px;display:flex;align-items:center;justify-content:center;cursor:pointer;flex-shrink:0;transition:all 0.2s;user-select:none;}.btn:hover {background:#4a3fa0;border-color:#7c6af7;color:#fff;transform:scale(1.15);box-shadow:0 0 14px rgba(124,106,247,0.5);}.tip {position:fixed;background:rgba(10,10,22,0.97);border:1px solid #2a2d50;color:#c8cae8;padding:8px 12px;border-radius:10px;font-size:11px;pointer-events:none;display:none;z-index:999;max-width:200px;line-height:1.7;box-shadow:0 8px 30px rgba(0,0,0,0.5);}.tip b {color:#a78bfa;display:block;margin-bottom:3px;}.info {position:absolute;top:10px;left:12px;font-size:11px;color:#3a3a60;letter-spacing:0.05em;}.hint {position:absolute;bottom:10px;right:12px;font-size:10px;color:#3a3a58;letter-spacing:0.07em;text-transform:uppercase;}</style></head><body><div id='wrap'><svg id='svg'></svg><div class='info'>subtopic map</div><div class='hint'>click &rsaquo; to deep-search</div></div><div class='tip' id='tip'></div><script>const DATA=__NODES__;const ROOT=__ROOT__;const wrap=document.getElementById('wrap');const svgEl=document.getElementById('svg');const tip=document.getElementById('tip');function drawPath(x1,y1,x2,y2,col){  const p=document.createElementNS('http://www.w3.org/2000/svg','path');  const cx=(x1+x2)/2;  p.setAttribute('d','M'+x1+','+y1+' C'+cx+','+y1+' '+cx+','+y2+' '+x2+','+y2);  p.setAttribute('stroke',col);p.setAttribute('stroke-width','1.5');  p.setAttribute('fill','none');p.setAttribute('opacity','0.45');  svgEl.appendChild(p);}function makeNode(label,isRoot,children,hue){  const w=document.createElement('div');w.className='nd';  const box=document.createElement('div');box.className=isRoot?'box root':'box';  box.textContent=label;w.appendChild(box);  if(!isRoot){    const btn=document.createElement('div');btn.className='btn';    btn.innerHTML='&rsaquo;';    btn.addEventListener('click',()=>{      const u=new URL(window.parent.location.href);      u.searchParams.set('mc',label);      window.parent.location.href=u.toString();});    w.appendChild(btn);    box.addEventListener('mouseenter',e=>{      tip.style.display='block';      tip.innerHTML='<b>'+label+'</b>'+children.map(c=>'&bull; '+c).join('<br>');});    box.addEventListener('mousemove',e=>{      tip.style.left=(e.clientX+14)+'px';tip.style.top=(e.clientY-10)+'px';});    box.addEventListener('mouseleave',()=>{tip.style.display='none';});}  return w;}function layout(){  wrap.querySelectorAll('.nd').forEach(n=>n.remove());svgEl.innerHTML='';  svgEl.setAttribute('viewBox','0 0 '+wrap.offsetWidth+' '+wrap.offsetHeight);  const W=wrap.offsetWidth,H=wrap.offsetHeight,N=DATA.length;  const rx=W*0.22,ry=H*0.5,bx=W*0.62;  const hues=[255,275,240,290,225,265];  const rEl=makeNode(ROOT,true,[],260);  rEl.style.left=rx+'px';rEl.style.top=ry+'px';wrap.appendChild(rEl);  DATA.forEach((s,i)=>{    const t=N<=1?0.5:i/(N-1);    const by=H*0.08+t*H*0.84;    const hue=hues[i%hues.length];    const col='hsl('+hue+',60%,58%)';    drawPath(rx,ry,bx,by,col);    const el=makeNode(s.label,false,s.children,hue);    el.style.left=bx+'px';el.style.top=by+'px';wrap.appendChild(el);});}window.addEventListener('resize',layout);layout();</script></body></html>"
 
 def generate_subtopics(query):
-    from langchain_groq import ChatGroq
-    from langchain_core.messages import HumanMessage, SystemMessage
-    from dotenv import load_dotenv
-    load_dotenv()
-    llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=os.getenv("GROQ_API_KEY"), temperature=0.4, max_tokens=600)
-    system_msg = (
-        "You are a knowledge graph designer. Given a topic, output exactly 6 subtopics "
-        "that EXTEND the subject beyond a basic overview. "
-        "Cover: history, core mechanisms, real-world applications, controversies/challenges, "
-        "future directions, and comparisons with alternatives. "
-        "Return ONLY valid JSON array, nothing else, no markdown: "
-        '[{"label":"Name up to 4 words","children":["child1 up to 4 words","child2","child3"]}] '
-        "Exactly 6 objects. Exactly 3 children each."
-    )
     try:
-        import re
-        resp = llm.invoke([SystemMessage(content=system_msg), HumanMessage(content=f"Topic: {query}")])
-        text = resp.content.strip()
-        m = re.search(r"\[.*?\]", text, re.DOTALL)
-        if m:
-            data = json.loads(m.group())
-            if isinstance(data, list) and len(data) >= 4:
-                return data[:6]
+        return _llm_subtopics(query)
     except Exception as e:
         print(f"subtopics error: {e}")
     return [
@@ -212,6 +202,27 @@ def generate_subtopics(query):
         {"label": "Comparisons",              "children": ["vs alternatives", "Pros and cons", "Expert opinions"]},
     ]
 
+# One Groq call per topic, shared across reruns and sessions. Failures raise,
+# and st.cache_data doesn't store exceptions, so they are retried next time.
+@st.cache_data(max_entries=128, show_spinner=False)
+def _llm_subtopics(query):
+    from langchain_core.messages import HumanMessage, SystemMessage
+    system_msg = (
+        "You are a knowledge graph designer. Given a topic, output exactly 6 subtopics "
+        "that EXTEND the subject beyond a basic overview. "
+        "Cover: history, core mechanisms, real-world applications, controversies/challenges, "
+        "future directions, and comparisons with alternatives. "
+        "Return ONLY valid JSON array, nothing else, no markdown: "
+        '[{"label":"Name up to 4 words","children":["child1 up to 4 words","child2","child3"]}] '
+        "Exactly 6 objects. Exactly 3 children each."
+    )
+    resp = llm.invoke("subtopics", [SystemMessage(content=system_msg), HumanMessage(content=f"Topic: {query}")])
+    m = re.search(r"\[.*?\]", resp.content.strip(), re.DOTALL)
+    data = json.loads(m.group()) if m else None
+    if not isinstance(data, list) or len(data) < 4:
+        raise ValueError("unexpected subtopics format")
+    return data[:6]
+
 def render_mindmap(query, report):
     """Horizontal tree mind map. Subtopics are LLM-generated extensions of the topic."""
     subtopics = generate_subtopics(query)
@@ -258,6 +269,7 @@ def render_images(query):
     html += '</div>'
     st.markdown(html, unsafe_allow_html=True)
 
+@st.cache_data(max_entries=16, show_spinner=False)
 def make_pdf(query, report, stats, thinking):
     from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -290,6 +302,7 @@ def make_pdf(query, report, stats, thinking):
     return buf.getvalue()
 
 
+@st.cache_data(max_entries=64, show_spinner=False)
 def make_share_link(entry):
     shareable = {k: entry[k] for k in ("query","report","stats","thinking","ts") if k in entry}
     raw = json.dumps(shareable).encode()
@@ -302,40 +315,62 @@ def make_share_link(entry):
         return f"?share={encoded}"
 
 
-def run_pipeline(query, deep=False):
+def run_pipeline(query, deep=False, compress=False):
     start = time.time()
     log, think = [], {}
     box = st.empty()
     bar = st.progress(0)
     def tick(msg, pct): box.info(f"> {msg}"); bar.progress(pct)
+    n, top_k = (5, 12) if deep else (4, 8)
+    # Same keys as the API's, so the two front ends share cached reports
+    params = {"retrieval_mode": RETRIEVAL_MODE, "top_k_chunks": top_k,
+              "results_per_query": n, "compress_prompt": compress}
+    tick("cache - looking for an earlier report ...", 4)
+    hit = report_cache.lookup(query, deep, params)
+    if hit:
+        elapsed = round(time.time()-start, 1)
+        think["cache_hit"] = f"{hit['similarity']} similar to \"{hit['cached_query']}\""
+        think["queries_planned"] = hit.get("search_queries", [])
+        think["total_time"] = f"{elapsed}s"
+        log.append(("cache", f"hit, similarity {hit['similarity']}"))
+        bar.progress(100); box.success(f"Served from cache in {elapsed}s")
+        stats = {"elapsed": elapsed, "sources": hit.get("sources_found"), "ok": hit.get("pages_extracted"), "chunks": hit.get("chunks_created")}
+        return hit["report"], log, think, hit.get("search_queries", []), stats
+
+    # The raw query is searched and fetched while the agent is still planning
+    speculative = SpeculativeFetch(query, results_per_query=n) if SPECULATE else None
     try:
         tick("agent - planning queries ...", 8)
         queries = generate_search_queries(query)
         think["queries_planned"] = queries
         log.append(("agent", f"{len(queries)} queries"))
 
-        n = 5 if deep else 4
         tick(f"search - {len(queries)} queries x {n} ...", 22)
         results = search_web(queries, results_per_query=n)
+        if speculative is not None:
+            results = merge_result_sets(speculative.results(), results)
         think["sources_found"] = len(results)
         if not results: box.error("No results. Check API key."); return None, log, think, queries, {}
         log.append(("search", f"{len(results)} URLs"))
 
         tick(f"scraper - fetching {len(results)} pages ...", 40)
-        pages = fetch_and_clean(results)
+        def on_page(page, done, n_chunks):
+            pct = 40 + int(30 * done / max(len(results), 1))
+            tick(f"scraper + rag - {done}/{len(results)} pages, {n_chunks} chunks embedded ...", pct)
+        dedup = NearDuplicateFilter()
+        pages, chunks, store = stream_pages_to_store(results, on_page=on_page, dedup=dedup, speculative=speculative)
         ok = sum(1 for p in pages if p["status"] == "success")
         think["pages_extracted"] = f"{ok}/{len(pages)}"
-        log.append(("scraper", f"{ok}/{len(pages)} OK"))
+        hits, misses = page_cache.summarize(pages)
+        think["page_cache"] = f"{hits} hit / {misses} miss"
+        log.append(("scraper", f"{ok}/{len(pages)} OK, cache {hits}/{hits + misses}"))
 
-        tick("chunker - splitting ...", 56)
-        chunks = chunk_pages(pages)
         think["chunks_created"] = len(chunks)
+        think["duplicates_removed"] = f"{dedup.pages_removed} pages / {dedup.chunks_removed} chunks"
         log.append(("chunker", f"{len(chunks)} chunks"))
         if not chunks: box.warning("No usable content."); return None, log, think, queries, {}
 
-        top_k = 12 if deep else 8
-        tick(f"rag - embedding {len(chunks)} chunks, top {top_k} ...", 70)
-        store = embed_and_store(chunks)
+        tick(f"rag - retrieving top {top_k} of {len(chunks)} chunks ({RETRIEVAL_MODE}) ...", 72)
         relevant = retrieve_relevant_chunks(store, query, top_k=top_k)
         avg = round(sum(c["relevance_score"] for c in relevant) / max(len(relevant),1), 3)
         think["rag_avg_score"] = avg
@@ -343,16 +378,28 @@ def run_pipeline(query, deep=False):
         log.append(("rag", f"{len(relevant)} chunks, avg {avg}"))
 
         tick("llm - synthesizing report ...", 86)
-        report = synthesize_report(query, relevant, deep_mode=deep)
+        synth_stats = {}
+        report = synthesize_report(query, relevant, deep_mode=deep, stream_container=st.container(),
+                                   compress=compress, stats=synth_stats)
+        if synth_stats:
+            think["compression_ratio"] = f"{synth_stats['compression_ratio']}x ({synth_stats['original_tokens']} → {synth_stats['compressed_tokens']} tokens)"
 
         elapsed = round(time.time()-start, 1)
         think["total_time"] = f"{elapsed}s"
         log.append(("done", f"{elapsed}s"))
         bar.progress(100); box.success(f"Done in {elapsed}s")
+        report_cache.store(query, deep, {
+            "query": query, "report": report, "search_queries": queries,
+            "sources_found": len(results), "pages_extracted": ok, "chunks_created": len(chunks),
+            "duplicates_removed": dedup.removed, "compression_ratio": synth_stats.get("compression_ratio"),
+            "elapsed_seconds": elapsed, "deep_mode": deep,
+        }, params)
 
         return report, log, think, queries, {"elapsed": elapsed, "sources": len(results), "ok": ok, "chunks": len(chunks)}
     except EnvironmentError as e: box.error(str(e)); return None, log, think, None, {}
     except Exception as e: box.error(str(e)); st.exception(e); return None, log, think, None, {}
+    finally:
+        if speculative is not None: speculative.cancel()
 
 
 def render_entry(entry):
@@ -378,19 +425,12 @@ def render_entry(entry):
     render_images(q)
 
     st.markdown('<div class="sdiv"><div class="sdiv-line"></div><div class="sdiv-lbl">report</div><div class="sdiv-line"></div></div>', unsafe_allow_html=True)
-    rph = st.empty()
-    words = report.split()
-    streamed = ""
-    for i, w in enumerate(words):
-        streamed += w + " "
-        if i % 15 == 0 or i == len(words)-1:
-            rph.markdown(streamed)
-    rph.markdown(report)
+    st.markdown(report)
 
     if st.session_state.show_think and think:
         st.markdown('<div class="sdiv"><div class="sdiv-line"></div><div class="sdiv-lbl">ai thinking</div><div class="sdiv-line"></div></div>', unsafe_allow_html=True)
-        icons = {"queries_planned":"brain","sources_found":"search","pages_extracted":"page","chunks_created":"cut","rag_avg_score":"diamond","chunks_used":"box","total_time":"clock"}
-        emoji_map = {"brain":"🧠","search":"🔍","page":"📄","cut":"✂️","diamond":"◈","box":"📦","clock":"⏱"}
+        icons = {"cache_hit":"disk","queries_planned":"brain","sources_found":"search","pages_extracted":"page","page_cache":"disk","chunks_created":"cut","duplicates_removed":"cut","rag_avg_score":"diamond","chunks_used":"box","compression_ratio":"cut","total_time":"clock"}
+        emoji_map = {"brain":"🧠","search":"🔍","page":"📄","cut":"✂️","diamond":"◈","box":"📦","clock":"⏱","disk":"💾"}
         for k, v in think.items():
             icon = emoji_map.get(icons.get(k,"diamond"), "◈")
             label = k.replace("_"," ").title()
@@ -414,11 +454,18 @@ def render_entry(entry):
     with c1:
         st.download_button("Download MD", data=f"# {q}\n\n---\n\n{report}", file_name=f"synapse_{q[:20].replace(' ','_').lower()}.md", mime="text/markdown", key=f"md_{abs(hash(q))%99999}")
     with c2:
-        try:
-            pdf_bytes = make_pdf(q, report, s, think)
-            st.download_button("Download PDF", data=pdf_bytes, file_name=f"synapse_{q[:20].replace(' ','_').lower()}.pdf", mime="application/pdf", key=f"pdf_{abs(hash(q))%99999}")
-        except Exception as e:
-            st.caption(f"PDF: {e}")
+        # The PDF is only rendered once asked for; make_pdf caches it after that
+        pdf_flag = f"pdf_ready_{abs(hash(q))%99999}"
+        if not st.session_state.get(pdf_flag):
+            if st.button("Prepare PDF", key=f"pdfprep_{abs(hash(q))%99999}"):
+                st.session_state[pdf_flag] = True
+                st.rerun()
+        else:
+            try:
+                pdf_bytes = make_pdf(q, report, s, think)
+                st.download_button("Download PDF", data=pdf_bytes, file_name=f"synapse_{q[:20].replace(' ','_').lower()}.pdf", mime="application/pdf", key=f"pdf_{abs(hash(q))%99999}")
+            except Exception as e:
+                st.caption(f"PDF: {e}")
     with c3:
         share = make_share_link(entry)
         st.markdown('<div class="share-box">', unsafe_allow_html=True)
@@ -447,6 +494,7 @@ def main():
         st.session_state.deep_mode  = st.toggle("Deep Research", value=st.session_state.deep_mode)
         st.session_state.show_think = st.toggle("AI Thinking", value=st.session_state.show_think)
         st.session_state.show_map   = st.toggle("Mind Map", value=st.session_state.show_map)
+        st.session_state.compress   = st.toggle("Compress Prompt", value=st.session_state.compress)
 
         st.markdown('<div class="sb-section">// recent</div>', unsafe_allow_html=True)
         history = st.session_state.history
@@ -499,7 +547,7 @@ def main():
 
     if query_to_run:
         st.markdown("<hr>", unsafe_allow_html=True)
-        report, log, think, queries, stats = run_pipeline(query_to_run, st.session_state.deep_mode)
+        report, log, think, queries, stats = run_pipeline(query_to_run, st.session_state.deep_mode, st.session_state.compress)
         if report and stats:
             entry = {
                 "query": query_to_run, "report": report, "log": log,
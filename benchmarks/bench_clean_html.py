@@ -0,0 +1,133 @@
+"""
+bench_clean_html.py — Parity check + throughput benchmark for _clean_html
+---------------------------------------------------------------------------
+1. Runs the single-pass lxml cleaner and the original BeautifulSoup cleaner
+   on every page in benchmarks/fixtures/ plus generated deeply nested /
+   unclosed-tag pages, and reports any output mismatch.
+2. Times both engines on the fixtures and on synthetic large news pages,
+   printing pages/sec before (bs4) and after (lxml).
+
+Run from the repo root:
+    python benchmarks/bench_clean_html.py [--repeat N] [--large-pages N]
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+
+from src.scraper import _clean_html, _clean_html_bs4
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures() -> dict[str, str]:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def make_large_news_page(n_paragraphs: int = 400, seed: int = 0) -> str:
+    """A big, noisy news page: nav, share bars, ads and comments around long paragraphs."""
+    sentence = (
+        "Researchers reported new results on fusion energy, gene editing and climate models "
+        "in a study published this week, citing data from several independent laboratories. "
+    )
+    parts = [
+        "<html><head><title>Big news page</title>",
+        "<script>" + "var x = 1;" * 500 + "</script><style>" + ".a{color:red}" * 500 + "</style>",
+        "</head><body>",
+        "<nav class='site-nav'>" + "<a href='#'>Link</a>" * 200 + "</nav>",
+        "<div class='layout'><main><article>",
+    ]
+    for i in range(n_paragraphs):
+        parts.append(f"<div class='block block-{(i + seed) % 7}'><p>{sentence * 3}<a href='#'>more</a> <em>{i}</em></p></div>")
+        if i % 10 == 0:
+            parts.append("<div class='social-share'><a>Share</a><a>Tweet</a></div>")
+        if i % 25 == 0:
+            parts.append("<div class='promo advertisement'><p>" + sentence + "</p></div>")
+    parts.append("</article></main>")
+    parts.append("<aside class='sidebar'>" + "<p>Most read story headline goes here today.</p>" * 50 + "</aside>")
+    parts.append("<section class='comments'>" + "<div class='comment'><p>" + sentence + "</p></div>" * 200 + "</section>")
+    parts.append("</div><footer>" + "<p>Footer text</p>" * 20 + "</footer></body></html>")
+    return "".join(parts)
+
+
+def make_deep_pages() -> dict[str, str]:
+    """Pathological nesting: libxml2 drops trees past its depth limit unless handled."""
+    sentence = "Deeply nested pages still carry real article text that must not be lost. "
+    pages = {}
+    for depth in (300, 3000):
+        pages[f"deep_div_{depth}"] = (
+            "<html><body>" + "<div>" * depth + f"<p>{sentence * 4}</p>" + "</div>" * depth + "</body></html>"
+        )
+        pages[f"unclosed_font_{depth}"] = (
+            "<html><body><p>" + "<font>" * depth + sentence * 4 + "</p></body></html>"
+        )
+    return pages
+
+
+def check_parity(pages: dict[str, str]) -> int:
+    mismatches = 0
+    for name, html in pages.items():
+        new, old = _clean_html(html), _clean_html_bs4(html)
+        if new == old:
+            print(f"  ok        {name:<22} {len(new):>5} chars")
+        else:
+            mismatches += 1
+            at = next((i for i, (a, b) in enumerate(zip(new, old)) if a != b), min(len(new), len(old)))
+            print(f"  MISMATCH  {name:<22} lxml={len(new)} bs4={len(old)} first diff @ {at}")
+            print(f"            lxml: ...{new[max(0, at - 40):at + 40]!r}")
+            print(f"            bs4:  ...{old[max(0, at - 40):at + 40]!r}")
+    return mismatches
+
+
+def pages_per_sec(fn, pages: list[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            fn(html)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="passes over each corpus")
+    parser.add_argument("--large-pages", type=int, default=5, help="synthetic large pages to generate")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    print(f"Parity on {len(fixtures)} fixture pages:")
+    mismatches = check_parity(fixtures)
+
+    deep = make_deep_pages()
+    print(f"\nParity on {len(deep)} deeply nested / unclosed-tag pages:")
+    mismatches += check_parity(deep)
+
+    large = [make_large_news_page(seed=i) for i in range(args.large_pages)]
+    large_kb = sum(len(p) for p in large) / len(large) / 1024
+    print(f"\nParity on {len(large)} synthetic large pages (~{large_kb:.0f} KB each):")
+    mismatches += check_parity({f"large_{i}": p for i, p in enumerate(large)})
+
+    print("\nThroughput (pages/sec):")
+    print(f"  {'corpus':<18} {'bs4 (before)':>14} {'lxml (after)':>14} {'speedup':>9}")
+    for label, corpus, repeat in (
+        ("fixtures", list(fixtures.values()), args.repeat),
+        ("large news pages", large, max(1, args.repeat // 5)),
+    ):
+        before = pages_per_sec(_clean_html_bs4, corpus, repeat)
+        after = pages_per_sec(_clean_html, corpus, repeat)
+        print(f"  {label:<18} {before:>14.1f} {after:>14.1f} {after / before:>8.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,62 @@
-import os, ast, re
-from dotenv import load_dotenv
-load_dotenv()
+import ast, re
 
-def generate_search_queries(user_query: str) -> list[str]:
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GROQ_API_KEY is not set.")
-
-    # Set env var so ChatGroq picks it up automatically — works on all versions
-    os.environ["GROQ_API_KEY"] = api_key
+from src import llm
 
-    from langchain_groq import ChatGroq
-    from langchain_core.messages import HumanMessage, SystemMessage
+SYSTEM_PROMPT = (
+    "You are a research query optimizer. Given a user's question, generate exactly 3 distinct "
+    "search queries targeting different angles. "
+    "Return ONLY a Python list of 3 strings, nothing else.\n"
+    'Example: ["CRISPR mechanism", "CRISPR clinical trials 2024", "CRISPR ethical risks"]'
+)
 
-    llm = ChatGroq(
-        model="llama-3.3-70b-versatile",
-        temperature=0.3,
-        max_tokens=256,
-    )
+def generate_search_queries(user_query: str) -> list[str]:
+    messages = _messages(user_query)
+    try:
+        response = llm.invoke("planner", messages)
+        queries = _parse_queries(response.content)
+        if queries:
+            return queries
+    except EnvironmentError:
+        raise
+    except Exception as e:
+        print(f"[agent.py] error: {e}")
 
-    system_prompt = (
-        "You are a research query optimizer. Given a user's question, generate exactly 3 distinct "
-        "search queries targeting different angles. "
-        "Return ONLY a Python list of 3 strings, nothing else.\n"
-        'Example: ["CRISPR mechanism", "CRISPR clinical trials 2024", "CRISPR ethical risks"]'
-    )
+    return _fallback_queries(user_query)
 
+async def generate_search_queries_async(user_query: str) -> list[str]:
+    """Same as generate_search_queries() but awaits the LLM instead of blocking a thread."""
+    messages = _messages(user_query)
     try:
-        response = llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"Generate 3 search queries for: {user_query}"),
-        ])
-        content = response.content.strip()
-        match = re.search(r"\[.*?\]", content, re.DOTALL)
-        if match:
-            queries = ast.literal_eval(match.group())
-            if isinstance(queries, list) and len(queries) >= 3:
-                return [str(q).strip() for q in queries[:3]]
+        response = await llm.ainvoke("planner", messages)
+        queries = _parse_queries(response.content)
+        if queries:
+            return queries
     except EnvironmentError:
         raise
     except Exception as e:
         print(f"[agent.py] error: {e}")
 
+    return _fallback_queries(user_query)
+
+def _messages(user_query: str):
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=f"Generate 3 search queries for: {user_query}"),
+    ]
+
+def _parse_queries(content: str) -> list[str] | None:
+    match = re.search(r"\[.*?\]", content.strip(), re.DOTALL)
+    if match:
+        queries = ast.literal_eval(match.group())
+        if isinstance(queries, list) and len(queries) >= 3:
+            return [str(q).strip() for q in queries[:3]]
+    return None
+
+def _fallback_queries(user_query: str) -> list[str]:
     return [
         user_query,
         f"{user_query} latest research 2024",
         f"{user_query} explained overview",
-    ]
\ No newline at end of file
+    ]
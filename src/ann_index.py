@@ -0,0 +1,312 @@
+"""
+ann_index.py — Pure-NumPy approximate nearest-neighbour search
+----------------------------------------------------------------
+For the ~100 chunks of a normal run, exact cosine search is instant. For
+accumulated or bulk-ingested corpora with hundreds of thousands of chunks
+it is not, so vector_store.py switches to an IVF-PQ index above a size
+threshold:
+
+  IVF  — k-means splits the vectors into `nlist` cells; a query only scans
+         the `nprobe` cells whose centroids score highest
+  PQ   — each vector's residual (vector − its centroid) is split into `m`
+         sub-vectors and each one is stored as a 1-byte codebook id, so a
+         384-dim float32 vector (1536 B) becomes 48 bytes
+  ADC  — per query, a (m × 256) lookup table of sub-vector scores turns
+         scoring a candidate into m table lookups
+  Rerank — the best `k × rerank_factor` candidates are optionally rescored
+         exactly against the full vectors
+
+Scores are inner products, so vectors should be L2-normalised (cosine).
+Knobs: larger nprobe → higher recall, slower; larger rerank_factor →
+higher precision at the top, slightly slower.
+"""
+
+import json
+import numpy as np
+
+
+# ─── Exact search ─────────────────────────────────────────────────────────────
+
+def exact_search(matrix: np.ndarray, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force inner-product top-k for a batch of queries.
+
+    Returns:
+        (scores, ids), each of shape (n_queries, k), best first
+    """
+    return top_k(np.atleast_2d(queries) @ matrix.T, k)
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a (n_queries, n_docs) score matrix.
+    Uses argpartition (O(n)) and only sorts the k winners.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.zeros((len(scores), 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+# ─── IVF-PQ index ─────────────────────────────────────────────────────────────
+
+class IVFPQIndex:
+    """Inverted-file index with product-quantised residuals (inner-product metric)."""
+
+    def __init__(self, nlist: int | None = None, m: int | None = None, nbits: int = 8,
+                 nprobe: int = 16, rerank_factor: int = 4, train_size: int = 30_000,
+                 n_iter: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.m = m
+        self.ksub = 2 ** nbits
+        self.nprobe = nprobe
+        self.rerank_factor = rerank_factor
+        self.train_size = train_size
+        self.n_iter = n_iter
+        self.seed = seed
+
+        self.dim = 0
+        self.ntotal = 0
+        self.centroids = None     # (nlist, dim)
+        self.codebooks = None     # (m, ksub, dsub)
+        self.codes = None         # (ntotal, m) uint8, grouped by cell
+        self.ids = None           # (ntotal,) original row id for each code row
+        self.list_ptr = None      # (nlist + 1,) cell boundaries into codes/ids
+
+    # ─── Build ───────────────────────────────────────────────────────────────
+
+    def build(self, vectors: np.ndarray) -> "IVFPQIndex":
+        """Train cells and codebooks on `vectors` and index them as ids 0..n-1."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n, self.dim = vectors.shape
+        rng = np.random.default_rng(self.seed)
+
+        self.nlist = self.nlist or int(np.clip(4 * np.sqrt(n), 1, 4096))
+        self.nlist = min(self.nlist, n)
+        if self.m is None:
+            self.m = next((m for m in (self.dim // 8, 64, 48, 32, 16, 8) if m and self.dim % m == 0), 8)
+        dsub = -(-self.dim // self.m)
+
+        train = vectors[rng.choice(n, min(n, self.train_size), replace=False)]
+        self.centroids = _kmeans(train, self.nlist, self.n_iter, rng)
+        assign = _nearest(vectors, self.centroids)
+
+        residuals = _pad(vectors - self.centroids[assign], self.m * dsub).reshape(n, self.m, dsub)
+        # ~40 points per codeword is plenty for PQ and keeps the batched k-means cheap
+        res_train = residuals[rng.choice(n, min(n, 40 * self.ksub, self.train_size), replace=False)]
+        self.codebooks = _train_codebooks(res_train, min(self.ksub, len(res_train)), self.n_iter, rng)
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.codes = np.zeros((0, self.m), dtype=np.uint8 if self.ksub <= 256 else np.uint16)
+        self.list_ptr = np.zeros(self.nlist + 1, dtype=np.int64)
+        self.ntotal = 0
+        return self.add(vectors, assign=assign)
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray | None = None, assign: np.ndarray | None = None) -> "IVFPQIndex":
+        """
+        Encode and index more vectors with the already-trained cells and
+        codebooks (ids default to ntotal, ntotal+1, ...). No retraining, so
+        recall degrades slowly if the new data drifts far from the old.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        if ids is None:
+            ids = np.arange(self.ntotal, self.ntotal + n, dtype=np.int64)
+        if assign is None:
+            assign = _nearest(vectors, self.centroids)
+        dsub = self.codebooks.shape[2]
+        residuals = _pad(vectors - self.centroids[assign], self.m * dsub).reshape(n, self.m, dsub)
+        codes = _encode(residuals, self.codebooks).astype(self.codes.dtype)
+
+        self._regroup(
+            np.concatenate([self._cells(), assign]),
+            np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)]),
+            np.concatenate([self.codes, codes]),
+        )
+        return self
+
+    def remap(self, mapping: np.ndarray) -> "IVFPQIndex":
+        """
+        Renumber ids after rows were deleted from the vector matrix:
+        old id i becomes mapping[i]; entries mapped to -1 are dropped.
+        """
+        new_ids = mapping[self.ids]
+        keep = new_ids >= 0
+        self._regroup(self._cells()[keep], new_ids[keep], self.codes[keep])
+        return self
+
+    def _cells(self) -> np.ndarray:
+        """Cell number of every stored code row."""
+        return np.repeat(np.arange(self.nlist), np.diff(self.list_ptr))
+
+    def _regroup(self, cells: np.ndarray, ids: np.ndarray, codes: np.ndarray):
+        order = np.argsort(cells, kind="stable")
+        self.ids = ids[order]
+        self.codes = codes[order]
+        self.list_ptr = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.nlist))]).astype(np.int64)
+        self.ntotal = len(ids)
+
+    # ─── Search ──────────────────────────────────────────────────────────────
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int | None = None,
+               vectors: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Batched top-k search.
+
+        Args:
+            queries:  (n_queries, dim) or (dim,) query vectors
+            k:        results per query
+            nprobe:   cells scanned per query (default self.nprobe)
+            vectors:  the full (ntotal, dim) matrix — enables exact reranking
+
+        Returns:
+            (scores, ids), each (n_queries, k), best first; ids are -1 where
+            fewer than k candidates were found
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        dsub = self.codebooks.shape[2]
+        shortlist = k * self.rerank_factor if vectors is not None else k
+
+        coarse = queries @ self.centroids.T
+        if nprobe < self.nlist:
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), coarse.shape)
+
+        # Per-query lookup tables: lut[q, j, c] = <query sub-vector j, codeword c>
+        q_sub = _pad(queries, self.m * dsub).reshape(len(queries), self.m, dsub)
+        luts = np.einsum("qjd,jcd->qjc", q_sub, self.codebooks)
+        sub_idx = np.arange(self.m)
+
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for qi in range(len(queries)):
+            cells = probes[qi]
+            starts, ends = self.list_ptr[cells], self.list_ptr[cells + 1]
+            rows = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)]) if len(cells) else np.zeros(0, int)
+            if not len(rows):
+                continue
+            cell_of_row = np.repeat(cells, ends - starts)
+            approx = coarse[qi, cell_of_row] + luts[qi][sub_idx, self.codes[rows]].sum(axis=1)
+
+            take = min(shortlist, len(rows))
+            best = np.argpartition(-approx, take - 1)[:take] if take < len(rows) else np.arange(len(rows))
+            cand_ids = self.ids[rows[best]]
+            cand_scores = approx[best]
+            if vectors is not None:
+                cand_scores = vectors[cand_ids] @ queries[qi]
+
+            keep = min(k, len(cand_ids))
+            top = np.argsort(-cand_scores)[:keep]
+            out_scores[qi, :keep] = cand_scores[top]
+            out_ids[qi, :keep] = cand_ids[top]
+        return out_scores, out_ids
+
+    # ─── Persistence ─────────────────────────────────────────────────────────
+
+    def save(self, path: str) -> None:
+        """Write the index to a single .npz file."""
+        meta = {
+            "nlist": self.nlist, "m": self.m, "ksub": self.ksub, "nprobe": self.nprobe,
+            "rerank_factor": self.rerank_factor, "dim": self.dim, "ntotal": self.ntotal,
+        }
+        np.savez(
+            path,
+            meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+            centroids=self.centroids, codebooks=self.codebooks,
+            codes=self.codes, ids=self.ids, list_ptr=self.list_ptr,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode())
+            index = cls(nlist=meta["nlist"], m=meta["m"], nprobe=meta["nprobe"],
+                        rerank_factor=meta["rerank_factor"])
+            index.ksub = meta["ksub"]
+            index.dim, index.ntotal = meta["dim"], meta["ntotal"]
+            for name in ("centroids", "codebooks", "codes", "ids", "list_ptr"):
+                setattr(index, name, data[name])
+        return index
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _pad(x: np.ndarray, width: int) -> np.ndarray:
+    if x.shape[1] == width:
+        return x
+    return np.pad(x, ((0, 0), (0, width - x.shape[1])))
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    """Highest inner-product centroid for every row, in blocks to bound memory."""
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), block):
+        out[start:start + block] = np.argmax(x[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(x: np.ndarray, k: int, n_iter: int, rng) -> np.ndarray:
+    """
+    Spherical k-means for the IVF cells: centroids stay unit length because
+    cells are scored by inner product. Empty clusters are reseeded from
+    random points.
+    """
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        centroids[nonempty] = np.add.reduceat(x[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-9
+    return centroids.astype(np.float32)
+
+
+def _encode(sub: np.ndarray, codebooks: np.ndarray, block: int = 2048) -> np.ndarray:
+    """
+    Nearest codeword (squared L2) in every subspace at once.
+    sub: (n, m, dsub), codebooks: (m, ksub, dsub) → (n, m) codes.
+    """
+    bias = -0.5 * (codebooks ** 2).sum(axis=2)                  # (m, ksub)
+    cb_t = codebooks.transpose(0, 2, 1)                          # (m, dsub, ksub)
+    out = np.empty(sub.shape[:2], dtype=np.int64)
+    for start in range(0, len(sub), block):
+        part = sub[start:start + block].transpose(1, 0, 2)       # (m, b, dsub)
+        out[start:start + block] = np.argmax(part @ cb_t + bias[:, None, :], axis=2).T
+    return out
+
+
+def _train_codebooks(sub: np.ndarray, ksub: int, n_iter: int, rng) -> np.ndarray:
+    """
+    k-means for all m PQ subspaces in one batched loop.
+    sub: (n, m, dsub) training residuals → (m, ksub, dsub) codebooks.
+    """
+    n, m, dsub = sub.shape
+    codebooks = sub[rng.choice(n, ksub, replace=False)].transpose(1, 0, 2).copy()
+    flat = sub.transpose(1, 0, 2).reshape(m * n, dsub)
+    offsets = (np.arange(m) * ksub)[None, :]
+    for _ in range(n_iter):
+        # One bincount per dimension accumulates every subspace's sums together
+        cell = (_encode(sub, codebooks) + offsets).T.ravel()
+        counts = np.bincount(cell, minlength=m * ksub).reshape(m, ksub)
+        sums = np.stack([np.bincount(cell, weights=flat[:, d], minlength=m * ksub) for d in range(dsub)], axis=1)
+        sums = sums.reshape(m, ksub, dsub)
+        filled = counts > 0
+        codebooks[filled] = sums[filled] / counts[filled][:, None]
+        empty_m, empty_c = np.nonzero(~filled)
+        if len(empty_m):
+            codebooks[empty_m, empty_c] = sub[rng.integers(0, n, len(empty_m)), empty_m]
+    return codebooks.astype(np.float32)
@@ -3,28 +3,56 @@ api.py — FastAPI REST API wrapper for Synapse Research Assistant
 Run with: uvicorn api:app --host 0.0.0.0 --port 8000 --reload
 
 Endpoints:
-  POST /research          — Run full pipeline, return report
-  GET  /health            — Health check
+  POST /research          — Run full pipeline, return report (or a cached one for a near-identical query)
+  POST /research/stream   — Same pipeline as server-sent events: stage events, then report tokens
+  POST /research/batch    — Many questions sharing one search/fetch/embed pass, reports streamed as SSE
+  POST /jobs              — Queue a research run, returns a job id at once (429 when the queue is full)
+  GET  /jobs/{id}         — Job status, per-stage progress and, when done, the result
+  DELETE /jobs/{id}       — Cancel a queued or running job
+  GET  /health            — Liveness (process is up) + readiness flag
+  GET  /ready             — Readiness: 503 until models are warm
+  GET  /stats             — Fetcher pool, embedding server, LLM call and job queue stats
   GET  /docs              — Auto-generated Swagger UI (built-in)
 """
-import os, sys, time
+import os, sys, time, json, asyncio
+from contextlib import asynccontextmanager
 _root = os.path.dirname(os.path.abspath(__file__))
 if _root not in sys.path:
     sys.path.insert(0, _root)
 
 from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 load_dotenv()
 
-from src.agent import generate_search_queries
-from src.search import search_web
-from src.scraper import fetch_and_clean
-from src.chunker import chunk_pages
-from src.vector_store import embed_and_store, retrieve_relevant_chunks
-from src.synthesizer import synthesize_report
+from src.agent import generate_search_queries_async
+from src.search import search_web_async, merge_result_sets
+from src.pipeline import stream_pages_to_store_async
+from src.speculation import AsyncSpeculativeFetch, ENABLED as SPECULATE
+from src.dedup import NearDuplicateFilter
+from src.vector_store import retrieve_relevant_chunks, retrieve_relevant_chunks_batch, embed_server_stats, RETRIEVAL_MODE, RETRIEVAL_MODES
+from src.synthesizer import synthesize_report_async, stream_report_async
+from src.http_client import close_async_client
+from src.fetcher import stats as fetcher_stats
+from src import resources, report_cache
+from src.jobs import JobManager, QueueFull
+from src.llm import stats as llm_stats
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load MiniLM + the clean pool off the loop; /ready reports when done
+    resources.warm_up_in_background()
+    await jobs.start()
+    yield
+    await jobs.stop()
+    await close_async_client()
+
+jobs = JobManager()
+
+BATCH_MAX_QUERIES = int(os.getenv("SYNAPSE_BATCH_MAX_QUERIES", "50"))
+BATCH_CONCURRENCY = int(os.getenv("SYNAPSE_BATCH_CONCURRENCY", "4"))   # reports synthesised at once
 
 app = FastAPI(
     title="Synapse Research API",
@@ -36,7 +64,7 @@ Agentic RAG pipeline that:
 2. Searches the web (SerpAPI / Brave)
 3. Fetches and cleans page content
 4. Chunks and embeds text (MiniLM)
-5. Retrieves relevant chunks (cosine similarity)
+5. Retrieves relevant chunks (cosine similarity; BM25 or hybrid rank fusion on request)
 6. Synthesizes a structured, cited report (Llama 3.3 70B)
 
 ### Authentication
@@ -46,7 +74,8 @@ Leave unset to run without authentication (open access).
     """,
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -68,6 +97,10 @@ class ResearchRequest(BaseModel):
     deep_mode: bool = False
     results_per_query: int = 4
     top_k_chunks: int = 8
+    use_search_cache: bool = True   # False forces fresh search API calls
+    use_report_cache: bool = True   # Serve a stored report for a near-identical earlier query
+    retrieval_mode: str = RETRIEVAL_MODE  # "dense", "bm25" or "hybrid" (rank fusion)
+    compress_prompt: bool = False   # Keep only query-relevant sentences in the LLM prompt
 
     class Config:
         json_schema_extra = {
@@ -75,7 +108,11 @@ class ResearchRequest(BaseModel):
                 "query": "How does CRISPR gene editing work?",
                 "deep_mode": False,
                 "results_per_query": 4,
-                "top_k_chunks": 8
+                "top_k_chunks": 8,
+                "use_search_cache": True,
+                "use_report_cache": True,
+                "retrieval_mode": "dense",
+                "compress_prompt": False
             }
         }
 
@@ -86,55 +123,422 @@ class ResearchResponse(BaseModel):
     sources_found: int
     pages_extracted: int
     chunks_created: int
+    duplicates_removed: int = 0
+    compression_ratio: float | None = None
     elapsed_seconds: float
     deep_mode: bool
+    cache_hit: bool = False
+    cached_query: str | None = None  # The stored wording a cache hit was served for
+
+class BatchResearchRequest(BaseModel):
+    queries: list[str]
+    deep_mode: bool = False
+    results_per_query: int = 4
+    top_k_chunks: int = 8
+    use_search_cache: bool = True
+    use_report_cache: bool = True
+    retrieval_mode: str = RETRIEVAL_MODE
+    compress_prompt: bool = False
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "queries": ["How does CRISPR gene editing work?", "What are the risks of CRISPR?"],
+                "deep_mode": False,
+                "results_per_query": 4,
+                "top_k_chunks": 8,
+            }
+        }
+
+def validate_request(req: ResearchRequest):
+    if not req.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    if len(req.query) > 500:
+        raise HTTPException(status_code=400, detail="Query too long (max 500 chars)")
+    if req.retrieval_mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"retrieval_mode must be one of {', '.join(RETRIEVAL_MODES)}")
 
 # ── Routes ───────────────────────────────────────────────────────────────────
 @app.get("/health")
 def health():
-    return {"status": "ok", "service": "Synapse Research API", "version": "1.0.0"}
+    return {"status": "ok", "ready": resources.is_ready(), "service": "Synapse Research API", "version": "1.0.0"}
+
+@app.get("/ready")
+def ready():
+    # Load balancers should route only to workers answering 200 here
+    return JSONResponse(status_code=200 if resources.is_ready() else 503, content=resources.status())
 
 @app.post("/research", response_model=ResearchResponse)
-def research(req: ResearchRequest, x_api_key: str = Header(default=None)):
+async def research(req: ResearchRequest, x_api_key: str = Header(default=None)):
     verify_key(x_api_key)
+    validate_request(req)
+    try:
+        return await run_research(req)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
+
+async def run_research(req: ResearchRequest, progress=None) -> ResearchResponse:
+    """
+    The /research pipeline. `progress(stage, **data)` is called as each stage
+    finishes (jobs use it for GET /jobs/{id}). Raises HTTPException(503)
+    when search or extraction comes back empty.
+    """
+    progress = progress or (lambda stage, **data: None)
     start = time.time()
 
-    if not req.query.strip():
-        raise HTTPException(status_code=400, detail="Query cannot be empty")
-    if len(req.query) > 500:
-        raise HTTPException(status_code=400, detail="Query too long (max 500 chars)")
+    cached = await _cached_response(req, start)
+    if cached is not None:
+        progress("cache", cached_query=cached.cached_query)
+        return cached
 
+    speculative = _speculate(req)
     try:
-        queries = generate_search_queries(req.query)
-        results = search_web(queries, results_per_query=req.results_per_query)
+        # Network-bound stages are awaited on the event loop; CPU-bound ones
+        # (MiniLM encode, scoring) run in the default executor. Pages are
+        # chunked and embedded while the rest are still downloading, and the
+        # raw query's pages are fetched while the agent plans.
+        queries = await generate_search_queries_async(req.query)
+        progress("queries", search_queries=queries)
+        results = await _planned_results(req, queries, speculative)
+        progress("search", sources_found=len(results))
         if not results:
             raise HTTPException(status_code=503, detail="Search API returned no results")
 
-        pages = fetch_and_clean(results)
+        dedup = NearDuplicateFilter()
+        pages, chunks, store = await stream_pages_to_store_async(results, dedup=dedup, speculative=speculative)
         ok = sum(1 for p in pages if p["status"] == "success")
-        chunks = chunk_pages(pages)
+        progress("chunks", pages_extracted=ok, chunks_created=len(chunks), duplicates_removed=dedup.removed)
         if not chunks:
             raise HTTPException(status_code=503, detail="Could not extract content from any pages")
 
-        store = embed_and_store(chunks)
-        relevant = retrieve_relevant_chunks(store, req.query, top_k=req.top_k_chunks)
-        report = synthesize_report(req.query, relevant, deep_mode=req.deep_mode)
+        relevant = await asyncio.to_thread(
+            retrieve_relevant_chunks, store, req.query, req.top_k_chunks, req.retrieval_mode
+        )
+        progress("retrieval", chunks_used=len(relevant))
+        synth_stats: dict = {}
+        report = await synthesize_report_async(
+            req.query, relevant, deep_mode=req.deep_mode, compress=req.compress_prompt, stats=synth_stats
+        )
+        progress("report")
 
-        return ResearchResponse(
+        response = ResearchResponse(
             query=req.query,
             report=report,
             search_queries=queries,
             sources_found=len(results),
             pages_extracted=ok,
             chunks_created=len(chunks),
+            duplicates_removed=dedup.removed,
+            compression_ratio=synth_stats.get("compression_ratio"),
             elapsed_seconds=round(time.time() - start, 2),
             deep_mode=req.deep_mode,
         )
+        await _remember(req, response)
+        return response
+    finally:
+        if speculative is not None:
+            speculative.cancel()
 
-    except HTTPException:
-        raise
+@app.post("/research/stream")
+async def research_stream(req: ResearchRequest, x_api_key: str = Header(default=None)):
+    """
+    Server-sent events. Stage events — queries, search, page (one per fetched
+    page), chunks, retrieval — arrive as each stage finishes, then "token"
+    events carry the report text as the LLM writes it, and "done" carries
+    the same fields as the /research response. Failures end the stream
+    with an "error" event.
+    """
+    verify_key(x_api_key)
+    validate_request(req)
+    return StreamingResponse(
+        _research_events(req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _research_events(req: ResearchRequest):
+    start = time.time()
+    cached = await _cached_response(req, start)
+    if cached is not None:
+        yield _sse("cache", {"cached_query": cached.cached_query})
+        yield _sse("token", {"text": cached.report})
+        yield _sse("done", cached.model_dump())
+        return
+
+    speculative = _speculate(req)
+    task = stream = None
+    try:
+        queries = await generate_search_queries_async(req.query)
+        yield _sse("queries", {"search_queries": queries})
+
+        results = await _planned_results(req, queries, speculative)
+        yield _sse("search", {"sources_found": len(results)})
+        if not results:
+            yield _sse("error", {"status": 503, "detail": "Search API returned no results"})
+            return
+
+        # Page progress is pushed from the pipeline's callback; None marks the end
+        progress: asyncio.Queue = asyncio.Queue()
+        dedup = NearDuplicateFilter()
+        task = asyncio.create_task(stream_pages_to_store_async(
+            results, dedup=dedup, speculative=speculative,
+            on_page=lambda page, done, n_chunks: progress.put_nowait(
+                {"url": page.get("url", ""), "status": page.get("status"), "pages_done": done,
+                 "pages_total": len(results), "chunks_so_far": n_chunks}
+            ),
+        ))
+        task.add_done_callback(lambda _: progress.put_nowait(None))
+        while (event := await progress.get()) is not None:
+            yield _sse("page", event)
+        pages, chunks, store = await task
+
+        ok = sum(1 for p in pages if p["status"] == "success")
+        yield _sse("chunks", {"pages_extracted": ok, "chunks_created": len(chunks), "duplicates_removed": dedup.removed})
+        if not chunks:
+            yield _sse("error", {"status": 503, "detail": "Could not extract content from any pages"})
+            return
+
+        relevant = await asyncio.to_thread(
+            retrieve_relevant_chunks, store, req.query, req.top_k_chunks, req.retrieval_mode
+        )
+        yield _sse("retrieval", {
+            "chunks_used": len(relevant),
+            "retrieval_mode": req.retrieval_mode,
+            "top_score": relevant[0]["relevance_score"] if relevant else None,
+        })
+
+        synth_stats: dict = {}
+        report = []
+        stream = stream_report_async(
+            req.query, relevant, deep_mode=req.deep_mode, compress=req.compress_prompt, stats=synth_stats
+        )
+        async for piece in stream:
+            report.append(piece)
+            yield _sse("token", {"text": piece})
+
+        response = ResearchResponse(
+            query=req.query,
+            report="".join(report),
+            search_queries=queries,
+            sources_found=len(results),
+            pages_extracted=ok,
+            chunks_created=len(chunks),
+            duplicates_removed=dedup.removed,
+            compression_ratio=synth_stats.get("compression_ratio"),
+            elapsed_seconds=round(time.time() - start, 2),
+            deep_mode=req.deep_mode,
+        )
+        await _remember(req, response)
+        yield _sse("done", response.model_dump())
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
+        yield _sse("error", {"status": 500, "detail": f"Pipeline error: {str(e)}"})
+    finally:
+        # Client went away (or the run failed) — stop fetching, embedding and
+        # LLM calls nobody will read
+        if task is not None:
+            task.cancel()
+        if stream is not None:
+            await stream.aclose()
+        if speculative is not None:
+            speculative.cancel()
+
+async def _cached_response(req: ResearchRequest, start: float) -> ResearchResponse | None:
+    if not req.use_report_cache:
+        return None
+    hit = await asyncio.to_thread(report_cache.lookup, req.query, req.deep_mode, _report_params(req))
+    if hit is None:
+        return None
+    fields = {k: v for k, v in hit.items() if k in ResearchResponse.model_fields}
+    fields.update(query=req.query, cache_hit=True, elapsed_seconds=round(time.time() - start, 2))
+    return ResearchResponse(**fields)
+
+async def _remember(req: ResearchRequest, response: ResearchResponse):
+    payload = response.model_dump(exclude={"cache_hit", "cached_query"})
+    await asyncio.to_thread(report_cache.store, req.query, req.deep_mode, payload, _report_params(req))
+
+def _report_params(req: ResearchRequest) -> dict:
+    """The settings a cached report must have been produced with to be served for `req`."""
+    return {
+        "retrieval_mode": req.retrieval_mode,
+        "top_k_chunks": req.top_k_chunks,
+        "results_per_query": req.results_per_query,
+        "compress_prompt": req.compress_prompt,
+    }
+
+def _speculate(req: ResearchRequest) -> AsyncSpeculativeFetch | None:
+    if not SPECULATE:
+        return None
+    return AsyncSpeculativeFetch(req.query, req.results_per_query, req.use_search_cache)
+
+async def _planned_results(req: ResearchRequest, queries: list[str], speculative) -> list[dict]:
+    """Search the planned queries, then fold in the speculative raw-query results."""
+    results = await search_web_async(
+        queries, results_per_query=req.results_per_query, use_cache=req.use_search_cache
+    )
+    if speculative is not None:
+        results = merge_result_sets(await speculative.results(), results)
+    return results
+
+@app.post("/research/batch")
+async def research_batch(batch: BatchResearchRequest, x_api_key: str = Header(default=None)):
+    """
+    Server-sent events for a batch of questions. All questions are planned
+    and searched in parallel, the union of their URLs is fetched, cleaned,
+    chunked and embedded once into a shared store, and each question is
+    then answered from that store. Events: queries, search, chunks, then
+    one "report" (or per-question "error") per question in completion
+    order — each carries the question's "index" — and finally "done".
+    Questions with a cached report are answered first, without searching.
+    """
+    verify_key(x_api_key)
+    if not batch.queries:
+        raise HTTPException(status_code=400, detail="queries cannot be empty")
+    if len(batch.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Too many queries (max {BATCH_MAX_QUERIES})")
+    common = batch.model_dump(exclude={"queries"})
+    reqs = [ResearchRequest(query=q, **common) for q in batch.queries]
+    for req in reqs:
+        validate_request(req)
+    return StreamingResponse(
+        _batch_events(reqs),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _batch_events(reqs: list[ResearchRequest]):
+    start = time.time()
+    first = reqs[0]   # settings shared by the whole batch
+    try:
+        pending = []
+        for i, req in enumerate(reqs):
+            cached = await _cached_response(req, start)
+            if cached is not None:
+                yield _sse("report", {"index": i, **cached.model_dump()})
+            else:
+                pending.append(i)
+        if not pending:
+            yield _sse("done", {"questions": len(reqs), "cache_hits": len(reqs), "elapsed_seconds": round(time.time() - start, 2)})
+            return
+
+        planned = await asyncio.gather(*(generate_search_queries_async(reqs[i].query) for i in pending))
+        yield _sse("queries", {"planned": [{"index": i, "search_queries": q} for i, q in zip(pending, planned)]})
+
+        per_question = await asyncio.gather(*(
+            search_web_async(q, results_per_query=first.results_per_query, use_cache=first.use_search_cache)
+            for q in planned
+        ))
+        union = merge_result_sets(*per_question)
+        yield _sse("search", {"urls_requested": sum(len(r) for r in per_question), "unique_urls": len(union)})
+        if not union:
+            yield _sse("error", {"status": 503, "detail": "Search API returned no results"})
+            return
+
+        # Every unique page is fetched and every unique chunk embedded once
+        dedup = NearDuplicateFilter()
+        pages, chunks, store = await stream_pages_to_store_async(union, dedup=dedup)
+        ok_urls = {p["url"] for p in pages if p["status"] == "success"}
+        yield _sse("chunks", {
+            "pages_extracted": len(ok_urls), "pages_total": len(pages),
+            "chunks_created": len(chunks), "duplicates_removed": dedup.removed,
+        })
+        if not chunks:
+            yield _sse("error", {"status": 503, "detail": "Could not extract content from any pages"})
+            return
+
+        relevant = await asyncio.to_thread(
+            retrieve_relevant_chunks_batch, store, [reqs[i].query for i in pending],
+            first.top_k_chunks, None, first.retrieval_mode,
+        )
+        chunk_urls = [c.get("url") for c in chunks]
+        limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def answer(k: int) -> tuple[str, dict]:
+            i, req = pending[k], reqs[pending[k]]
+            urls = {r.get("url") for r in per_question[k]}
+            synth_stats: dict = {}
+            try:
+                async with limit:
+                    report = await synthesize_report_async(
+                        req.query, relevant[k], deep_mode=req.deep_mode, compress=req.compress_prompt, stats=synth_stats
+                    )
+            except Exception as e:
+                return "error", {"index": i, "query": req.query, "status": 500, "detail": f"Pipeline error: {str(e)}"}
+            response = ResearchResponse(
+                query=req.query,
+                report=report,
+                search_queries=planned[k],
+                sources_found=len(per_question[k]),
+                pages_extracted=len(urls & ok_urls),
+                chunks_created=sum(1 for u in chunk_urls if u in urls),
+                compression_ratio=synth_stats.get("compression_ratio"),
+                elapsed_seconds=round(time.time() - start, 2),
+                deep_mode=req.deep_mode,
+            )
+            if relevant[k]:
+                await _remember(req, response)
+            return "report", {"index": i, **response.model_dump()}
+
+        tasks = [asyncio.create_task(answer(k)) for k in range(len(pending))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event, data = await next_done
+                yield _sse(event, data)
+        finally:
+            # Client went away — don't keep spending LLM calls
+            for task in tasks:
+                task.cancel()
+
+        yield _sse("done", {
+            "questions": len(reqs),
+            "cache_hits": len(reqs) - len(pending),
+            "unique_urls": len(union),
+            "chunks_created": len(chunks),
+            "elapsed_seconds": round(time.time() - start, 2),
+        })
+    except Exception as e:
+        yield _sse("error", {"status": 500, "detail": f"Pipeline error: {str(e)}"})
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: ResearchRequest, x_api_key: str = Header(default=None)):
+    """Queue a research run and return its id at once; poll GET /jobs/{id}."""
+    verify_key(x_api_key)
+    validate_request(req)
+
+    async def runner(job):
+        return (await run_research(req, progress=job.progress)).model_dump()
+
+    try:
+        job = jobs.submit(runner)
+    except QueueFull:
+        raise HTTPException(status_code=429, detail="Job queue is full, retry later",
+                            headers={"Retry-After": "30"})
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, x_api_key: str = Header(default=None)):
+    verify_key(x_api_key)
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str, x_api_key: str = Header(default=None)):
+    verify_key(x_api_key)
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/stats")
+def stats(x_api_key: str = Header(default=None)):
+    verify_key(x_api_key)
+    return {"fetcher": fetcher_stats(), "embed_server": embed_server_stats(), "llm": llm_stats(), "jobs": jobs.stats()}
 
 @app.get("/")
 def root():
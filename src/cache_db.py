@@ -0,0 +1,44 @@
+"""
+cache_db.py — Shared SQLite plumbing for the on-disk caches
+-------------------------------------------------------------
+Every cache lives in its own SQLite file under SYNAPSE_CACHE_DIR
+(default: .cache/ next to app.py). Connections are per-thread because
+the scraper and the API executor call into the caches from many threads;
+WAL mode lets those readers proceed while another thread writes.
+"""
+
+import os
+import sqlite3
+import threading
+
+CACHE_DIR = os.getenv(
+    "SYNAPSE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+
+_local = threading.local()
+
+
+def cache_path(filename: str) -> str:
+    """Absolute path for a file inside the cache directory (created on demand)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
+
+
+def connect(filename: str, schema: str) -> sqlite3.Connection:
+    """
+    Return this thread's connection to the given cache file, creating the
+    file and running `schema` (idempotent CREATE ... IF NOT EXISTS) once.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(filename)
+    if conn is None:
+        conn = sqlite3.connect(cache_path(filename), timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(schema)
+        conns[filename] = conn
+    return conn
@@ -41,39 +41,54 @@ def chunk_pages(
         Input page text (1200 chars) → output: ~3 chunks of ~500 chars each
         Each chunk tagged with: url="https://...", title="Article Title"
     """
-    splitter = RecursiveCharacterTextSplitter(
+    splitter = make_splitter(chunk_size, chunk_overlap)
+
+    all_chunks = []
+    for page in pages:
+        all_chunks.extend(chunk_page(page, splitter))
+
+    print(f"[chunker.py] Created {len(all_chunks)} chunks from {len(pages)} pages")
+    return all_chunks
+
+
+def make_splitter(chunk_size: int = 500, chunk_overlap: int = 50) -> RecursiveCharacterTextSplitter:
+    """Build the splitter once so streaming callers can reuse it page by page."""
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
         separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""],
     )
 
-    all_chunks = []
 
-    for page in pages:
-        text = page.get("text", "").strip()
-        url = page.get("url", "")
-        title = page.get("title", "")
+def chunk_page(page: dict, splitter: RecursiveCharacterTextSplitter) -> list[dict]:
+    """
+    Split a single cleaned page into chunks. Used by chunk_pages() and by the
+    streaming pipeline, which chunks each page as soon as it is downloaded.
+    """
+    text = page.get("text", "").strip()
+    url = page.get("url", "")
+    title = page.get("title", "")
 
-        # Skip pages with almost no content
-        if not text or len(text) < 80:
-            continue
+    # Skip pages with almost no content
+    if not text or len(text) < 80:
+        return []
 
-        raw_chunks = splitter.split_text(text)
+    chunks = []
+    raw_chunks = splitter.split_text(text)
 
-        for i, chunk_text in enumerate(raw_chunks):
-            chunk_text = chunk_text.strip()
-            # Skip chunks that are too small to be meaningful
-            if len(chunk_text) < 30:
-                continue
+    for i, chunk_text in enumerate(raw_chunks):
+        chunk_text = chunk_text.strip()
+        # Skip chunks that are too small to be meaningful
+        if len(chunk_text) < 30:
+            continue
 
-            all_chunks.append({
-                "text": chunk_text,
-                "url": url,
-                "title": title,
-                # chunk_id: deterministic hash so same page+chunk = same id
-                "chunk_id": f"{abs(hash(url))%999999:06d}_{i:04d}",
-            })
+        chunks.append({
+            "text": chunk_text,
+            "url": url,
+            "title": title,
+            # chunk_id: deterministic hash so same page+chunk = same id
+            "chunk_id": f"{abs(hash(url))%999999:06d}_{i:04d}",
+        })
 
-    print(f"[chunker.py] Created {len(all_chunks)} chunks from {len(pages)} pages")
-    return all_chunks
\ No newline at end of file
+    return chunks
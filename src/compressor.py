@@ -0,0 +1,131 @@
+"""
+compressor.py — Extractive prompt compression for synthesize_report
+---------------------------------------------------------------------
+Retrieved chunks are ~500 characters of which often only a sentence or
+two answer the question. This stage splits every chunk into sentences,
+scores each sentence against the query with the already-loaded MiniLM
+model (sparse TF-IDF when it is unavailable) and keeps the best ones up
+to a token budget. Kept sentences stay in their original order inside
+their original chunk, so each chunk keeps its url and therefore its
+[Source N] number; chunks left with no sentences are dropped.
+
+Configuration (.env):
+  SYNAPSE_COMPRESS_PROMPT   "1" compresses by default (default off)
+  SYNAPSE_COMPRESS_TOKENS   source-text budget in tokens (default 900, doubled in deep mode)
+"""
+
+import os
+import re
+import numpy as np
+
+from src.vector_store import encode_normalized
+from src.sparse_index import TfidfIndex
+
+COMPRESS_DEFAULT = os.getenv("SYNAPSE_COMPRESS_PROMPT", "0") == "1"
+TOKEN_BUDGET = int(os.getenv("SYNAPSE_COMPRESS_TOKENS", "900"))
+CHARS_PER_TOKEN = 4          # rough Llama-3 average for English prose
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "prof", "st", "vs", "inc", "jr", "sr", "co", "ltd", "e.g", "i.e", "u.s"}
+_NUMBER_ABBREVIATIONS = {"no", "fig"}    # only before a number: "No. 5", but "said no. It ..."
+
+
+def compress_chunks(query: str, chunks: list[dict], token_budget: int = TOKEN_BUDGET) -> tuple[list[dict], dict]:
+    """
+    Keep the query-relevant sentences of each chunk within `token_budget`.
+
+    Returns:
+        (compressed_chunks, stats) — chunks are copies with a shortened
+        "text"; stats has original/compressed token estimates and the
+        compression_ratio (original ÷ compressed)
+    """
+    sentences: list[tuple[int, str]] = []
+    for ci, chunk in enumerate(chunks):
+        sentences.extend((ci, s) for s in split_sentences(chunk["text"]))
+
+    original = sum(len(c["text"]) for c in chunks)
+    if not sentences or original <= token_budget * CHARS_PER_TOKEN:
+        return chunks, _stats(original, original, len(sentences), len(sentences))
+
+    scores = _score(query, [s for _, s in sentences])
+    budget = token_budget * CHARS_PER_TOKEN
+    keep = np.zeros(len(sentences), dtype=bool)
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        cost = len(sentences[i][1]) + 1
+        if used + cost <= budget:
+            keep[i] = True
+            used += cost
+    if not keep.any():
+        keep[int(np.argmax(scores))] = True
+
+    kept_text: dict[int, list[str]] = {}
+    for (ci, sentence), k in zip(sentences, keep):
+        if k:
+            kept_text.setdefault(ci, []).append(sentence)
+    compressed = []
+    for ci, chunk in enumerate(chunks):
+        if ci in kept_text:
+            c = chunk.copy()
+            c["text"] = " ".join(kept_text[ci])
+            compressed.append(c)
+
+    stats = _stats(original, sum(len(c["text"]) for c in compressed), int(keep.sum()), len(sentences))
+    print(f"[compressor.py] {stats['sentences_kept']} sentences, "
+          f"{stats['original_tokens']} → {stats['compressed_tokens']} tokens ({stats['compression_ratio']}x)")
+    return compressed, stats
+
+
+def split_sentences(text: str) -> list[str]:
+    pieces = [p.strip() for p in _SENTENCE_RE.split(text)]
+    sentences: list[str] = []
+    carry = ""
+    for i, piece in enumerate(pieces):
+        piece = (carry + " " + piece).strip() if carry else piece
+        nxt = pieces[i + 1] if i + 1 < len(pieces) else ""
+        # "Dr. Smith", "Fig. 3", "U.S. officials", "John F. Kennedy" — not sentence ends
+        if _abbreviated(piece, nxt) or (_initial(piece) and nxt[:1].isupper()):
+            carry = piece
+            continue
+        carry = ""
+        if piece:
+            sentences.append(piece)
+    if carry:
+        sentences.append(carry)
+    return sentences
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _abbreviated(piece: str, nxt: str) -> bool:
+    last_word = piece.rsplit(None, 1)[-1].rstrip(".").lower() if piece else ""
+    return last_word in _ABBREVIATIONS or (last_word in _NUMBER_ABBREVIATIONS and nxt[:1].isdigit())
+
+
+def _initial(piece: str) -> bool:
+    """Ends in a capital initial after a name or another initial ("J. R. R.", "John F.") — not "vitamin D." or "5."."""
+    words = piece.split()
+    if not words or not re.fullmatch(r"[A-Z]\.", words[-1]):
+        return False
+    if len(words) == 1:
+        return True
+    return words[-2][:1].isupper()
+
+
+def _score(query: str, sentences: list[str]) -> np.ndarray:
+    """Cosine similarity of each sentence to the query."""
+    vectors = encode_normalized([query] + sentences)
+    if vectors is not None:
+        return vectors[1:] @ vectors[0]
+    return TfidfIndex.build(sentences).score([query])[0]
+
+
+def _stats(original_chars: int, compressed_chars: int, kept: int, total: int) -> dict:
+    original_tokens = max(1, original_chars // CHARS_PER_TOKEN)
+    compressed_tokens = max(1, compressed_chars // CHARS_PER_TOKEN)
+    return {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "compression_ratio": round(original_tokens / compressed_tokens, 2),
+        "sentences_kept": f"{kept}/{total}",
+    }
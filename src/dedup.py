@@ -0,0 +1,195 @@
+"""
+dedup.py — Near-duplicate elimination between the chunker and vector_store
+----------------------------------------------------------------------------
+Search results are full of syndicated copies and mirrors of one article
+(wire stories, AMP pages, scrapers). Each copy used to be chunked,
+embedded and then compete for top_k with its twins. A NearDuplicateFilter
+remembers fingerprints of everything it has let through and drops repeats:
+
+  Pages   — 64-bit SimHash over word 3-shingles. Two pages are duplicates
+            when their fingerprints differ in ≤ PAGE_MAX_HAMMING bits;
+            candidates are found by splitting the fingerprint into
+            PAGE_MAX_HAMMING + 1 blocks (by pigeonhole, a near-duplicate
+            matches at least one block exactly).
+  Chunks  — MinHash signatures (NUM_PERM permutations of word 3-shingle
+            hashes) indexed by banded LSH. Candidates sharing a band are
+            kept only if their estimated Jaccard similarity is below
+            CHUNK_THRESHOLD.
+
+The filter is stateful, so the streaming pipeline feeds it one page at a
+time; dedup_pages() / dedup_chunks() wrap it for the batch path. A kept
+chunk that absorbed copies from other sites lists them in "mirror_urls".
+
+Configuration (.env):
+  SYNAPSE_DEDUP                  "0" disables the filter (default on)
+  SYNAPSE_DEDUP_CHUNK_THRESHOLD  Jaccard similarity for chunk duplicates (default 0.8)
+"""
+
+import os
+import re
+import zlib
+import hashlib
+import numpy as np
+
+ENABLED = os.getenv("SYNAPSE_DEDUP", "1") != "0"
+CHUNK_THRESHOLD = float(os.getenv("SYNAPSE_DEDUP_CHUNK_THRESHOLD", "0.8"))
+PAGE_MAX_HAMMING = 3
+NUM_PERM = 64
+BANDS = 16                   # 16 bands × 4 rows: candidate pairs from Jaccard ≈ 0.5 up
+MIN_PAGE_WORDS = 50          # shorter pages are too small to fingerprint reliably
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = np.uint64(4294967311)           # smallest prime above 2^32
+_rng = np.random.default_rng(0x5EED)
+_PERM_A = _rng.integers(1, 2**32, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint64)
+_BITS = np.arange(64, dtype=np.uint64)
+
+
+class NearDuplicateFilter:
+    """Stateful SimHash (pages) + MinHash/LSH (chunks) duplicate filter."""
+
+    def __init__(self, chunk_threshold: float = CHUNK_THRESHOLD, page_max_hamming: int = PAGE_MAX_HAMMING,
+                 enabled: bool = ENABLED):
+        self.enabled = enabled    # False (SYNAPSE_DEDUP=0) lets everything through
+        self.chunk_threshold = chunk_threshold
+        self.page_max_hamming = page_max_hamming
+        self.pages_removed = 0
+        self.chunks_removed = 0
+
+        self._block_bits = 64 // (page_max_hamming + 1)
+        self._page_buckets: list[dict[int, list[int]]] = [{} for _ in range(page_max_hamming + 1)]
+        self._page_prints: list[int] = []
+        self._page_urls: list[str] = []
+
+        self._chunk_buckets: list[dict[bytes, list[int]]] = [{} for _ in range(BANDS)]
+        self._chunk_sigs: list[np.ndarray] = []
+        self._chunks: list[dict] = []
+
+    @property
+    def removed(self) -> int:
+        return self.pages_removed + self.chunks_removed
+
+    # ─── Pages ───────────────────────────────────────────────────────────────
+
+    def check_page(self, page: dict) -> str | None:
+        """
+        Fingerprint a cleaned page. Returns the URL of an earlier near-identical
+        page (and counts it as removed), or None if the page is new.
+        """
+        if not self.enabled:
+            return None
+        words = _WORD_RE.findall(page.get("text", "").lower())
+        if len(words) < MIN_PAGE_WORDS:
+            return None
+        fp = _simhash(words)
+
+        for table, block in zip(self._page_buckets, self._blocks(fp)):
+            for i in table.get(block, ()):
+                if bin(fp ^ self._page_prints[i]).count("1") <= self.page_max_hamming:
+                    self.pages_removed += 1
+                    return self._page_urls[i]
+
+        idx = len(self._page_prints)
+        self._page_prints.append(fp)
+        self._page_urls.append(page.get("url", ""))
+        for table, block in zip(self._page_buckets, self._blocks(fp)):
+            table.setdefault(block, []).append(idx)
+        return None
+
+    def _blocks(self, fp: int) -> list[int]:
+        mask = (1 << self._block_bits) - 1
+        return [(fp >> (i * self._block_bits)) & mask for i in range(len(self._page_buckets))]
+
+    # ─── Chunks ──────────────────────────────────────────────────────────────
+
+    def filter_chunks(self, chunks: list[dict]) -> list[dict]:
+        """Return the chunks that are not near-duplicates of anything seen so far."""
+        if not self.enabled:
+            return list(chunks)
+        kept = []
+        for chunk in chunks:
+            sig = _minhash(chunk["text"])
+            if sig is None:
+                kept.append(chunk)
+                continue
+            bands = [sig[b::BANDS].tobytes() for b in range(BANDS)]
+            original = self._find_chunk(sig, bands)
+            if original is not None:
+                self.chunks_removed += 1
+                url = chunk.get("url", "")
+                if url and url != original.get("url") and url not in original.get("mirror_urls", ()):
+                    original.setdefault("mirror_urls", []).append(url)
+                continue
+
+            idx = len(self._chunk_sigs)
+            self._chunk_sigs.append(sig)
+            self._chunks.append(chunk)
+            for table, band in zip(self._chunk_buckets, bands):
+                table.setdefault(band, []).append(idx)
+            kept.append(chunk)
+        return kept
+
+    def _find_chunk(self, sig: np.ndarray, bands: list[bytes]) -> dict | None:
+        seen = set()
+        for table, band in zip(self._chunk_buckets, bands):
+            for i in table.get(band, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                if np.mean(self._chunk_sigs[i] == sig) >= self.chunk_threshold:
+                    return self._chunks[i]
+        return None
+
+
+# ─── Batch helpers ────────────────────────────────────────────────────────────
+
+def dedup_pages(pages: list[dict], dedup: NearDuplicateFilter | None = None) -> list[dict]:
+    """Successful pages minus near-duplicates (each dropped page gets "duplicate_of")."""
+    dedup = dedup or NearDuplicateFilter()
+    kept = []
+    for page in pages:
+        if page.get("status") == "success":
+            original = dedup.check_page(page)
+            if original is not None:
+                page["duplicate_of"] = original
+                continue
+        kept.append(page)
+    return kept
+
+
+def dedup_chunks(chunks: list[dict], dedup: NearDuplicateFilter | None = None) -> list[dict]:
+    kept = (dedup or NearDuplicateFilter()).filter_chunks(chunks)
+    print(f"[dedup.py] {len(chunks) - len(kept)} near-duplicate chunks removed")
+    return kept
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _shingles(words: list[str]) -> list[str]:
+    if len(words) < 3:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + 3]) for i in range(len(words) - 2)]
+
+
+def _simhash(words: list[str]) -> int:
+    """64-bit SimHash: per bit, the sign of the count-weighted ±1 votes of every shingle hash."""
+    shingles, counts = np.unique(np.array(_shingles(words), dtype=object), return_counts=True)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+    bits = ((hashes[:, None] >> _BITS) & np.uint64(1)).astype(np.int64)
+    votes = counts @ (2 * bits - 1)
+    return int(sum(1 << i for i in np.flatnonzero(votes > 0)))
+
+
+def _minhash(text: str) -> np.ndarray | None:
+    """NUM_PERM-value MinHash signature over word 3-shingles (None for empty text)."""
+    shingles = set(_shingles(_WORD_RE.findall(text.lower())))
+    if not shingles:
+        return None
+    x = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # a, x < 2^32 so a·x < 2^64 fits in uint64; reduce before adding b so the
+    # sum cannot wrap either, and every value is exactly (a·x + b) mod p
+    return (((_PERM_A[:, None] * x[None, :]) % _PRIME + _PERM_B[:, None]) % _PRIME).min(axis=1)
@@ -0,0 +1,343 @@
+"""
+embed_server.py — Shared embedding process with dynamic micro-batching
+------------------------------------------------------------------------
+Every API worker and Streamlit process used to hold its own MiniLM and
+encode each request's texts alone, so concurrent requests never shared a
+forward pass and model RAM grew with the worker count. This server holds
+the only copy of the model on the host:
+
+  Connections  — one thread per client connection (multiprocessing.connection,
+                 HMAC-authenticated with SYNAPSE_EMBED_AUTHKEY, which must be
+                 set on both sides — there is no default key)
+  Wire format  — send_bytes/recv_bytes only, never pickle: a JSON header,
+                 followed for vectors by the raw float32 array bytes
+  Queue        — each encode request is queued; the batcher takes the first
+                 one, then keeps collecting for up to WINDOW_MS or until
+                 MAX_BATCH texts are waiting
+  Buckets      — the gathered texts are sorted by length and cut into
+                 sub-batches under a padded-character budget, so short
+                 texts run in big batches and long ones don't pad the rest
+  Stats        — requests, texts, batch sizes, queue wait, encode time,
+                 throughput and request latency percentiles ("stats" message)
+
+Run it next to the app:
+    python -m src.embed_server
+and point clients at it with SYNAPSE_EMBED_SERVER=127.0.0.1:7799 (or a
+Unix socket path). vector_store.py then sends every encode here and falls
+back to an in-process model if the server can't be reached.
+
+Configuration (.env):
+  SYNAPSE_EMBED_SERVER      host:port or socket path (default 127.0.0.1:7799 for the server)
+  SYNAPSE_EMBED_AUTHKEY     shared secret for connections (required; e.g. `openssl rand -hex 32`)
+  SYNAPSE_EMBED_WINDOW_MS   how long to gather a batch (default 5)
+  SYNAPSE_EMBED_MAX_BATCH   max texts per gathered batch (default 512)
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import queue
+import threading
+from collections import deque
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+DEFAULT_ADDRESS = "127.0.0.1:7799"
+AUTHKEY = os.getenv("SYNAPSE_EMBED_AUTHKEY", "").encode()
+WINDOW_MS = float(os.getenv("SYNAPSE_EMBED_WINDOW_MS", "5"))
+MAX_BATCH = int(os.getenv("SYNAPSE_EMBED_MAX_BATCH", "512"))
+BUCKET_CHARS = 32 * 512      # padded characters per forward pass (≈ 32 full chunks)
+
+
+def require_authkey() -> bytes:
+    if not AUTHKEY:
+        raise RuntimeError("SYNAPSE_EMBED_AUTHKEY is not set")
+    return AUTHKEY
+
+
+def parse_address(address: str):
+    """"host:port" → (host, port); anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+# ─── Server ───────────────────────────────────────────────────────────────────
+
+class EmbedServer:
+    """One model, one batcher thread, many client connections."""
+
+    def __init__(self, model, model_name: str, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.model = model
+        self.model_name = model_name
+        self.dim = model.get_sentence_embedding_dimension()
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._forward_passes = 0
+        self._encode_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._latencies: deque[float] = deque(maxlen=2000)
+
+    def serve_forever(self, address: str):
+        threading.Thread(target=self._batch_loop, name="embed-batcher", daemon=True).start()
+        with Listener(parse_address(address), backlog=64, authkey=require_authkey()) as listener:
+            print(f"[embed_server] Serving {self.model_name} on {address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"[embed_server] Rejected connection ({str(e)[:60]})")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), name="embed-conn", daemon=True).start()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Queue texts for the next batch and wait for their vectors."""
+        job = _Job(texts)
+        self._queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        with self._lock:
+            self._requests += 1
+            self._latencies.append(time.perf_counter() - job.queued_at)
+        return job.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latencies)
+            uptime = time.time() - self._started
+            pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 2) if lat else None
+            return {
+                "model": self.model_name,
+                "requests": self._requests,
+                "texts": self._texts,
+                "batches": self._batches,
+                "forward_passes": self._forward_passes,
+                "avg_texts_per_batch": round(self._texts / self._batches, 1) if self._batches else 0,
+                "avg_queue_wait_ms": round(self._wait_seconds / max(self._requests, 1) * 1000, 2),
+                "encode_seconds": round(self._encode_seconds, 2),
+                "texts_per_encode_second": round(self._texts / self._encode_seconds, 1) if self._encode_seconds else 0,
+                "latency_p50_ms": pct(0.50),
+                "latency_p95_ms": pct(0.95),
+                "queued": self._queue.qsize(),
+                "uptime_seconds": round(uptime),
+            }
+
+    # ─── Internal helpers ────────────────────────────────────────────────────
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    header, _ = _unpack(conn.recv_bytes())
+                except (EOFError, OSError):
+                    return
+                except ValueError:
+                    return    # malformed frame: drop the connection
+                kind = header.get("kind")
+                try:
+                    if kind == "encode":
+                        texts = header.get("texts")
+                        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                            raise ValueError("texts must be a list of strings")
+                        reply = _pack_array(self.encode(texts))
+                    elif kind == "stats":
+                        reply = _pack({"status": "ok", "result": self.stats()})
+                    elif kind == "info":
+                        reply = _pack({"status": "ok", "result": {"model": self.model_name, "dim": self.dim}})
+                    else:
+                        reply = _pack({"status": "error", "detail": f"unknown request {kind!r}"})
+                except Exception as e:
+                    reply = _pack({"status": "error", "detail": str(e)})
+                try:
+                    conn.send_bytes(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _batch_loop(self):
+        while True:
+            jobs = [self._queue.get()]
+            n_texts = len(jobs[0].texts)
+            deadline = time.perf_counter() + self.window
+            while n_texts < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                n_texts += len(job.texts)
+            self._run(jobs)
+
+    def _run(self, jobs: list["_Job"]):
+        texts = [t for job in jobs for t in job.texts]
+        started = time.perf_counter()
+        try:
+            vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+            passes = 0
+            for rows in _length_buckets(texts):
+                out = self.model.encode([texts[i] for i in rows], batch_size=len(rows),
+                                        show_progress_bar=False, convert_to_numpy=True)
+                vectors[rows] = out
+                passes += 1
+            offset = 0
+            for job in jobs:
+                job.result = vectors[offset:offset + len(job.texts)]
+                offset += len(job.texts)
+        except Exception as e:
+            passes = 0
+            for job in jobs:
+                job.error = e
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._texts += len(texts)
+            self._batches += 1
+            self._forward_passes += passes
+            self._encode_seconds += elapsed
+            self._wait_seconds += sum(started - job.queued_at for job in jobs)
+        for job in jobs:
+            job.done.set()
+
+
+class _Job:
+    __slots__ = ("texts", "queued_at", "done", "result", "error")
+
+    def __init__(self, texts: list[str]):
+        self.texts = texts
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _length_buckets(texts: list[str], budget: int = BUCKET_CHARS) -> list[np.ndarray]:
+    """
+    Row indices grouped into forward passes: sorted by length, each pass
+    capped so (longest text in pass) × (pass size) stays under `budget`.
+    """
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    buckets, current, longest = [], [], 0
+    for i in order:
+        length = max(len(texts[i]), 1)
+        if current and max(longest, length) * (len(current) + 1) > budget:
+            buckets.append(np.array(current))
+            current, longest = [], 0
+        current.append(i)
+        longest = max(longest, length)
+    if current:
+        buckets.append(np.array(current))
+    return buckets
+
+
+# ─── Client ───────────────────────────────────────────────────────────────────
+
+class EmbedClient:
+    """
+    Connection pool to an EmbedServer. Quacks like a SentenceTransformer
+    (encode / get_sentence_embedding_dimension), so vector_store can use
+    either interchangeably.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        require_authkey()
+        info = self._call({"kind": "info"})
+        self.model_name = info["model"]
+        self.dim = info["dim"]
+
+    def encode(self, texts: list[str], **_) -> np.ndarray:
+        return self._call({"kind": "encode", "texts": list(texts)})
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def stats(self) -> dict:
+        return self._call({"kind": "stats"})
+
+    def _call(self, request: dict):
+        # One retry on a fresh connection: pooled ones may be stale after a server restart
+        for attempt in range(2):
+            conn = self._checkout(fresh=attempt > 0)
+            try:
+                conn.send_bytes(_pack(request))
+                header, body = _unpack(conn.recv_bytes())
+            except Exception as e:
+                # Never pool a connection in an unknown state: the next call
+                # would read this call's reply
+                conn.close()
+                if attempt or not isinstance(e, (EOFError, OSError)):
+                    raise
+                continue
+            self._pool.put(conn)
+            if header.get("status") != "ok":
+                raise RuntimeError(f"embed server: {header.get('detail')}")
+            if "shape" in header:
+                return np.frombuffer(body, dtype=np.float32).reshape(header["shape"]).copy()
+            return header["result"]
+
+    def _checkout(self, fresh: bool):
+        if not fresh:
+            try:
+                return self._pool.get_nowait()
+            except queue.Empty:
+                pass
+        return Client(parse_address(self.address), authkey=require_authkey())
+
+
+# ─── Wire format ──────────────────────────────────────────────────────────────
+# frame = 4-byte big-endian header length + JSON header + raw body bytes
+
+def _pack(header: dict, body: bytes = b"") -> bytes:
+    raw = json.dumps(header).encode()
+    return struct.pack(">I", len(raw)) + raw + body
+
+
+def _pack_array(vectors: np.ndarray) -> bytes:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return _pack({"status": "ok", "shape": list(vectors.shape)}, vectors.tobytes())
+
+
+def _unpack(frame: bytes) -> tuple[dict, bytes]:
+    if len(frame) < 4:
+        raise ValueError("short frame")
+    (n,) = struct.unpack(">I", frame[:4])
+    header = json.loads(frame[4:4 + n])
+    if not isinstance(header, dict):
+        raise ValueError("header must be an object")
+    return header, frame[4 + n:]
+
+
+# ─── Entry point ──────────────────────────────────────────────────────────────
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    from src.vector_store import MODEL_NAME, _create_st_model
+
+    if not AUTHKEY:
+        sys.exit("[embed_server] Set SYNAPSE_EMBED_AUTHKEY to a random secret shared with the clients")
+    model = _create_st_model()
+    if model is None:
+        sys.exit("[embed_server] sentence-transformers is required to run the embedding server")
+    address = os.getenv("SYNAPSE_EMBED_SERVER") or DEFAULT_ADDRESS
+    EmbedServer(model, MODEL_NAME).serve_forever(address)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+embedding_cache.py — Content-addressed, memory-mapped embedding cache
+-----------------------------------------------------------------------
+Most chunks repeat across questions (the same Wikipedia paragraph shows up
+again and again), and MiniLM encoding is the largest CPU cost per request.
+Each chunk text is hashed together with the model name into a 64-bit key;
+vectors are appended to a flat float32 file and looked up through a sorted
+key index. Every file is opened with np.memmap, so a lookup is a binary
+search plus a row gather — nothing is deserialised and the OS page cache
+keeps hot rows resident across processes.
+
+Layout (per model, under SYNAPSE_CACHE_DIR/embeddings/<model>/):
+  vectors.f32       N × dim float32 rows, append-only
+  keys.u64          N uint64 keys in row order, append-only
+  sorted.idx        the N keys sorted (uint64), then each one's row (uint32);
+                    new keys are merged in and the file is swapped with a
+                    single os.replace, so readers never see keys and rows
+                    from different versions
+  meta.json         {"model", "dim"}
+
+Writers take an exclusive file lock, so several API workers can share one
+cache directory; readers take no lock.
+
+Configuration (.env):
+  SYNAPSE_EMBED_CACHE   "0" disables the cache (default on)
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+
+from src.cache_db import cache_path
+
+try:
+    import fcntl
+except ImportError:          # Windows — in-process lock only
+    fcntl = None
+
+ENABLED = os.getenv("SYNAPSE_EMBED_CACHE", "1") != "0"
+
+_INDEX_ENTRY = 8 + 4       # bytes per key in sorted.idx (uint64 key + uint32 row)
+
+
+class EmbeddingCache:
+    """Disk-backed text → vector cache for one embedding model."""
+
+    def __init__(self, model_name: str, dim: int):
+        self.model_name = model_name
+        self.dim = dim
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.dir = cache_path(os.path.join("embeddings", safe))
+        os.makedirs(self.dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._n = -1
+        self._check_meta()
+        self._open()
+
+    # ─── Public API ──────────────────────────────────────────────────────────
+
+    def keys_for(self, texts: list[str]) -> np.ndarray:
+        """Stable 64-bit content hash of (model name, text) for each text."""
+        prefix = self.model_name.encode() + b"\0"
+        return np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(prefix + t.encode("utf-8"), digest_size=8).digest(), "little")
+                for t in texts
+            ),
+            dtype=np.uint64,
+            count=len(texts),
+        )
+
+    def lookup(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (vectors, hit_mask). Rows of `vectors` where hit_mask is False
+        are zeros and must be filled by the caller.
+        """
+        keys = self.keys_for(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        with self._lock:
+            self._refresh_if_grown()
+            if self._n == 0:
+                return out, np.zeros(len(texts), dtype=bool)
+            pos = np.searchsorted(self._sorted_keys, keys)
+            pos_c = np.minimum(pos, self._n - 1)
+            hit = (pos < self._n) & (self._sorted_keys[pos_c] == keys)
+            if hit.any():
+                rows = self._sorted_rows[pos_c[hit]]
+                out[hit] = self._vectors[rows]
+        return out, hit
+
+    def add(self, texts: list[str], vectors: np.ndarray) -> None:
+        """Append vectors for texts not already cached."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim or not len(texts):
+            return
+        keys = self.keys_for(texts)
+        with self._lock, _FileLock(os.path.join(self.dir, "write.lock")):
+            self._refresh_if_grown()
+            # Drop keys already on disk and duplicates within this batch
+            _, first = np.unique(keys, return_index=True)
+            first.sort()
+            keys, vectors = keys[first], vectors[first]
+            if self._n:
+                pos = np.minimum(np.searchsorted(self._sorted_keys, keys), self._n - 1)
+                new = self._sorted_keys[pos] != keys
+                keys, vectors = keys[new], vectors[new]
+            if not len(keys):
+                return
+
+            # Rows past the index are left over from a crashed append — drop them
+            n = self._n
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.truncate(n * self.dim * 4)
+                f.write(vectors.tobytes())
+            with open(self._path("keys.u64"), "ab") as f:
+                f.truncate(n * 8)
+                f.write(keys.tobytes())
+
+            # Merge the sorted new keys into the sorted index: O(N + m log m)
+            order = np.argsort(keys, kind="stable")
+            new_keys = keys[order]
+            new_rows = (n + order).astype(np.uint32)
+            at = np.searchsorted(self._sorted_keys, new_keys)
+            merged_keys = np.insert(np.asarray(self._sorted_keys), at, new_keys)
+            merged_rows = np.insert(np.asarray(self._sorted_rows), at, new_rows)
+            tmp = self._path("sorted.idx.tmp")
+            with open(tmp, "wb") as f:
+                f.write(merged_keys.tobytes())
+                f.write(merged_rows.tobytes())
+            os.replace(tmp, self._path("sorted.idx"))
+            self._open()
+
+    def __len__(self) -> int:
+        return max(self._n, 0)
+
+    # ─── Internal helpers ────────────────────────────────────────────────────
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _check_meta(self):
+        meta_path = self._path("meta.json")
+        meta = {"model": self.model_name, "dim": self.dim}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                if json.load(f) == meta:
+                    return
+            # Different model/dim under the same name — start over
+            for name in ("vectors.f32", "keys.u64", "sorted.idx"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def _indexed_count(self) -> int:
+        return _file_size(self._path("sorted.idx")) // _INDEX_ENTRY
+
+    def _refresh_if_grown(self):
+        if self._indexed_count() != self._n:
+            self._open()
+
+    def _open(self):
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_rows = np.zeros(0, dtype=np.uint32)
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._n = 0
+        try:
+            f = open(self._path("sorted.idx"), "rb")
+        except OSError:
+            return
+        # Both index views are mapped from one open file, so a concurrent
+        # os.replace can't hand us keys from one version and rows from another
+        with f:
+            n = os.fstat(f.fileno()).st_size // _INDEX_ENTRY
+            n_vec = _file_size(self._path("vectors.f32")) // (4 * self.dim)
+            if n == 0 or n_vec < n:
+                return    # empty, or the index points past the vector file (truncated)
+            self._sorted_keys = np.memmap(f, dtype=np.uint64, mode="r", shape=(n,))
+            self._sorted_rows = np.memmap(f, dtype=np.uint32, mode="r", offset=8 * n, shape=(n,))
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(n_vec, self.dim))
+        self._n = n
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class _FileLock:
+    """Exclusive advisory lock held for the duration of an append."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._f = open(self.path, "a")
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+            self._f.close()
+            self._f = None
+
+
+_caches: dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(model_name: str, dim: int) -> EmbeddingCache | None:
+    """Shared cache instance for a model, or None when disabled/unavailable."""
+    if not ENABLED:
+        return None
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            try:
+                cache = _caches[model_name] = EmbeddingCache(model_name, dim)
+            except Exception as e:
+                print(f"[embedding_cache] disabled ({str(e)[:60]})")
+                return None
+        return cache
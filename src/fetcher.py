@@ -0,0 +1,211 @@
+"""
+fetcher.py — Process-wide shared page fetcher
+-----------------------------------------------
+Every research run used to spin up its own 8-thread pool and call bare
+requests.get(), so N concurrent runs meant 8×N threads and a fresh
+TCP+TLS handshake per page. This module owns one of each for the whole
+process instead:
+
+  - a global worker pool that every fetch_and_clean() call submits to
+  - one requests.Session with pooled keep-alive connections
+  - a global limit on in-flight downloads
+  - a per-host cap so one slow site can't take every slot (a host's
+    semaphore exists only while some download holds or waits on it, so
+    a long-running process doesn't keep one per host it ever contacted)
+
+The async scraper path shares the same limits through async_slot(), and
+stats() reports pool utilisation for the API's /stats endpoint.
+
+Configuration (.env):
+  SYNAPSE_FETCH_WORKERS        worker threads (default 32)
+  SYNAPSE_FETCH_MAX_IN_FLIGHT  concurrent downloads, all hosts (default 64)
+  SYNAPSE_FETCH_PER_HOST       concurrent downloads per host (default 4)
+"""
+
+import os
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager, asynccontextmanager
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+WORKERS = int(os.getenv("SYNAPSE_FETCH_WORKERS", "32"))
+MAX_IN_FLIGHT = int(os.getenv("SYNAPSE_FETCH_MAX_IN_FLIGHT", "64"))
+PER_HOST = int(os.getenv("SYNAPSE_FETCH_PER_HOST", "4"))
+
+
+class PageFetcher:
+    """Shared worker pool + keep-alive session with global and per-host caps."""
+
+    def __init__(self, workers: int = WORKERS, max_in_flight: int = MAX_IN_FLIGHT, per_host: int = PER_HOST):
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_in_flight, pool_maxsize=per_host, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Shared across unrelated runs — never carry cookies from one page to the next
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._hosts = _HostSemaphores(lambda: threading.BoundedSemaphore(per_host))
+        self._async_in_flight: asyncio.Semaphore | None = None
+        self._async_hosts = _HostSemaphores(lambda: asyncio.Semaphore(per_host))
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._downloading = 0
+        self._host_counts: dict[str, int] = defaultdict(int)
+        self._completed = 0
+
+    # ─── Worker pool ─────────────────────────────────────────────────────────
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Run fn on the shared pool, tracking queued/active counts."""
+        with self._lock:
+            self._queued += 1
+
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+
+        return self._executor.submit(run)
+
+    # ─── Download slots ──────────────────────────────────────────────────────
+
+    @contextmanager
+    def slot(self, url: str):
+        """Hold a global and a per-host download slot (threaded path)."""
+        host = _host(url)
+        with self._hosts.use(host) as host_sem, self._in_flight, host_sem:
+            self._enter(host)
+            try:
+                yield
+            finally:
+                self._leave(host)
+
+    @asynccontextmanager
+    async def async_slot(self, url: str):
+        """Hold a global and a per-host download slot (event-loop path)."""
+        host = _host(url)
+        if self._async_in_flight is None:
+            self._async_in_flight = asyncio.Semaphore(self.max_in_flight)
+        with self._async_hosts.use(host) as host_sem:
+            async with self._async_in_flight, host_sem:
+                self._enter(host)
+                try:
+                    yield
+                finally:
+                    self._leave(host)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """session.get() inside a download slot."""
+        with self.slot(url):
+            return self.session.get(url, **kwargs)
+
+    @contextmanager
+    def open(self, url: str, **kwargs):
+        """
+        Streaming session.get(): yields the response with only headers read.
+        The download slot is held until the caller has finished with the body.
+        """
+        with self.slot(url):
+            response = self.session.get(url, stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+    # ─── Stats ───────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            busiest = sorted(self._host_counts.items(), key=lambda kv: -kv[1])[:5]
+            return {
+                "workers": self.workers,
+                "active_workers": self._active,
+                "queued": self._queued,
+                "worker_utilization": round(self._active / self.workers, 3),
+                "in_flight": self._downloading,
+                "max_in_flight": self.max_in_flight,
+                "per_host_cap": self.per_host,
+                "busiest_hosts": dict(busiest),
+                "completed": self._completed,
+            }
+
+    def _enter(self, host: str):
+        with self._lock:
+            self._downloading += 1
+            self._host_counts[host] += 1
+
+    def _leave(self, host: str):
+        with self._lock:
+            self._downloading -= 1
+            self._host_counts[host] -= 1
+            if not self._host_counts[host]:
+                del self._host_counts[host]
+
+
+class _HostSemaphores:
+    """Per-host semaphores, each dropped once no caller holds or waits on it."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._entries: dict[str, list] = {}    # host → [semaphore, users]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, host: str):
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                entry = self._entries[host] = [self._factory(), 0]
+            entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._entries[host]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+_fetcher: PageFetcher | None = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> PageFetcher:
+    """The process-wide PageFetcher (created on first use)."""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = PageFetcher()
+    return _fetcher
+
+
+def stats() -> dict:
+    return get_fetcher().stats()
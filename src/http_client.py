@@ -0,0 +1,46 @@
+"""
+http_client.py — Shared async HTTP client
+-------------------------------------------
+One pooled httpx.AsyncClient per event loop, reused by the async search
+and scraper entry points so that every in-flight research job shares the
+same keep-alive connections instead of opening its own.
+
+The client is created lazily on first use from inside a running loop and
+closed by the API's shutdown hook via close_async_client().
+"""
+
+import os
+import asyncio
+import httpx
+
+MAX_CONNECTIONS = int(os.getenv("SYNAPSE_HTTP_MAX_CONNECTIONS", "200"))
+MAX_KEEPALIVE = int(os.getenv("SYNAPSE_HTTP_MAX_KEEPALIVE", "50"))
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide async client bound to the running event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(15.0),
+            follow_redirects=True,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_async_client() -> None:
+    """Close the shared client (call on application shutdown)."""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -0,0 +1,181 @@
+"""
+jobs.py — Background research jobs for the API
+------------------------------------------------
+POST /research holds its connection open for the whole ~30 s pipeline, so
+client timeouts, proxies and retries turn into duplicate runs. Jobs decouple
+the two: submit() returns a Job immediately and a fixed pool of asyncio
+workers runs queued jobs in order.
+
+  Queue     — bounded asyncio.Queue; submit() raises QueueFull when it is
+              full (the API answers 429), so overload is refused up front
+              instead of piling up
+  Workers   — MAX_WORKERS coroutines on the API's event loop, i.e. at most
+              that many pipelines in flight per process
+  Progress  — a running job appends stage events via job.progress(...)
+  Cancel    — queued jobs are skipped; running ones have their task cancelled
+  Store     — finished jobs (result or error) stay in memory for TTL seconds
+
+Configuration (.env):
+  SYNAPSE_JOB_WORKERS   concurrent jobs per process (default 4)
+  SYNAPSE_JOB_QUEUE     max queued jobs (default 100)
+  SYNAPSE_JOB_TTL       seconds a finished job is kept (default 3600)
+"""
+
+import os
+import time
+import uuid
+import asyncio
+
+MAX_WORKERS = int(os.getenv("SYNAPSE_JOB_WORKERS", "4"))
+MAX_QUEUE = int(os.getenv("SYNAPSE_JOB_QUEUE", "100"))
+TTL_SECONDS = float(os.getenv("SYNAPSE_JOB_TTL", "3600"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+QueueFull = asyncio.QueueFull
+
+
+class Job:
+    """One submitted run: status, stage events, and its result or error."""
+
+    def __init__(self, runner):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.stages: list[dict] = []
+        self.result = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self._runner = runner
+        self._task: asyncio.Task | None = None
+        self._cancel_requested = False
+
+    def progress(self, stage: str, **data) -> None:
+        """Record that `stage` finished (called by the runner)."""
+        self.stages.append({"stage": stage, "elapsed": round(time.time() - (self.started_at or self.created_at), 2), **data})
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Bounded queue + fixed worker pool + in-memory TTL store."""
+
+    def __init__(self, workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE, ttl: float = TTL_SECONDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self._jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._stopping = False
+
+    async def start(self) -> None:
+        """Start the workers on the running loop (call from the API lifespan)."""
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for job in self._jobs.values():
+            if job.status not in FINISHED:
+                self._cancel(job)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, runner) -> Job:
+        """
+        Queue `runner(job)` — a coroutine function returning the job's result.
+        Raises QueueFull when MAX_QUEUE jobs are already waiting.
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager.start() has not been called")
+        self._purge()
+        job = Job(runner)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED:
+            self._cancel(job)
+        return job
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_size": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "jobs": counts,
+        }
+
+    # ─── Internal helpers ────────────────────────────────────────────────────
+
+    def _cancel(self, job: Job) -> None:
+        job._cancel_requested = True
+        job.status = CANCELLED
+        job.finished_at = time.time()
+        if job._task is not None:
+            job._task.cancel()
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == CANCELLED:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+                job._task = asyncio.create_task(job._runner(job))
+                try:
+                    result = await job._task
+                    # A cancel that lands after the task finished, but before
+                    # this worker resumed, still wins
+                    if job.status == RUNNING:
+                        job.result = result
+                        job.status = DONE
+                except asyncio.CancelledError:
+                    job.status = CANCELLED
+                    # DELETE /jobs/{id} only cancels the job task; if the worker
+                    # itself is being cancelled (stop() or loop shutdown), let it exit
+                    if self._stopping or not job._cancel_requested:
+                        raise
+                except Exception as e:
+                    if job.status == RUNNING:
+                        job.error = getattr(e, "detail", None) or str(e) or type(e).__name__
+                        job.status = FAILED
+                        print(f"[jobs] Job {job.id} failed: {job.error[:80]}")
+                finally:
+                    job.finished_at = job.finished_at or time.time()
+                    job._task = None
+            finally:
+                self._queue.task_done()
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.ttl
+        expired = [jid for jid, job in self._jobs.items()
+                   if job.status in FINISHED and job.finished_at and job.finished_at < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
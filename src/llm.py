@@ -0,0 +1,204 @@
+"""
+llm.py — Shared Groq chat clients
+-----------------------------------
+Query planning, report synthesis and the mind-map subtopics each used to
+import langchain_groq and build a fresh ChatGroq per call (after rewriting
+os.environ["GROQ_API_KEY"]), so every call paid client setup and a new
+TLS connection to the Groq endpoint. Clients now come from here:
+
+  Profiles  — one ChatGroq per call site profile (temperature, max_tokens),
+              built once per process through the resource registry
+  Pooling   — every profile shares one keep-alive httpx.Client (sync calls)
+              and one httpx.AsyncClient (async calls)
+  Streaming — stream()/astream() yield text as tokens arrive
+  Stats     — every call records latency (and time to first token when
+              streaming) and prompt/completion tokens per profile;
+              stats() summarises them for /stats
+
+Configuration (.env):
+  GROQ_API_KEY            required
+  SYNAPSE_LLM_MODEL       chat model for every profile (default llama-3.3-70b-versatile)
+  SYNAPSE_LLM_TIMEOUT     per-request timeout in seconds (default 60)
+  SYNAPSE_LLM_RETRIES     client retries on transient errors (default 2)
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+import httpx
+from dotenv import load_dotenv
+load_dotenv()
+
+from src import resources
+
+MODEL = os.getenv("SYNAPSE_LLM_MODEL", "llama-3.3-70b-versatile")
+TIMEOUT = float(os.getenv("SYNAPSE_LLM_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("SYNAPSE_LLM_RETRIES", "2"))
+
+PROFILES = {
+    "planner":     {"temperature": 0.3, "max_tokens": 256},
+    "report":      {"temperature": 0.3, "max_tokens": 1800},
+    "report_deep": {"temperature": 0.3, "max_tokens": 3000},
+    "subtopics":   {"temperature": 0.4, "max_tokens": 600},
+}
+
+_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120)
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+
+
+# ─── Clients ──────────────────────────────────────────────────────────────────
+
+def get_llm(profile: str):
+    """The process-wide ChatGroq for `profile` (see PROFILES)."""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown LLM profile {profile!r}")
+    if not os.getenv("GROQ_API_KEY"):
+        raise EnvironmentError("GROQ_API_KEY is not set.")
+    llm = resources.get(f"llm:{profile}", lambda: _create_llm(profile))
+    if llm is None:
+        raise RuntimeError(f"Could not create the {profile} LLM client")
+    return llm
+
+
+def _create_llm(profile: str):
+    from langchain_groq import ChatGroq
+
+    sync_client, async_client = resources.get("llm_http", _create_http_clients)
+    return ChatGroq(
+        model=MODEL,
+        api_key=os.getenv("GROQ_API_KEY"),
+        timeout=TIMEOUT,
+        max_retries=MAX_RETRIES,
+        http_client=sync_client,
+        http_async_client=async_client,
+        **PROFILES[profile],
+    )
+
+
+def _create_http_clients():
+    return (
+        httpx.Client(limits=_LIMITS, timeout=TIMEOUT),
+        httpx.AsyncClient(limits=_LIMITS, timeout=TIMEOUT),
+    )
+
+
+# ─── Calls ────────────────────────────────────────────────────────────────────
+
+def invoke(profile: str, messages):
+    """llm.invoke(messages) on the shared client, recording latency and tokens."""
+    llm = get_llm(profile)
+    start = time.perf_counter()
+    try:
+        response = llm.invoke(messages)
+    except Exception:
+        _record(profile, time.perf_counter() - start, None, error=True)
+        raise
+    _record(profile, time.perf_counter() - start, response)
+    return response
+
+
+async def ainvoke(profile: str, messages):
+    """Async twin of invoke()."""
+    llm = get_llm(profile)
+    start = time.perf_counter()
+    try:
+        response = await llm.ainvoke(messages)
+    except Exception:
+        _record(profile, time.perf_counter() - start, None, error=True)
+        raise
+    _record(profile, time.perf_counter() - start, response)
+    return response
+
+
+def stream(profile: str, messages):
+    """Yield the response text piece by piece as the model produces it."""
+    llm = get_llm(profile)
+    start = time.perf_counter()
+    first = None
+    message = None
+    try:
+        for chunk in llm.stream(messages):
+            message = chunk if message is None else message + chunk
+            if chunk.content:
+                first = first or time.perf_counter() - start
+                yield chunk.content
+    except Exception:
+        _record(profile, time.perf_counter() - start, None, error=True)
+        raise
+    _record(profile, time.perf_counter() - start, message, first_token=first)
+
+
+async def astream(profile: str, messages):
+    """Async twin of stream()."""
+    llm = get_llm(profile)
+    start = time.perf_counter()
+    first = None
+    message = None
+    try:
+        async for chunk in llm.astream(messages):
+            message = chunk if message is None else message + chunk
+            if chunk.content:
+                first = first or time.perf_counter() - start
+                yield chunk.content
+    except Exception:
+        _record(profile, time.perf_counter() - start, None, error=True)
+        raise
+    _record(profile, time.perf_counter() - start, message, first_token=first)
+
+
+# ─── Stats ────────────────────────────────────────────────────────────────────
+
+def stats() -> dict:
+    """Per-profile call counts, errors, token totals and latency percentiles."""
+    with _stats_lock:
+        out = {}
+        for profile, s in _stats.items():
+            lat = sorted(s["latencies"])
+            ttft = sorted(s["first_token"])
+            out[profile] = {
+                "calls": s["calls"],
+                "errors": s["errors"],
+                "prompt_tokens": s["prompt_tokens"],
+                "completion_tokens": s["completion_tokens"],
+                "avg_seconds": round(s["seconds"] / s["calls"], 3) if s["calls"] else None,
+                "p50_seconds": _percentile(lat, 0.50),
+                "p95_seconds": _percentile(lat, 0.95),
+                "p50_first_token_seconds": _percentile(ttft, 0.50),
+            }
+        return {"model": MODEL, "profiles": out}
+
+
+def _percentile(values: list[float], p: float) -> float | None:
+    return round(values[min(len(values) - 1, int(p * len(values)))], 3) if values else None
+
+
+def _record(profile: str, seconds: float, response, error: bool = False, first_token: float | None = None):
+    prompt, completion = _usage(response)
+    with _stats_lock:
+        s = _stats.setdefault(profile, {
+            "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "seconds": 0.0, "latencies": deque(maxlen=500), "first_token": deque(maxlen=500),
+        })
+        s["calls"] += 1
+        s["errors"] += error
+        s["prompt_tokens"] += prompt
+        s["completion_tokens"] += completion
+        s["seconds"] += seconds
+        s["latencies"].append(seconds)
+        if first_token is not None:
+            s["first_token"].append(first_token)
+
+
+def _usage(response) -> tuple[int, int]:
+    """(prompt, completion) tokens from a LangChain message, 0 when not reported."""
+    if response is None:
+        return 0, 0
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
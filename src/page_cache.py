@@ -0,0 +1,207 @@
+"""
+page_cache.py — Persistent on-disk page cache for the scraper
+---------------------------------------------------------------
+Stores the raw HTML and the cleaned _clean_html() text of every fetched
+page, keyed by canonical URL, so popular sources (Wikipedia, Nature,
+NIH, ...) are not downloaded and re-parsed for every question.
+
+  - Fresh entries (younger than the TTL) are served without any network I/O
+  - Stale entries are revalidated with If-None-Match / If-Modified-Since;
+    a 304 refreshes the entry and reuses the stored text
+  - Total stored bytes are capped; least-recently-used pages are evicted.
+    The total is kept in a one-row table by triggers, so a put() never
+    has to SUM the whole table (and every process sharing the file agrees)
+
+Configuration (.env):
+  SYNAPSE_PAGE_CACHE         "0" disables the cache (default on)
+  SYNAPSE_PAGE_CACHE_TTL     freshness window in seconds (default 86400)
+  SYNAPSE_PAGE_CACHE_MAX_MB  size cap in megabytes (default 200)
+"""
+
+import os
+import time
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from src.cache_db import connect
+
+ENABLED = os.getenv("SYNAPSE_PAGE_CACHE", "1") != "0"
+TTL_SECONDS = float(os.getenv("SYNAPSE_PAGE_CACHE_TTL", "86400"))
+MAX_BYTES = int(float(os.getenv("SYNAPSE_PAGE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+_DB_FILE = "pages.sqlite3"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url           TEXT PRIMARY KEY,
+    html          TEXT NOT NULL,
+    text          TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched_at    REAL NOT NULL,
+    accessed_at   REAL NOT NULL,
+    size          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id     INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM pages;
+CREATE TRIGGER IF NOT EXISTS pages_added AFTER INSERT ON pages
+    BEGIN UPDATE totals SET bytes = bytes + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS pages_removed AFTER DELETE ON pages
+    BEGIN UPDATE totals SET bytes = bytes - OLD.size; END;
+-- INSERT OR REPLACE only fires the delete trigger for the old row with this on
+PRAGMA recursive_triggers = ON;
+"""
+
+# Known tracking parameters — they never change page content. Generic names
+# like "ref" are kept: GitHub and many CMSs use ?ref= to pick a branch or revision.
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "igshid",
+    "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "ref_src",
+}
+
+# Outcome labels stored on each page dict under "cache"
+HIT, REVALIDATED, STALE, MISS = "hit", "revalidated", "stale", "miss"
+
+_lock = threading.Lock()
+_counters = {HIT: 0, REVALIDATED: 0, STALE: 0, MISS: 0}
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+
+def canonical_url(url: str) -> str:
+    """
+    Normalise a URL so trivially different spellings share one cache entry:
+    lowercase scheme/host, no default port, no fragment, no tracking params,
+    sorted query string, no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def get(url: str) -> dict | None:
+    """Return the cached entry for a URL (fresh or stale), or None."""
+    if not ENABLED:
+        return None
+    key = canonical_url(url)
+    try:
+        conn = _conn()
+        row = conn.execute(
+            "SELECT html, text, etag, last_modified, fetched_at FROM pages WHERE url = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key))
+    except Exception as e:
+        print(f"[page_cache] read failed: {str(e)[:60]}")
+        return None
+
+    html, text, etag, last_modified, fetched_at = row
+    return {
+        "html": html,
+        "text": text,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": fetched_at,
+    }
+
+
+def is_fresh(entry: dict) -> bool:
+    return time.time() - entry["fetched_at"] < TTL_SECONDS
+
+
+def validators(entry: dict | None) -> dict:
+    """Conditional-request headers for revalidating a stale entry."""
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def put(url: str, html: str, text: str, etag: str | None = None, last_modified: str | None = None) -> None:
+    """Store a freshly downloaded page, then evict LRU entries over the size cap."""
+    if not ENABLED:
+        return
+    now = time.time()
+    size = len(html.encode("utf-8", "ignore")) + len(text.encode("utf-8", "ignore"))
+    if size > MAX_BYTES:
+        return
+    try:
+        conn = _conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, html, text, etag, last_modified, fetched_at, accessed_at, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (canonical_url(url), html, text, etag, last_modified, now, now, size),
+        )
+        _evict(conn)
+    except Exception as e:
+        print(f"[page_cache] write failed: {str(e)[:60]}")
+
+
+def mark_revalidated(url: str) -> None:
+    """The origin answered 304 — restart the entry's freshness window."""
+    if not ENABLED:
+        return
+    now = time.time()
+    try:
+        _conn().execute(
+            "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+            (now, now, canonical_url(url)),
+        )
+    except Exception as e:
+        print(f"[page_cache] write failed: {str(e)[:60]}")
+
+
+def record(outcome: str) -> None:
+    with _lock:
+        _counters[outcome] = _counters.get(outcome, 0) + 1
+
+
+def stats() -> dict:
+    """Process-lifetime outcome counters."""
+    with _lock:
+        return dict(_counters)
+
+
+def summarize(pages: list[dict]) -> tuple[int, int]:
+    """(hits, misses) for one run's pages. Revalidated and stale reuse count as hits."""
+    hits = sum(1 for p in pages if p.get("cache") in (HIT, REVALIDATED, STALE))
+    misses = sum(1 for p in pages if p.get("cache") == MISS)
+    return hits, misses
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _conn():
+    return connect(_DB_FILE, _SCHEMA)
+
+
+def _evict(conn) -> None:
+    total = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    rows = conn.execute("SELECT url, size FROM pages ORDER BY accessed_at ASC").fetchall()
+    doomed = []
+    for url, size in rows:
+        if total <= MAX_BYTES:
+            break
+        doomed.append((url,))
+        total -= size
+    conn.executemany("DELETE FROM pages WHERE url = ?", doomed)
+    print(f"[page_cache] Evicted {len(doomed)} least-recently-used pages")
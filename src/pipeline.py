@@ -0,0 +1,172 @@
+"""
+pipeline.py — Overlapped scrape → chunk → embed stage
+-------------------------------------------------------
+Instead of waiting for the slowest page before chunking and embedding
+everything in one pass, each page is chunked the moment it arrives and
+its chunks are embedded in micro-batches while the remaining pages are
+still downloading. When the last page lands only a final partial batch
+is left to encode, so retrieval can start almost immediately.
+
+If the ST model is unavailable the chunks are still collected as pages
+arrive, and the TF-IDF fallback is built over the full corpus at the end.
+
+Between chunking and embedding, a NearDuplicateFilter (dedup.py) drops
+mirrored pages and near-identical chunks, so copies are never embedded.
+Pass your own filter to read its removal counts afterwards.
+
+Pages can also come from a speculative fetch (speculation.py) that began
+before query planning finished; only the URLs it isn't already fetching
+are requested again.
+"""
+
+import asyncio
+import numpy as np
+
+from src.scraper import iter_fetch_and_clean, iter_fetch_and_clean_async
+from src.chunker import make_splitter, chunk_page
+from src.dedup import NearDuplicateFilter, ENABLED as DEDUP_ENABLED
+from src.vector_store import embed_texts, build_store, VectorStore
+
+EMBED_BATCH_SIZE = 32   # Chunks per micro-batch
+
+
+# ─── Public entry points ──────────────────────────────────────────────────────
+
+def stream_pages_to_store(
+    search_results: list[dict],
+    batch_size: int = EMBED_BATCH_SIZE,
+    on_page=None,
+    dedup: NearDuplicateFilter | None = None,
+    speculative=None,
+) -> tuple[list[dict], list[dict], VectorStore]:
+    """
+    Fetch, clean, chunk and embed search results with the stages overlapped.
+
+    Args:
+        search_results: List from search.py [{title, url, description, ...}]
+        batch_size:     Chunks per embedding micro-batch
+        on_page:        Optional callback(page, pages_done, chunks_so_far)
+        dedup:          Near-duplicate filter (default: a fresh one unless
+                        SYNAPSE_DEDUP=0)
+        speculative:    Optional SpeculativeFetch already fetching part of
+                        search_results; its pages are consumed, not refetched
+
+    Returns:
+        (pages, chunks, store) — same shapes as fetch_and_clean(),
+        chunk_pages() and embed_and_store()
+    """
+    splitter = make_splitter()
+    pages, chunks, vectors = [], [], []
+    pending: list[dict] = []
+    dense = True
+
+    def flush(batch: list[dict]):
+        nonlocal dense
+        if not dense or not batch:
+            return
+        emb = embed_texts([c["text"] for c in batch])
+        if emb is None:
+            dense = False
+        else:
+            vectors.append(emb)
+
+    dedup = _filter(dedup)
+    if speculative is not None:
+        speculative.fetch(search_results)
+        page_source = speculative.pages()
+    else:
+        page_source = iter_fetch_and_clean(search_results)
+    for page in page_source:
+        pages.append(page)
+        new_chunks = _chunk(page, splitter, dedup)
+        chunks.extend(new_chunks)
+        pending.extend(new_chunks)
+        while len(pending) >= batch_size:
+            flush(pending[:batch_size])
+            del pending[:batch_size]
+        if on_page:
+            on_page(page, len(pages), len(chunks))
+
+    flush(pending)
+    return pages, chunks, _finish(pages, chunks, vectors if dense else None)
+
+
+async def stream_pages_to_store_async(
+    search_results: list[dict],
+    batch_size: int = EMBED_BATCH_SIZE,
+    dedup: NearDuplicateFilter | None = None,
+    on_page=None,
+    speculative=None,
+) -> tuple[list[dict], list[dict], VectorStore]:
+    """
+    Async twin of stream_pages_to_store(). Each full micro-batch is sent to
+    the default executor immediately and downloads keep going on the loop;
+    all batches are gathered once the last page has been chunked. `on_page`
+    is called on the loop, so it must not block; `speculative` is an
+    AsyncSpeculativeFetch.
+    """
+    loop = asyncio.get_running_loop()
+    splitter = make_splitter()
+    pages, chunks = [], []
+    pending: list[dict] = []
+    batches: list[asyncio.Future] = []
+
+    def submit(batch: list[dict]):
+        texts = [c["text"] for c in batch]
+        batches.append(loop.run_in_executor(None, embed_texts, texts))
+
+    dedup = _filter(dedup)
+    if speculative is not None:
+        speculative.fetch(search_results)
+        page_source = speculative.pages()
+    else:
+        page_source = iter_fetch_and_clean_async(search_results)
+    async for page in page_source:
+        pages.append(page)
+        new_chunks = _chunk(page, splitter, dedup)
+        chunks.extend(new_chunks)
+        pending.extend(new_chunks)
+        while len(pending) >= batch_size:
+            submit(pending[:batch_size])
+            del pending[:batch_size]
+        if on_page:
+            on_page(page, len(pages), len(chunks))
+
+    if pending:
+        submit(pending)
+
+    vectors = list(await asyncio.gather(*batches))
+    if any(v is None for v in vectors):
+        vectors = None
+
+    store = await loop.run_in_executor(None, _finish, pages, chunks, vectors)
+    return pages, chunks, store
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _filter(dedup: NearDuplicateFilter | None) -> NearDuplicateFilter | None:
+    if dedup is None and DEDUP_ENABLED:
+        return NearDuplicateFilter()
+    return dedup
+
+
+def _chunk(page: dict, splitter, dedup: NearDuplicateFilter | None) -> list[dict]:
+    """Chunk one page, skipping mirrored pages and near-duplicate chunks."""
+    if dedup is None:
+        return chunk_page(page, splitter)
+    if page.get("status") == "success":
+        original = dedup.check_page(page)
+        if original is not None:
+            page["duplicate_of"] = original
+            return []
+    return dedup.filter_chunks(chunk_page(page, splitter))
+
+
+def _finish(pages: list[dict], chunks: list[dict], vectors: list[np.ndarray] | None) -> VectorStore:
+    success_count = sum(1 for p in pages if p["status"] == "success")
+    dupes = sum(1 for p in pages if "duplicate_of" in p)
+    print(f"[pipeline.py] {success_count}/{len(pages)} pages extracted ({dupes} mirrors skipped), "
+          f"{len(chunks)} chunks streamed")
+    embeddings = np.vstack(vectors) if vectors else None
+    return build_store(chunks, embeddings)
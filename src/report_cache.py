@@ -0,0 +1,202 @@
+"""
+report_cache.py — Semantic cache of finished reports
+------------------------------------------------------
+Users ask the same questions in different words ("how does CRISPR work"
+vs "how does CRISPR gene editing work?"), and each phrasing used to run
+the full ~30 s pipeline. Finished reports are stored in SQLite together
+with the MiniLM embedding of their query:
+
+  lookup  — the incoming query is embedded with the already-loaded model
+            and compared (one matrix product) against every stored query
+            with the same deep_mode and run parameters (retrieval mode,
+            top_k, results per query, prompt compression — hashed into
+            one key); the best match above THRESHOLD that is younger than
+            TTL is served
+  store   — adds a report; expired rows are dropped and, past MAX_ENTRIES,
+            the least recently served ones are evicted
+
+The query vectors are mirrored in an in-memory matrix that is reloaded
+whenever the table changes (including writes from other processes).
+Without sentence-transformers only exact repeats (after search_cache's
+query normalisation) are served; rows stored that way are embedded on
+the first lookup that has a model, so they become semantic hits too.
+
+Payloads are plain dicts with the /research response fields, so reports
+stored by the API are served by the app and vice versa.
+
+Configuration (.env):
+  SYNAPSE_REPORT_CACHE            "0" disables the cache (default on)
+  SYNAPSE_REPORT_CACHE_THRESHOLD  cosine similarity needed for a hit (default 0.92)
+  SYNAPSE_REPORT_CACHE_TTL        freshness window in seconds (default 86400 = 24 h)
+  SYNAPSE_REPORT_CACHE_MAX        max stored reports (default 1000)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+from src.cache_db import connect
+from src.search_cache import normalize_query
+from src.vector_store import encode_normalized
+
+ENABLED = os.getenv("SYNAPSE_REPORT_CACHE", "1") != "0"
+THRESHOLD = float(os.getenv("SYNAPSE_REPORT_CACHE_THRESHOLD", "0.92"))
+TTL_SECONDS = float(os.getenv("SYNAPSE_REPORT_CACHE_TTL", "86400"))
+MAX_ENTRIES = int(os.getenv("SYNAPSE_REPORT_CACHE_MAX", "1000"))
+
+_DB_FILE = "reports.v2.sqlite3"   # v2 added params; v1 rows can't say what settings they ran with
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    query       TEXT NOT NULL,
+    normalized  TEXT NOT NULL,
+    deep_mode   INTEGER NOT NULL,
+    params      TEXT NOT NULL,
+    embedding   BLOB,
+    payload     TEXT NOT NULL,
+    stored_at   REAL NOT NULL,
+    last_hit    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_normalized ON reports (normalized, deep_mode, params);
+CREATE INDEX IF NOT EXISTS reports_last_hit ON reports (last_hit);
+"""
+
+_lock = threading.Lock()
+_index: dict | None = None     # in-memory mirror of (id, deep_mode, params, stored_at, embedding)
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+
+def lookup(query: str, deep_mode: bool = False, params: dict | None = None) -> dict | None:
+    """
+    The cached payload for the closest stored query, or None on a miss.
+    Only reports stored with the same deep_mode and `params` (the run
+    settings that shape the report) are considered. A hit carries two
+    extra keys: "cached_query" (the stored wording) and "similarity".
+    """
+    if not ENABLED:
+        return None
+    key = _params_key(params)
+    try:
+        vector = encode_normalized([query])
+        if vector is None:
+            row = _conn().execute(
+                "SELECT id, query, payload FROM reports WHERE normalized = ? AND deep_mode = ? "
+                "AND params = ? AND stored_at > ? ORDER BY stored_at DESC LIMIT 1",
+                (normalize_query(query), int(deep_mode), key, time.time() - TTL_SECONDS),
+            ).fetchone()
+            return _hit(row, 1.0) if row else None
+
+        index = _load_index()
+        if not len(index["ids"]):
+            return None
+        sims = index["vectors"] @ vector[0]
+        eligible = ((index["deep"] == deep_mode) & (index["params"] == key)
+                    & (index["stored_at"] > time.time() - TTL_SECONDS))
+        sims[~eligible] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] < THRESHOLD:
+            return None
+        row = _conn().execute(
+            "SELECT id, query, payload FROM reports WHERE id = ?", (int(index["ids"][best]),)
+        ).fetchone()
+        return _hit(row, float(sims[best])) if row else None
+    except Exception as e:
+        print(f"[report_cache] lookup failed: {str(e)[:60]}")
+        return None
+
+
+def store(query: str, deep_mode: bool, payload: dict, params: dict | None = None) -> None:
+    """Save a finished report's payload under its run `params`, then expire and evict old entries."""
+    if not ENABLED or not payload.get("report"):
+        return
+    vector = encode_normalized([query])
+    now = time.time()
+    try:
+        conn = _conn()
+        conn.execute(
+            "INSERT INTO reports (query, normalized, deep_mode, params, embedding, payload, stored_at, last_hit) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (query, normalize_query(query), int(deep_mode), _params_key(params),
+             vector[0].astype(np.float32).tobytes() if vector is not None else None,
+             json.dumps(payload), now, now),
+        )
+        conn.execute("DELETE FROM reports WHERE stored_at < ?", (now - TTL_SECONDS,))
+        conn.execute(
+            "DELETE FROM reports WHERE id NOT IN (SELECT id FROM reports ORDER BY last_hit DESC LIMIT ?)",
+            (MAX_ENTRIES,),
+        )
+    except Exception as e:
+        print(f"[report_cache] write failed: {str(e)[:60]}")
+
+
+def clear() -> None:
+    global _index
+    _conn().execute("DELETE FROM reports")
+    with _lock:
+        _index = None
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _params_key(params: dict | None) -> str:
+    return hashlib.sha1(json.dumps(params or {}, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _hit(row, similarity: float) -> dict:
+    rid, cached_query, payload = row
+    _conn().execute("UPDATE reports SET last_hit = ? WHERE id = ?", (time.time(), rid))
+    result = json.loads(payload)
+    result["cached_query"] = cached_query
+    result["similarity"] = round(similarity, 4)
+    print(f"[report_cache] Hit: {cached_query!r} (similarity {similarity:.3f})")
+    return result
+
+
+def _backfill_embeddings(conn) -> bool:
+    """Embed rows stored by a process that had no model, so the index can see them."""
+    rows = conn.execute("SELECT id, query FROM reports WHERE embedding IS NULL").fetchall()
+    vectors = encode_normalized([q for _, q in rows]) if rows else None
+    if vectors is None:
+        return False
+    conn.executemany(
+        "UPDATE reports SET embedding = ? WHERE id = ? AND embedding IS NULL",
+        [(v.astype(np.float32).tobytes(), rid) for (rid, _), v in zip(rows, vectors)],
+    )
+    return True
+
+
+def _load_index() -> dict:
+    """The in-memory vectors, reloaded when rows were added, removed or embedded since the last load."""
+    global _index
+    conn = _conn()
+    version = conn.execute("SELECT COUNT(*), COUNT(embedding), MAX(id) FROM reports").fetchone()
+    # Only scan for NULL embeddings when the counts say there are some
+    if version[0] != version[1] and _backfill_embeddings(conn):
+        version = conn.execute("SELECT COUNT(*), COUNT(embedding), MAX(id) FROM reports").fetchone()
+    with _lock:
+        if _index is not None and _index["version"] == version:
+            return _index
+    rows = conn.execute(
+        "SELECT id, deep_mode, params, stored_at, embedding FROM reports WHERE embedding IS NOT NULL"
+    ).fetchall()
+    dim = len(rows[0][4]) // 4 if rows else 0
+    index = {
+        "version": version,
+        "ids": np.array([r[0] for r in rows], dtype=np.int64),
+        "deep": np.array([bool(r[1]) for r in rows], dtype=bool),
+        "params": np.array([r[2] for r in rows], dtype=object),
+        "stored_at": np.array([r[3] for r in rows], dtype=np.float64),
+        "vectors": np.frombuffer(b"".join(r[4] for r in rows), dtype=np.float32).reshape(len(rows), dim)
+                   if rows else np.zeros((0, 0), dtype=np.float32),
+    }
+    with _lock:
+        _index = index
+    return index
+
+
+def _conn():
+    return connect(_DB_FILE, _SCHEMA)
@@ -0,0 +1,109 @@
+"""
+resources.py — Process-wide registry for expensive shared resources
+---------------------------------------------------------------------
+MiniLM used to be lazy-loaded by the first request through unsynchronised
+globals: two concurrent first requests could both load it, and the first
+user always waited for it. Resources are now created through get(), which
+runs each loader exactly once per process — concurrent callers block until
+the first one finishes — and warm_up() does that ahead of traffic:
+
+  - loads the embedding model and runs one dummy encode (first-call
+    allocations and thread pools happen here, not in a user request)
+  - starts the HTML clean process pool, if enabled
+
+The API calls warm_up_in_background() from its lifespan hook and exposes
+is_ready() on /ready; Streamlit wraps it in st.cache_resource so one warm-up
+serves every session.
+"""
+
+import time
+import threading
+
+_lock = threading.Lock()
+_values: dict[str, object] = {}
+_loading: dict[str, threading.Event] = {}
+_status: dict[str, str] = {}
+
+_ready = threading.Event()
+_warm_thread: threading.Thread | None = None
+_warm_seconds: float | None = None
+
+
+# ─── Registry ─────────────────────────────────────────────────────────────────
+
+def get(name: str, loader):
+    """
+    The shared resource `name`, created by `loader()` on first use.
+    A loader that raises or returns None marks the resource unavailable;
+    that None is cached too, so a failing load is not retried per request.
+    """
+    with _lock:
+        if name in _values:
+            return _values[name]
+        event = _loading.get(name)
+        owner = event is None
+        if owner:
+            event = _loading[name] = threading.Event()
+            _status[name] = "loading"
+
+    if not owner:
+        event.wait()
+        with _lock:
+            return _values.get(name)
+
+    try:
+        value = loader()
+    except Exception as e:
+        print(f"[resources] {name} failed to load ({str(e)[:80]})")
+        value = None
+    with _lock:
+        _values[name] = value
+        _status[name] = "ready" if value is not None else "unavailable"
+        del _loading[name]
+    event.set()
+    return value
+
+
+# ─── Warm-up ──────────────────────────────────────────────────────────────────
+
+def warm_up() -> dict:
+    """Load and exercise every shared resource. Safe to call more than once."""
+    global _warm_seconds
+    from src.vector_store import warm_up as warm_embeddings
+    from src.scraper import warm_clean_pool
+
+    start = time.time()
+    steps = (("embedding_model", warm_embeddings), ("clean_pool", warm_clean_pool))
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"[resources] warm-up step {name} failed ({str(e)[:80]})")
+    if _warm_seconds is None:
+        _warm_seconds = round(time.time() - start, 2)
+        print(f"[resources] Warm-up finished in {_warm_seconds}s")
+    _ready.set()
+    return status()
+
+
+def warm_up_in_background() -> threading.Thread:
+    """Start warm_up() on a daemon thread (once per process) and return it."""
+    global _warm_thread
+    with _lock:
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_thread.start()
+        return _warm_thread
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def status() -> dict:
+    with _lock:
+        return {
+            "ready": _ready.is_set(),
+            "warm_up_seconds": _warm_seconds,
+            "resources": dict(_status),
+        }
@@ -8,14 +8,34 @@ For each search result URL:
   4. Falls back to the snippet description if the page fails
   5. Handles timeouts, connection errors, paywalls, and non-HTML pages
 
+fetch_and_clean() is the threaded entry point used by the Streamlit app;
+fetch_and_clean_async() is its event-loop twin used by the API.
+Both consult the on-disk page cache (page_cache.py) before downloading.
+
 Target: ≥80% of pages yield usable text (>200 chars of clean content).
 """
 
+import os
 import re
 import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
 import requests
 from bs4 import BeautifulSoup
 
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    lxml_html = None
+
+from src import page_cache
+from src.fetcher import get_fetcher
+
 # ─── Constants ────────────────────────────────────────────────────────────────
 
 HEADERS = {
@@ -49,76 +69,372 @@ NOISE_PATTERNS = [
     "share", "related", "comment", "widget", "promo",
 ]
 
+# Precompiled forms of the above for the single-pass cleaner
+_NOISE_TAG_SET = frozenset(NOISE_TAGS)
+_NOISE_RE = re.compile("|".join(re.escape(p) for p in NOISE_PATTERNS))
+
 MAX_TEXT_LENGTH = 6000   # Characters to keep per page
+MAX_DOWNLOAD_BYTES = int(os.getenv("SYNAPSE_MAX_PAGE_BYTES", "1500000"))  # Stop reading after this
+READ_CHUNK_BYTES = 64 * 1024
+META_SNIFF_BYTES = 4096  # How far into the body to look for <meta charset>
 MIN_TEXT_LENGTH = 150    # Minimum chars to consider a page "usable"
 
 
 # ─── Public entry point ───────────────────────────────────────────────────────
 
-def fetch_and_clean(search_results: list[dict], max_workers: int = 8) -> list[dict]:
+def fetch_and_clean(search_results: list[dict]) -> list[dict]:
     """
     Fetch and clean content for a list of search result dicts — CONCURRENTLY.
-    Uses ThreadPoolExecutor so all pages are fetched in parallel instead of one-by-one.
+    Pages are fetched in parallel on the process-wide worker pool in
+    fetcher.py, which caps in-flight downloads globally and per host.
 
     Args:
         search_results: List from search.py [{title, url, description, ...}]
-        max_workers:    Number of parallel fetch threads (default 8)
 
     Returns:
         List of dicts: [{url, title, text, status}]
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    cleaned_pages = list(iter_fetch_and_clean(search_results))
+    _log_summary(cleaned_pages)
+    return cleaned_pages
+
+
+def iter_fetch_and_clean(search_results: list[dict]):
+    """
+    Generator version of fetch_and_clean(): yields each cleaned page the
+    moment its download finishes, so callers can chunk and embed it while
+    the slower pages are still in flight.
 
-    def process_one(result: dict) -> dict:
-        url = (result.get("url") or "").strip()
-        title = result.get("title", "")
-        description = result.get("description", "")
+    With SYNAPSE_CLEAN_PROCESSES set, fetch threads only do network I/O and
+    hand the raw HTML to a warm process pool for _clean_html, so parsing
+    scales with cores instead of serialising on the GIL.
+
+    Yields:
+        Dicts: {url, title, text, status} in completion order
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+
+    pool = _clean_pool()
+
+    def process_one(result: dict):
+        url, title, description = _unpack(result)
 
         if not url:
             return None
 
-        url_lower = url.lower().split("?")[0]
-        if any(url_lower.endswith(ext) for ext in SKIP_EXTENSIONS):
+        if _has_skip_extension(url):
             return _make_result(url, title, description, "skipped_extension")
 
-        html = _fetch_page(url)
-        if html is None:
-            return _make_result(url, title, description, "fallback_fetch_failed")
+        cached = page_cache.get(url)
+        if cached and page_cache.is_fresh(cached):
+            return _from_cache(url, title, description, cached, page_cache.HIT)
+
+        fetched = _fetch_page(url, headers=page_cache.validators(cached))
+        page = _resolve_fetch(url, title, description, cached, fetched)
+        if page is not None:
+            return page
+        if pool is not None:
+            return _Unclean(url, title, description, fetched)
+        return _store_cleaned(url, title, description, fetched, _clean_html(fetched["html"]))
+
+    fetcher = get_fetcher()
+    pending = {fetcher.submit(process_one, r) for r in search_results}
+    cleaning: dict = {}   # process-pool future → (_Unclean it is cleaning, pool)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in cleaning:
+                    job, job_pool = cleaning.pop(future)
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        # One bad page (or an OOM-killed worker) must not fail the run
+                        _clean_failed(job_pool, e)
+                        text = _clean_html(job.fetched["html"])
+                    yield _store_cleaned(job.url, job.title, job.description, job.fetched, text)
+                    continue
+                result = future.result()
+                if isinstance(result, _Unclean):
+                    clean_future = None
+                    job_pool = _clean_pool()       # rebuilt if an earlier page broke it
+                    if job_pool is not None:
+                        try:
+                            clean_future = job_pool.submit(_clean_html, result.fetched["html"])
+                        except Exception as e:
+                            _clean_failed(job_pool, e)
+                    if clean_future is None:
+                        text = _clean_html(result.fetched["html"])
+                        yield _store_cleaned(result.url, result.title, result.description, result.fetched, text)
+                        continue
+                    cleaning[clean_future] = (result, job_pool)
+                    pending.add(clean_future)
+                elif result is not None:
+                    yield result
+    finally:
+        # Consumer stopped early — free the shared pools for other runs
+        for future in pending:
+            future.cancel()
+
+
+async def fetch_and_clean_async(search_results: list[dict]) -> list[dict]:
+    """
+    Async twin of fetch_and_clean() for the event-loop API path.
+    Downloads go through the shared pooled httpx client; _clean_html is
+    CPU-bound, so it is handed to the loop's default executor.
+
+    Returns:
+        List of dicts: [{url, title, text, status}] in completion order
+    """
+    cleaned_pages = [page async for page in iter_fetch_and_clean_async(search_results)]
+    _log_summary(cleaned_pages)
+    return cleaned_pages
 
-        text = _clean_html(html)
-        if len(text) >= MIN_TEXT_LENGTH:
-            return _make_result(url, title, text, "success")
-        else:
-            fallback = description if description else text
-            return _make_result(url, title, fallback, "fallback_thin_content")
-
-    cleaned_pages = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_one, r): r for r in search_results}
-        for future in as_completed(futures):
-            result = future.result()
+
+async def iter_fetch_and_clean_async(search_results: list[dict]):
+    """Async-generator twin of iter_fetch_and_clean(): yields pages as they complete."""
+    loop = asyncio.get_running_loop()
+
+    async def process_one(result: dict) -> dict:
+        url, title, description = _unpack(result)
+
+        if not url:
+            return None
+
+        if _has_skip_extension(url):
+            return _make_result(url, title, description, "skipped_extension")
+
+        cached = await loop.run_in_executor(None, page_cache.get, url)
+        if cached and page_cache.is_fresh(cached):
+            return _from_cache(url, title, description, cached, page_cache.HIT)
+
+        fetched = await _fetch_page_async(url, headers=page_cache.validators(cached))
+        page = await loop.run_in_executor(
+            None, _resolve_fetch, url, title, description, cached, fetched
+        )
+        if page is not None:
+            return page
+        # Process pool when enabled, else (or if the pool fails) the default thread executor
+        pool = _clean_pool()
+        text = None
+        if pool is not None:
+            try:
+                text = await loop.run_in_executor(pool, _clean_html, fetched["html"])
+            except Exception as e:
+                _clean_failed(pool, e)
+        if text is None:
+            text = await loop.run_in_executor(None, _clean_html, fetched["html"])
+        return await loop.run_in_executor(
+            None, _store_cleaned, url, title, description, fetched, text
+        )
+
+    tasks = [asyncio.ensure_future(process_one(r)) for r in search_results]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
             if result is not None:
-                cleaned_pages.append(result)
+                yield result
+    finally:
+        # Consumer stopped early (error or cancellation) — don't leak downloads
+        for task in tasks:
+            task.cancel()
 
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _log_summary(cleaned_pages: list[dict]) -> None:
     success_count = sum(1 for p in cleaned_pages if p["status"] == "success")
     print(f"[scraper.py] Done. {success_count}/{len(cleaned_pages)} pages fully extracted.")
-    return cleaned_pages
 
 
-# ─── Internal helpers ─────────────────────────────────────────────────────────
+def _unpack(result: dict) -> tuple[str, str, str]:
+    url = (result.get("url") or "").strip()
+    return url, result.get("title", ""), result.get("description", "")
+
+
+def _has_skip_extension(url: str) -> bool:
+    url_lower = url.lower().split("?")[0]
+    return any(url_lower.endswith(ext) for ext in SKIP_EXTENSIONS)
+
+
+def _classify(url: str, title: str, description: str, text: str, cache: str | None = None) -> dict:
+    """Turn cleaned text into a page result, falling back to the snippet if thin."""
+    if len(text) >= MIN_TEXT_LENGTH:
+        return _make_result(url, title, text, "success", cache)
+    fallback = description if description else text
+    return _make_result(url, title, fallback, "fallback_thin_content", cache)
+
+
+def _from_cache(url: str, title: str, description: str, cached: dict, outcome: str) -> dict:
+    page_cache.record(outcome)
+    return _classify(url, title, description, cached["text"], outcome)
+
+
+def _resolve_fetch(url: str, title: str, description: str, cached: dict | None, fetched: dict | None) -> dict | None:
+    """
+    Resolve a download against the page cache. Returns the page when no
+    parsing is needed, or None when fetched["html"] still has to be cleaned
+    (then pass the cleaned text to _store_cleaned).
+    """
+    if fetched is None:
+        if cached:
+            # Origin unreachable — a stale copy beats the search snippet
+            return _from_cache(url, title, description, cached, page_cache.STALE)
+        page_cache.record(page_cache.MISS)
+        return _make_result(url, title, description, "fallback_fetch_failed", page_cache.MISS)
+
+    if fetched["not_modified"] and cached:
+        page_cache.mark_revalidated(url)
+        return _from_cache(url, title, description, cached, page_cache.REVALIDATED)
+
+    return None
+
+
+def _store_cleaned(url: str, title: str, description: str, fetched: dict, text: str) -> dict:
+    page_cache.put(url, fetched["html"], text, fetched["etag"], fetched["last_modified"])
+    page_cache.record(page_cache.MISS)
+    return _classify(url, title, description, text, page_cache.MISS)
+
+
+class _Unclean(NamedTuple):
+    """A downloaded page waiting for the clean process pool."""
+    url: str
+    title: str
+    description: str
+    fetched: dict
+
+
+# ─── HTML-cleaning process pool ───────────────────────────────────────────────
+
+_pool = None
+_pool_failed = False
+_pool_lock = threading.Lock()
+
 
-def _fetch_page(url: str, timeout: int = 10) -> str | None:
-    """Fetch raw HTML. Returns None on any failure."""
+def _clean_workers() -> int:
+    """SYNAPSE_CLEAN_PROCESSES: "0"/unset = off, "auto" = one per core, or a number."""
+    setting = os.getenv("SYNAPSE_CLEAN_PROCESSES", "0").strip().lower()
+    if setting == "auto":
+        return os.cpu_count() or 1
     try:
-        response = requests.get(url, headers=HEADERS, timeout=timeout, allow_redirects=True)
-        response.raise_for_status()
+        return max(0, int(setting))
+    except ValueError:
+        return 0
+
+
+def _clean_pool():
+    """The shared clean process pool, or None when the mode is off (or failed to start)."""
+    global _pool, _pool_failed
+    workers = _clean_workers()
+    if workers == 0 or _pool_failed:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None and not _pool_failed:
+                try:
+                    # spawn, not fork: the parent is full of fetch threads
+                    pool = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                    # Start every worker now so the first pages don't pay process startup
+                    for f in [pool.submit(_warm_worker) for _ in range(workers)]:
+                        f.result()
+                    _pool = pool
+                    print(f"[scraper.py] Clean process pool ready ({workers} workers)")
+                except Exception as e:
+                    _pool_failed = True
+                    print(f"[scraper.py] Clean process pool unavailable ({str(e)[:60]}), cleaning in threads")
+    return _pool
+
+
+def _clean_failed(pool, error: Exception) -> None:
+    """A page failed to clean in `pool`; if the pool itself broke, drop it so the next page rebuilds it."""
+    print(f"[scraper.py] Clean process failed ({type(error).__name__}: {str(error)[:60]}), cleaning in thread")
+    if isinstance(error, BrokenProcessPool):
+        global _pool
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_clean_pool() -> None:
+    """Create the clean process pool ahead of the first request (no-op when off)."""
+    _clean_pool()
+
+
+def _warm_worker() -> int:
+    # Importing this module in the child already loaded lxml; parse once more
+    # so its parser state is initialised before real pages arrive.
+    _clean_html("<html><body><p>warm</p></body></html>")
+    return os.getpid()
+
+
+def _fetched(response, html: str) -> dict:
+    return {
+        "html": html,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "not_modified": response.status_code == 304,
+    }
+
+
+def _is_html_content_type(content_type: str) -> bool:
+    return "text/html" in content_type or "text/plain" in content_type
+
+
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+
+def _decode(body: bytes, content_type: str) -> str:
+    """
+    Decode with the declared charset: Content-Type header, then BOM, then a
+    <meta charset> in the first few KB, then UTF-8. Never scans the whole
+    body the way requests' chardet-based response.text does.
+    """
+    match = _HEADER_CHARSET.search(content_type)
+    charset = match.group(1) if match else None
+    if charset is None:
+        if body.startswith(b"\xef\xbb\xbf"):
+            charset = "utf-8-sig"
+        elif body.startswith((b"\xff\xfe", b"\xfe\xff")):
+            charset = "utf-16"
+        else:
+            meta = _META_CHARSET.search(body[:META_SNIFF_BYTES])
+            charset = meta.group(1).decode("ascii", "ignore") if meta else "utf-8"
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
 
-        content_type = response.headers.get("Content-Type", "")
-        if "text/html" not in content_type and "text/plain" not in content_type:
-            print(f"[scraper.py]   Skipping non-HTML content-type: {content_type[:40]}")
-            return None
 
-        return response.text
+def _fetch_page(url: str, timeout: int = 10, headers: dict | None = None) -> dict | None:
+    """
+    Fetch raw HTML, sending any conditional headers given.
+    Returns {html, etag, last_modified, not_modified}, or None on any failure.
+    """
+    try:
+        request_headers = {**HEADERS, **(headers or {})}
+        with get_fetcher().open(url, headers=request_headers, timeout=timeout, allow_redirects=True) as response:
+            if response.status_code == 304:
+                return _fetched(response, "")
+            response.raise_for_status()
+
+            # Decide from headers alone — non-HTML bodies are never downloaded
+            content_type = response.headers.get("Content-Type", "")
+            if not _is_html_content_type(content_type):
+                print(f"[scraper.py]   Skipping non-HTML content-type: {content_type[:40]}")
+                return None
+
+            body = bytearray()
+            for block in response.iter_content(chunk_size=READ_CHUNK_BYTES):
+                body += block
+                if len(body) >= MAX_DOWNLOAD_BYTES:
+                    break   # early abort — _clean_html keeps 6000 chars anyway
+
+        return _fetched(response, _decode(bytes(body[:MAX_DOWNLOAD_BYTES]), content_type))
 
     except requests.exceptions.Timeout:
         print(f"[scraper.py]   Timeout: {url[:50]}")
@@ -134,10 +450,182 @@ def _fetch_page(url: str, timeout: int = 10) -> str | None:
     return None
 
 
+async def _fetch_page_async(url: str, timeout: int = 10, headers: dict | None = None) -> dict | None:
+    """Async _fetch_page() over the shared httpx client. Returns None on any failure."""
+    import httpx
+    from src.http_client import get_async_client
+
+    try:
+        client = get_async_client()
+        request_headers = {**HEADERS, **(headers or {})}
+        async with get_fetcher().async_slot(url):
+            async with client.stream("GET", url, headers=request_headers, timeout=timeout) as response:
+                if response.status_code == 304:
+                    return _fetched(response, "")
+                response.raise_for_status()
+
+                content_type = response.headers.get("Content-Type", "")
+                if not _is_html_content_type(content_type):
+                    print(f"[scraper.py]   Skipping non-HTML content-type: {content_type[:40]}")
+                    return None
+
+                body = bytearray()
+                async for block in response.aiter_bytes(READ_CHUNK_BYTES):
+                    body += block
+                    if len(body) >= MAX_DOWNLOAD_BYTES:
+                        break
+
+        return _fetched(response, _decode(bytes(body[:MAX_DOWNLOAD_BYTES]), content_type))
+
+    except httpx.TimeoutException:
+        print(f"[scraper.py]   Timeout: {url[:50]}")
+    except httpx.TooManyRedirects:
+        print(f"[scraper.py]   Too many redirects: {url[:50]}")
+    except httpx.HTTPStatusError as e:
+        print(f"[scraper.py]   HTTP {e.response.status_code}: {url[:50]}")
+    except httpx.TransportError:
+        print(f"[scraper.py]   Connection error: {url[:50]}")
+    except Exception as e:
+        print(f"[scraper.py]   Unexpected: {str(e)[:60]}")
+
+    return None
+
+
 def _clean_html(html: str) -> str:
     """
     Strip noise from HTML and extract readable content.
 
+    Single-pass lxml engine: one parse, one walk of the tree. Noise subtrees
+    are skipped rather than removed, class/id noise is matched by one
+    precompiled regex, and each text node is stripped once and routed to
+    every open <p> / fallback-container collector. Produces the same output
+    as _clean_html_bs4() on well-formed pages (see benchmarks/).
+
+    Strategy (unchanged):
+      1. Skip all noise tags entirely
+      2. Skip elements with noise-indicating class/id names
+      3. Extract all <p> tags with meaningful text
+      4. Fall back to article/main/body if paragraphs are sparse
+    """
+    if lxml_html is None:
+        return _clean_html_bs4(html)
+    try:
+        root = lxml_html.document_fromstring(html, parser=_lxml_parser())
+    except (ValueError, etree.ParserError):
+        # Empty documents, or str input with an XML encoding declaration
+        return _clean_html_bs4(html)
+
+    paragraphs: list[str | None] = []     # one slot per <p>, in document order
+    containers: dict[str, list[str]] = {}  # first article / main / [role=main] / body
+    active: list[list[str]] = []           # collectors currently open
+
+    def emit(raw):
+        if raw:
+            fragment = raw.strip()
+            if fragment:
+                for collector in active:
+                    collector.append(fragment)
+
+    # Explicit stack instead of recursion — some pages nest thousands deep.
+    # Entries: (element, None) to enter, (element, opened) to exit.
+    stack = [(root, None)]
+    while stack:
+        el, opened = stack.pop()
+
+        if opened is not None:
+            # Exit: close this element's collectors, then its tail text
+            # belongs to the parent's context
+            if opened:
+                del active[-len(opened):]
+                for collector in opened:
+                    slot = getattr(collector, "slot", None)
+                    if slot is not None and len("".join(collector)) > 40:
+                        paragraphs[slot] = " ".join(collector)
+            emit(el.tail)
+            continue
+
+        tag = el.tag
+        if not isinstance(tag, str):          # comment / processing instruction
+            emit(el.tail)
+            continue
+        if tag in _NOISE_TAG_SET or _NOISE_RE.search(
+            ((el.get("class") or "") + " " + (el.get("id") or "")).lower()
+        ):
+            emit(el.tail)
+            continue
+
+        opened = []
+        if tag == "p":
+            collector = _Collector()
+            collector.slot = len(paragraphs)
+            paragraphs.append(None)
+            opened.append(collector)
+        for key in _container_keys(el, tag):
+            if key not in containers:
+                collector = containers[key] = _Collector()
+                opened.append(collector)
+        active.extend(opened)
+
+        emit(el.text)
+        stack.append((el, opened))
+        for child in reversed(el):
+            stack.append((child, None))
+
+    text = " ".join(p for p in paragraphs if p is not None)
+
+    # Fallback to article/main if paragraphs are thin
+    if len(text) < MIN_TEXT_LENGTH:
+        for key in ("article", "main", "role_main", "body"):
+            if key in containers:
+                candidate = " ".join(containers[key])
+                if len(candidate) > len(text):
+                    text = candidate
+                    break
+
+    # Normalize whitespace
+    text = re.sub(r"\s+", " ", text).strip()
+
+    # libxml2 silently drops trees nested past its depth limit (even with
+    # huge_tree, a few thousand levels) — a thin result from a real page
+    # gets a second opinion from the bs4 engine
+    if len(text) < MIN_TEXT_LENGTH and len(html) > MIN_TEXT_LENGTH:
+        return _clean_html_bs4(html)
+
+    # Truncate
+    return text[:MAX_TEXT_LENGTH]
+
+
+_parsers = threading.local()
+
+
+def _lxml_parser():
+    """This thread's HTML parser (lxml parsers must not be shared across threads)."""
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        # huge_tree lifts libxml2's ~255-level nesting cap for pages built from unclosed tags
+        parser = _parsers.parser = lxml_html.HTMLParser(huge_tree=True)
+    return parser
+
+
+class _Collector(list):
+    """Text fragments for one <p> or fallback container."""
+    slot = None
+
+
+def _container_keys(el, tag: str) -> tuple[str, ...]:
+    keys = ()
+    if tag in ("article", "main", "body"):
+        keys = (tag,)
+    if el.get("role") == "main":
+        keys += ("role_main",)
+    return keys
+
+
+def _clean_html_bs4(html: str) -> str:
+    """
+    Original BeautifulSoup/html.parser cleaner. Kept as the fallback for
+    documents lxml refuses and as the reference output for benchmarks/.
+
     Strategy:
       1. Remove all noise tags entirely
       2. Remove elements with noise-indicating class/id names
@@ -190,5 +678,8 @@ def _clean_html(html: str) -> str:
     return text[:MAX_TEXT_LENGTH]
 
 
-def _make_result(url: str, title: str, text: str, status: str) -> dict:
-    return {"url": url, "title": title, "text": text, "status": status}
\ No newline at end of file
+def _make_result(url: str, title: str, text: str, status: str, cache: str | None = None) -> dict:
+    result = {"url": url, "title": title, "text": text, "status": status}
+    if cache is not None:
+        result["cache"] = cache   # page_cache outcome: hit / revalidated / stale / miss
+    return result
\ No newline at end of file
@@ -4,6 +4,11 @@ search.py — Web Search Module
 Calls SerpAPI (primary) or Brave Search API (alternative) for each
 generated query. Deduplicates results by URL so we never fetch the
 same page twice. Returns a clean list of {title, url, description} dicts.
+Repeated queries are answered from search_cache.py without an API call.
+
+All queries of a run are dispatched concurrently. A token bucket per
+provider keeps us under its rate limit, and 429/5xx/network errors are
+retried with jittered exponential backoff (honouring Retry-After).
 
 Free tiers:
   - SerpAPI:      100 searches/month  → https://serpapi.com
@@ -11,14 +16,58 @@ Free tiers:
 """
 
 import os
+import time
+import random
+import asyncio
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from src import search_cache
+
 load_dotenv()
 
+# ─── Rate limiting & retries ──────────────────────────────────────────────────
+
+MAX_RETRIES = 3                              # Retries after the first attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5                           # Seconds; doubles per attempt
+BACKOFF_CAP = 8.0
+
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket. reserve() takes a token and returns how long
+    the caller must wait before using it, so the same bucket serves both
+    the threaded path (time.sleep) and the async path (asyncio.sleep).
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+# Brave's free plan allows 1 request/second; SerpAPI has no hard per-second cap
+_LIMITERS = {
+    "serpapi": _TokenBucket(float(os.getenv("SERPAPI_RPS", "5")), int(os.getenv("SERPAPI_BURST", "5"))),
+    "brave": _TokenBucket(float(os.getenv("BRAVE_RPS", "1")), int(os.getenv("BRAVE_BURST", "1"))),
+}
+
 # ─── Public entry point ───────────────────────────────────────────────────────
 
-def search_web(queries: list[str], results_per_query: int = 5) -> list[dict]:
+def search_web(queries: list[str], results_per_query: int = 5, use_cache: bool = True) -> list[dict]:
     """
     Search the web for each query string.
     Returns a deduplicated list of result dicts.
@@ -26,15 +75,59 @@ def search_web(queries: list[str], results_per_query: int = 5) -> list[dict]:
     Args:
         queries:            List of search query strings (from agent.py)
         results_per_query:  How many results to request per query (default 5)
+        use_cache:          Serve repeated queries from search_cache.py (default True);
+                            False always hits the API (the fresh result is still stored)
 
     Returns:
         List of dicts: [{title, url, description, query_source}]
     """
+    if not queries:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(queries), 8)) as executor:
+        # map() keeps query order, so dedup and query_source stay deterministic
+        per_query = list(executor.map(
+            lambda q: _search_single_query(q, results_per_query, use_cache), queries
+        ))
+    return _merge_results(queries, per_query)
+
+
+async def search_web_async(queries: list[str], results_per_query: int = 5, use_cache: bool = True) -> list[dict]:
+    """
+    Async twin of search_web() for the event-loop API path.
+    All queries go out together over the shared pooled client; results are
+    merged in query order, so dedup and query_source match search_web().
+    """
+    per_query = await asyncio.gather(
+        *(_search_single_query_async(q, results_per_query, use_cache) for q in queries)
+    )
+    return _merge_results(queries, list(per_query))
+
+
+def merge_result_sets(*result_sets: list[dict]) -> list[dict]:
+    """
+    Concatenate already-merged result lists (e.g. the speculative raw-query
+    search and the planned queries) in order, dropping URLs seen earlier.
+    Each result keeps the query_source of the first set that found it.
+    """
+    all_results = []
+    seen_urls: set[str] = set()
+    for results in result_sets:
+        for result in results:
+            url = result.get("url", "")
+            if url and url not in seen_urls:
+                seen_urls.add(url)
+                all_results.append(result)
+    return all_results
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _merge_results(queries: list[str], per_query: list[list[dict]]) -> list[dict]:
+    """Flatten per-query results in query order, dropping repeated URLs."""
     all_results = []
     seen_urls: set[str] = set()
 
-    for query in queries:
-        results = _search_single_query(query, results_per_query)
+    for query, results in zip(queries, per_query):
         for result in results:
             url = result.get("url", "")
             if url and url not in seen_urls:
@@ -46,26 +139,143 @@ def search_web(queries: list[str], results_per_query: int = 5) -> list[dict]:
     return all_results
 
 
-# ─── Internal helpers ─────────────────────────────────────────────────────────
-
-def _search_single_query(query: str, num_results: int) -> list[dict]:
+def _search_single_query(query: str, num_results: int, use_cache: bool = True) -> list[dict]:
     """Route to the correct API based on which key is set in .env."""
-    if os.getenv("SERPAPI_KEY"):
-        return _serpapi_search(query, num_results)
-    elif os.getenv("BRAVE_API_KEY"):
-        return _brave_search(query, num_results)
-    else:
-        raise EnvironmentError(
-            "No search API key found.\n"
-            "Set SERPAPI_KEY or BRAVE_API_KEY in your .env file.\n"
-            "  SerpAPI:      https://serpapi.com  (100 free/month)\n"
-            "  Brave Search: https://brave.com/search/api  (2000 free/month)"
+    provider = _provider()
+    if use_cache:
+        cached = _from_cache(query, provider, num_results)
+        if cached is not None:
+            return cached
+
+    results = _request(provider, query, num_results)
+    search_cache.store(query, provider, num_results, results)
+    return results
+
+
+def _from_cache(query: str, provider: str, num_results: int) -> list[dict] | None:
+    """Cached results for a query, kicking off a background refresh if stale."""
+    results, state = search_cache.lookup(query, provider, num_results)
+    if state == search_cache.STALE:
+        search_cache.refresh_in_background(
+            query, provider, num_results, lambda: _request(provider, query, num_results)
         )
+    if results is not None:
+        print(f"[search.py] Cache {state}: {len(results)} results for '{query[:40]}'")
+    return results
+
+
+def _provider() -> str:
+    """Return which search API to use based on which key is set in .env."""
+    if os.getenv("SERPAPI_KEY"):
+        return "serpapi"
+    if os.getenv("BRAVE_API_KEY"):
+        return "brave"
+    raise EnvironmentError(
+        "No search API key found.\n"
+        "Set SERPAPI_KEY or BRAVE_API_KEY in your .env file.\n"
+        "  SerpAPI:      https://serpapi.com  (100 free/month)\n"
+        "  Brave Search: https://brave.com/search/api  (2000 free/month)"
+    )
+
+
+async def _search_single_query_async(query: str, num_results: int, use_cache: bool = True) -> list[dict]:
+    """Async version of _search_single_query() over the shared httpx client."""
+    provider = _provider()
+    if use_cache:
+        cached = await asyncio.to_thread(_from_cache, query, provider, num_results)
+        if cached is not None:
+            return cached
+
+    results = await _request_async(provider, query, num_results)
+    await asyncio.to_thread(search_cache.store, query, provider, num_results, results)
+    return results
+
+
+def _request(provider: str, query: str, num_results: int) -> list[dict]:
+    """Rate-limited provider call with jittered retries. Returns [] on failure."""
+    url, headers, params = _REQUEST_BUILDERS[provider](query, num_results)
+    label = _LABELS[provider]
+
+    for attempt in range(MAX_RETRIES + 1):
+        time.sleep(_LIMITERS[provider].reserve())
+        try:
+            response = requests.get(url, headers=headers, params=params, timeout=15)
+            if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                delay = _backoff(attempt, response.headers.get("Retry-After"))
+                print(f"[search.py] {label} HTTP {response.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            results = _PARSERS[provider](response.json(), num_results)
+            print(f"[search.py] {label}: {len(results)} results for '{query[:40]}'")
+            return results
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt < MAX_RETRIES:
+                time.sleep(_backoff(attempt))
+                continue
+            print(f"[search.py] {label} error: {e}")
+            return []
+        except requests.exceptions.HTTPError as e:
+            print(f"[search.py] {label} HTTP error: {e}")
+            return []
+        except Exception as e:
+            print(f"[search.py] {label} error: {e}")
+            return []
+
+    return []
 
 
-def _serpapi_search(query: str, num_results: int) -> list[dict]:
-    """Fetch results from SerpAPI (Google Search)."""
-    url = "https://serpapi.com/search"
+async def _request_async(provider: str, query: str, num_results: int) -> list[dict]:
+    """Async _request() over the shared httpx client."""
+    import httpx
+    from src.http_client import get_async_client
+
+    url, headers, params = _REQUEST_BUILDERS[provider](query, num_results)
+    label = _LABELS[provider]
+
+    for attempt in range(MAX_RETRIES + 1):
+        await asyncio.sleep(_LIMITERS[provider].reserve())
+        try:
+            client = get_async_client()
+            response = await client.get(url, headers=headers, params=params, timeout=15)
+            if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                delay = _backoff(attempt, response.headers.get("Retry-After"))
+                print(f"[search.py] {label} HTTP {response.status_code}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            results = _PARSERS[provider](response.json(), num_results)
+            print(f"[search.py] {label}: {len(results)} results for '{query[:40]}'")
+            return results
+
+        except httpx.TransportError as e:
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            print(f"[search.py] {label} error: {e}")
+            return []
+        except httpx.HTTPStatusError as e:
+            print(f"[search.py] {label} HTTP error: {e}")
+            return []
+        except Exception as e:
+            print(f"[search.py] {label} error: {e}")
+            return []
+
+    return []
+
+
+def _backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Exponential backoff with ±50% jitter; a numeric Retry-After wins."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP * 4)
+        except ValueError:
+            pass
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _serpapi_request(query: str, num_results: int) -> tuple[str, dict, dict]:
     params = {
         "q": query,
         "api_key": os.getenv("SERPAPI_KEY"),
@@ -74,34 +284,22 @@ def _serpapi_search(query: str, num_results: int) -> list[dict]:
         "hl": "en",
         "gl": "us",
     }
+    return "https://serpapi.com/search", {}, params
 
-    try:
-        response = requests.get(url, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-
-        results = []
-        for item in data.get("organic_results", [])[:num_results]:
-            results.append({
-                "title": item.get("title", ""),
-                "url": item.get("link", ""),
-                "description": item.get("snippet", ""),
-                "api": "serpapi",
-            })
-        print(f"[search.py] SerpAPI: {len(results)} results for '{query[:40]}'")
-        return results
-
-    except requests.exceptions.HTTPError as e:
-        print(f"[search.py] SerpAPI HTTP error: {e}")
-        return []
-    except Exception as e:
-        print(f"[search.py] SerpAPI error: {e}")
-        return []
 
+def _parse_serpapi(data: dict, num_results: int) -> list[dict]:
+    results = []
+    for item in data.get("organic_results", [])[:num_results]:
+        results.append({
+            "title": item.get("title", ""),
+            "url": item.get("link", ""),
+            "description": item.get("snippet", ""),
+            "api": "serpapi",
+        })
+    return results
 
-def _brave_search(query: str, num_results: int) -> list[dict]:
-    """Fetch results from Brave Search API."""
-    url = "https://api.search.brave.com/res/v1/web/search"
+
+def _brave_request(query: str, num_results: int) -> tuple[str, dict, dict]:
     headers = {
         "Accept": "application/json",
         "Accept-Encoding": "gzip",
@@ -112,26 +310,21 @@ def _brave_search(query: str, num_results: int) -> list[dict]:
         "count": min(num_results, 20),  # Brave max is 20
         "result_filter": "web",
     }
+    return "https://api.search.brave.com/res/v1/web/search", headers, params
 
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-
-        results = []
-        for item in data.get("web", {}).get("results", [])[:num_results]:
-            results.append({
-                "title": item.get("title", ""),
-                "url": item.get("url", ""),
-                "description": item.get("description", ""),
-                "api": "brave",
-            })
-        print(f"[search.py] Brave: {len(results)} results for '{query[:40]}'")
-        return results
-
-    except requests.exceptions.HTTPError as e:
-        print(f"[search.py] Brave HTTP error: {e}")
-        return []
-    except Exception as e:
-        print(f"[search.py] Brave error: {e}")
-        return []
+
+def _parse_brave(data: dict, num_results: int) -> list[dict]:
+    results = []
+    for item in data.get("web", {}).get("results", [])[:num_results]:
+        results.append({
+            "title": item.get("title", ""),
+            "url": item.get("url", ""),
+            "description": item.get("description", ""),
+            "api": "brave",
+        })
+    return results
+
+
+_REQUEST_BUILDERS = {"serpapi": _serpapi_request, "brave": _brave_request}
+_PARSERS = {"serpapi": _parse_serpapi, "brave": _parse_brave}
+_LABELS = {"serpapi": "SerpAPI", "brave": "Brave"}
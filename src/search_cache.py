@@ -0,0 +1,125 @@
+"""
+search_cache.py — TTL'd search-result cache in front of SerpAPI / Brave
+-------------------------------------------------------------------------
+Every provider call costs quota (SerpAPI: 100/month free) and a 1–3 s
+round trip, while users keep asking the same things. Results are stored
+in SQLite keyed by (normalised query, provider, num_results):
+
+  - younger than TTL            → served instantly, no API call
+  - within the stale window     → served instantly, refreshed in background
+  - older than that / missing   → normal API call, result stored
+
+Configuration (.env):
+  SYNAPSE_SEARCH_CACHE       "0" disables the cache (default on)
+  SYNAPSE_SEARCH_CACHE_TTL   freshness window in seconds (default 21600 = 6 h)
+  SYNAPSE_SEARCH_CACHE_SWR   extra stale-while-revalidate window (default 86400)
+"""
+
+import os
+import re
+import json
+import time
+import threading
+
+from src.cache_db import connect
+
+ENABLED = os.getenv("SYNAPSE_SEARCH_CACHE", "1") != "0"
+TTL_SECONDS = float(os.getenv("SYNAPSE_SEARCH_CACHE_TTL", "21600"))
+SWR_SECONDS = float(os.getenv("SYNAPSE_SEARCH_CACHE_SWR", "86400"))
+
+FRESH, STALE = "fresh", "stale"
+
+_DB_FILE = "search.sqlite3"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    key        TEXT PRIMARY KEY,
+    results    TEXT NOT NULL,
+    stored_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS searches_stored ON searches (stored_at);
+"""
+
+_refreshing: set[str] = set()
+_refresh_lock = threading.Lock()
+
+
+# ─── Public API ───────────────────────────────────────────────────────────────
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace — so near-repeats share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def lookup(query: str, provider: str, num_results: int) -> tuple[list[dict] | None, str | None]:
+    """
+    Returns (results, state) where state is FRESH, STALE or None (miss).
+    Results are freshly deserialised, so callers may mutate them.
+    """
+    if not ENABLED:
+        return None, None
+    try:
+        row = _conn().execute(
+            "SELECT results, stored_at FROM searches WHERE key = ?",
+            (_key(query, provider, num_results),),
+        ).fetchone()
+    except Exception as e:
+        print(f"[search_cache] read failed: {str(e)[:60]}")
+        return None, None
+
+    if row is None:
+        return None, None
+    age = time.time() - row[1]
+    if age < TTL_SECONDS:
+        return json.loads(row[0]), FRESH
+    if age < TTL_SECONDS + SWR_SECONDS:
+        return json.loads(row[0]), STALE
+    return None, None
+
+
+def store(query: str, provider: str, num_results: int, results: list[dict]) -> None:
+    """Save a non-empty result list (empty lists usually mean an API error)."""
+    if not ENABLED or not results:
+        return
+    now = time.time()
+    try:
+        conn = _conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO searches (key, results, stored_at) VALUES (?, ?, ?)",
+            (_key(query, provider, num_results), json.dumps(results), now),
+        )
+        conn.execute(
+            "DELETE FROM searches WHERE stored_at < ?", (now - TTL_SECONDS - SWR_SECONDS,)
+        )
+    except Exception as e:
+        print(f"[search_cache] write failed: {str(e)[:60]}")
+
+
+def refresh_in_background(query: str, provider: str, num_results: int, fetch) -> None:
+    """
+    Re-run `fetch()` on a daemon thread and store its results.
+    At most one refresh per key is in flight at a time.
+    """
+    key = _key(query, provider, num_results)
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            store(query, provider, num_results, fetch())
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name="search-cache-refresh", daemon=True).start()
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _key(query: str, provider: str, num_results: int) -> str:
+    return f"{provider}|{num_results}|{normalize_query(query)}"
+
+
+def _conn():
+    return connect(_DB_FILE, _SCHEMA)
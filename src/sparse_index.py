@@ -0,0 +1,180 @@
+"""
+sparse_index.py — Sparse, NumPy-only lexical indexes
+------------------------------------------------------
+The TF-IDF fallback used to build a dense n_docs × vocab float32 matrix
+in a per-token Python loop (gigabytes on deep-mode runs) and computed the
+query's IDF from the query alone. This module keeps everything sparse:
+
+  Build   — each text is tokenised once; term ids come from one np.unique
+            over all tokens and (doc, term) counts from a second, so there
+            is no per-token Python work after tokenising
+  Layout  — postings are stored term-major (CSC): term_ptr[t]:term_ptr[t+1]
+            slices doc_ids / weights for term t
+  Query   — the query is weighted with the *corpus* IDF, and scores are a
+            sparse dot product: gather the postings of the query's terms
+            and accumulate them per document with np.bincount
+
+TfidfIndex is the cosine fallback when sentence-transformers is missing;
+BM25Index is the lexical half of hybrid retrieval. Both can share one
+count_terms() pass over the corpus.
+"""
+
+import re
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+# ─── TF-IDF ───────────────────────────────────────────────────────────────────
+
+class TfidfIndex:
+    """L2-normalised TF-IDF postings; score() returns cosine similarities."""
+
+    def __init__(self, vocab: dict[str, int], df: np.ndarray, n_docs: int,
+                 term_ptr: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray):
+        self.vocab = vocab
+        self.df = df
+        self.n_docs = n_docs
+        self.idf = (np.log((n_docs + 1) / (df + 1)) + 1.0).astype(np.float32)
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+
+    @classmethod
+    def build(cls, texts: list[str], counts: tuple | None = None) -> "TfidfIndex":
+        vocab, docs, terms, counts, doc_len = counts or count_terms(texts)
+        n_docs = len(texts)
+        df = np.bincount(terms, minlength=len(vocab)).astype(np.float32)
+        idf = np.log((n_docs + 1) / (df + 1)) + 1.0
+
+        weights = (counts / doc_len[docs] * idf[terms]).astype(np.float32)
+        norms = np.sqrt(np.bincount(docs, weights=weights.astype(np.float64) ** 2, minlength=n_docs)) + 1e-9
+        weights /= norms[docs].astype(np.float32)
+
+        term_ptr, doc_ids, weights = _term_major(terms, docs, weights, len(vocab))
+        return cls(vocab, df, n_docs, term_ptr, doc_ids, weights)
+
+    def score(self, queries: list[str]) -> np.ndarray:
+        """(n_queries, n_docs) cosine similarities against the corpus."""
+        out = np.zeros((len(queries), self.n_docs), dtype=np.float32)
+        for qi, query in enumerate(queries):
+            terms, tf = self._query_terms(query)
+            if not len(terms):
+                continue
+            q_weights = tf * self.idf[terms]
+            q_weights /= np.linalg.norm(q_weights) + 1e-9
+            out[qi] = _accumulate(self, terms, q_weights)
+        return out
+
+    def _query_terms(self, query: str) -> tuple[np.ndarray, np.ndarray]:
+        """Known query terms and their length-normalised term frequencies."""
+        tokens = tokenize(query)
+        ids = np.fromiter((self.vocab[t] for t in tokens if t in self.vocab), dtype=np.int64)
+        if not len(ids):
+            return ids, np.zeros(0, dtype=np.float32)
+        terms, counts = np.unique(ids, return_counts=True)
+        return terms, (counts / len(tokens)).astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.term_ptr.nbytes + self.doc_ids.nbytes + self.weights.nbytes + self.df.nbytes
+
+
+# ─── BM25 ─────────────────────────────────────────────────────────────────────
+
+class BM25Index:
+    """
+    Okapi BM25 over term-major postings. Each posting's full BM25 term
+    weight (IDF × saturated, length-normalised tf) is precomputed at build
+    time, so scoring a query is one gather + bincount.
+    """
+
+    def __init__(self, vocab: dict[str, int], df: np.ndarray, doc_len: np.ndarray,
+                 term_ptr: np.ndarray, doc_ids: np.ndarray, tf: np.ndarray,
+                 k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.df = df
+        self.doc_len = doc_len
+        self.n_docs = len(doc_len)
+        self.avg_len = float(doc_len.mean()) if self.n_docs else 0.0
+        self.k1, self.b = k1, b
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tf = tf
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        terms = np.repeat(np.arange(len(df)), np.diff(term_ptr))
+        norm = k1 * (1 - b + b * doc_len[doc_ids] / max(self.avg_len, 1e-9))
+        self.weights = (self.idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: list[str], counts: tuple | None = None, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocab, docs, terms, tf, doc_len = counts or count_terms(texts)
+        df = np.bincount(terms, minlength=len(vocab)).astype(np.float32)
+        term_ptr, doc_ids, tf = _term_major(terms, docs, tf, len(vocab))
+        return cls(vocab, df, doc_len.astype(np.float32), term_ptr, doc_ids, tf, k1=k1, b=b)
+
+    def score(self, queries: list[str]) -> np.ndarray:
+        """(n_queries, n_docs) BM25 scores; each distinct query term counts once."""
+        out = np.zeros((len(queries), self.n_docs), dtype=np.float32)
+        for qi, query in enumerate(queries):
+            terms = np.unique(np.fromiter(
+                (self.vocab[t] for t in tokenize(query) if t in self.vocab), dtype=np.int64
+            ))
+            if len(terms):
+                out[qi] = _accumulate(self, terms, np.ones(len(terms), dtype=np.float32))
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.term_ptr, self.doc_ids, self.tf, self.weights, self.doc_len, self.df))
+
+
+# ─── Shared counting ──────────────────────────────────────────────────────────
+
+def count_terms(texts: list[str]) -> tuple:
+    """
+    Tokenise and count (doc, term) pairs without a per-token Python loop.
+
+    Returns:
+        (vocab, docs, terms, counts, doc_len) — one entry per distinct
+        (doc, term) pair in doc-major order, plus every doc's token count
+        (at least 1)
+    """
+    token_lists = [tokenize(t) for t in texts]
+    doc_len = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=len(token_lists))
+    flat = [tok for toks in token_lists for tok in toks]
+    if not flat:
+        empty = np.zeros(0, dtype=np.int64)
+        return {}, empty, empty, np.zeros(0, dtype=np.float32), np.maximum(doc_len, 1)
+
+    # Fixed-width unicode sorts ~4x faster than object arrays; a stray giant
+    # token (base64, minified JS) would inflate every row, so fall back then
+    dtype = object if max(map(len, flat)) > 40 else str
+    words, term_of_token = np.unique(np.array(flat, dtype=dtype), return_inverse=True)
+    doc_of_token = np.repeat(np.arange(len(token_lists)), doc_len)
+    pairs, counts = np.unique(doc_of_token * len(words) + term_of_token, return_counts=True)
+    vocab = {w: i for i, w in enumerate(words.tolist())}
+    return vocab, pairs // len(words), pairs % len(words), counts.astype(np.float32), np.maximum(doc_len, 1)
+
+
+# ─── Internal helpers ─────────────────────────────────────────────────────────
+
+def _term_major(terms: np.ndarray, docs: np.ndarray, values: np.ndarray, n_terms: int):
+    """Reorder doc-major (doc, term, value) triples into term-major postings."""
+    order = np.argsort(terms, kind="stable")
+    term_ptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=n_terms))]).astype(np.int64)
+    return term_ptr, docs[order].astype(np.int32), values[order]
+
+
+def _accumulate(index, terms: np.ndarray, q_weights: np.ndarray) -> np.ndarray:
+    """Sparse dot product: sum q_weight × posting weight per document."""
+    starts, ends = index.term_ptr[terms], index.term_ptr[terms + 1]
+    sizes = ends - starts
+    rows = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+    contrib = np.repeat(q_weights, sizes) * index.weights[rows]
+    return np.bincount(index.doc_ids[rows], weights=contrib, minlength=index.n_docs).astype(np.float32)
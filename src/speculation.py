@@ -0,0 +1,205 @@
+"""
+speculation.py — Search and fetch the raw query while the agent plans
+-----------------------------------------------------------------------
+Query planning is a Groq round trip, and search used to wait for it. A
+speculative fetch starts the moment the user submits:
+
+  1. search_web([raw query]) runs in the background
+  2. its pages are fetched and cleaned as soon as the results arrive
+  3. once the planned queries have been searched, the caller merges both
+     result sets (merge_result_sets — first occurrence of a URL wins) and
+     hands the speculation to stream_pages_to_store(); URLs that are
+     already in flight are not fetched again, and pages from both sets
+     are yielded in completion order
+
+The raw query's top results usually overlap the planned ones, so most of
+the fetching is done by the time planning returns. A fetch that fails
+part-way can't be resumed, so once every fetch has finished, pages()
+fetches again any claimed URL whose page never arrived.
+
+Configuration (.env):
+  SYNAPSE_SPECULATIVE_SEARCH   "0" disables speculation (default on)
+"""
+
+import os
+import queue
+import asyncio
+import threading
+
+from src.search import search_web, search_web_async
+from src.scraper import iter_fetch_and_clean, iter_fetch_and_clean_async
+
+ENABLED = os.getenv("SYNAPSE_SPECULATIVE_SEARCH", "1") != "0"
+
+_DONE = object()    # end-of-producer marker on the page queue
+
+
+class SpeculativeFetch:
+    """Threaded speculation for the Streamlit path (see module docstring)."""
+
+    def __init__(self, query: str, results_per_query: int = 5, use_cache: bool = True):
+        self.query = query
+        self._results: list[dict] = []
+        self._searched = threading.Event()
+        self._cancelled = threading.Event()
+        self._pages: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._claimed: dict[str, dict] = {}    # url → search result, for re-fetching
+        self._producers = 1
+        threading.Thread(
+            target=self._run, args=(results_per_query, use_cache), name="speculative-fetch", daemon=True
+        ).start()
+
+    def results(self) -> list[dict]:
+        """The raw query's search results (waits for the search to finish)."""
+        self._searched.wait()
+        return self._results
+
+    def fetch(self, search_results: list[dict]) -> None:
+        """Fetch the results that are not already in flight; their pages join pages()."""
+        rest = self._claim(search_results)
+        with self._lock:
+            self._producers += 1
+        threading.Thread(target=self._pump, args=(rest,), name="speculative-fetch", daemon=True).start()
+
+    def pages(self):
+        """Yield cleaned pages from every fetch in completion order. Call after the last fetch()."""
+        finished, delivered = 0, set()
+        while True:
+            page = self._pages.get()
+            if page is _DONE:
+                finished += 1
+                with self._lock:
+                    if finished == self._producers:
+                        break
+                continue
+            delivered.add(page.get("url"))
+            yield page
+        if self._cancelled.is_set():
+            return
+        with self._lock:
+            missing = _missing(self._claimed, delivered)
+        if missing:
+            try:
+                yield from iter_fetch_and_clean(missing)
+            except Exception as e:
+                print(f"[speculation] Re-fetch failed ({str(e)[:80]})")
+
+    def cancel(self) -> None:
+        """Stop fetching (the run failed or was abandoned)."""
+        self._cancelled.set()
+
+    def _run(self, results_per_query: int, use_cache: bool):
+        try:
+            self._results = search_web([self.query], results_per_query, use_cache)
+        except Exception as e:
+            print(f"[speculation] Raw-query search failed ({str(e)[:80]})")
+        finally:
+            self._searched.set()
+        self._pump(self._claim(self._results))
+
+    def _pump(self, search_results: list[dict]):
+        # Pages this fails to deliver are re-fetched by pages()
+        try:
+            pages = iter_fetch_and_clean(search_results)
+            for page in pages:
+                if self._cancelled.is_set():
+                    pages.close()
+                    break
+                self._pages.put(page)
+        except Exception as e:
+            print(f"[speculation] Fetch failed ({str(e)[:80]})")
+        finally:
+            self._pages.put(_DONE)
+
+    def _claim(self, search_results: list[dict]) -> list[dict]:
+        with self._lock:
+            return _claim(self._claimed, search_results)
+
+
+class AsyncSpeculativeFetch:
+    """Event-loop twin of SpeculativeFetch for the API; create it inside a running loop."""
+
+    def __init__(self, query: str, results_per_query: int = 5, use_cache: bool = True):
+        self.query = query
+        self._results: list[dict] = []
+        self._searched = asyncio.Event()
+        self._pages: asyncio.Queue = asyncio.Queue()
+        self._claimed: dict[str, dict] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._start(self._run(results_per_query, use_cache))
+
+    async def results(self) -> list[dict]:
+        await self._searched.wait()
+        return self._results
+
+    def fetch(self, search_results: list[dict]) -> None:
+        self._start(self._pump(_claim(self._claimed, search_results)))
+
+    async def pages(self):
+        finished, delivered = 0, set()
+        while True:
+            page = await self._pages.get()
+            if page is _DONE:
+                finished += 1
+                if finished == len(self._tasks):
+                    break
+                continue
+            delivered.add(page.get("url"))
+            yield page
+        missing = _missing(self._claimed, delivered)
+        if missing:
+            try:
+                async for page in iter_fetch_and_clean_async(missing):
+                    yield page
+            except Exception as e:
+                print(f"[speculation] Re-fetch failed ({str(e)[:80]})")
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def _start(self, coro):
+        task = asyncio.create_task(coro)
+        # Fires however the task ends — even cancelled before it ever ran
+        task.add_done_callback(lambda _: (self._searched.set(), self._pages.put_nowait(_DONE)))
+        self._tasks.append(task)
+
+    async def _run(self, results_per_query: int, use_cache: bool):
+        try:
+            self._results = await search_web_async([self.query], results_per_query, use_cache)
+        except Exception as e:
+            print(f"[speculation] Raw-query search failed ({str(e)[:80]})")
+        self._searched.set()
+        await self._pump(_claim(self._claimed, self._results))
+
+    async def _pump(self, search_results: list[dict]):
+        # Pages this fails to deliver are re-fetched by pages()
+        try:
+            async for page in iter_fetch_and_clean_async(search_results):
+                self._pages.put_nowait(page)
+        except Exception as e:
+            print(f"[speculation] Fetch failed ({str(e)[:80]})")
+
+
+def _url(result: dict) -> str:
+    return (result.get("url") or "").strip()
+
+
+def _missing(claimed: dict[str, dict], delivered: set) -> list[dict]:
+    """Claimed results whose page never arrived (their fetch failed part-way)."""
+    missing = [result for url, result in claimed.items() if url not in delivered]
+    if missing:
+        print(f"[speculation] Re-fetching {len(missing)} URLs a failed fetch never delivered")
+    return missing
+
+
+def _claim(claimed: dict[str, dict], search_results: list[dict]) -> list[dict]:
+    """The results whose URLs are not in `claimed`, adding them to it."""
+    fresh = []
+    for result in search_results:
+        url = _url(result)
+        if url and url not in claimed:
+            claimed[url] = result
+            fresh.append(result)
+    return fresh
@@ -1,19 +1,86 @@
-import os, re
-from dotenv import load_dotenv
-load_dotenv()
+import asyncio
 
-def synthesize_report(user_query: str, chunks: list[dict], deep_mode: bool = False, stream_container=None) -> str:
+from src import llm
+from src.compressor import compress_chunks, COMPRESS_DEFAULT, TOKEN_BUDGET
+
+NO_CONTENT_REPORT = "## No Content\n\nCould not retrieve sufficient content. Try a different query."
+
+def synthesize_report(user_query: str, chunks: list[dict], deep_mode: bool = False, stream_container=None,
+                      compress: bool | None = None, stats: dict | None = None) -> str:
+    """
+    Args:
+        stream_container: Optional Streamlit container; the report is written
+                  into it token by token as the LLM produces it
+        compress: Extractively compress the chunks to a token budget first
+                  (default: SYNAPSE_COMPRESS_PROMPT)
+        stats:    Optional dict, filled with the compression stats
+                  (original_tokens, compressed_tokens, compression_ratio, ...)
+    """
     if not chunks:
-        return "## No Content\n\nCould not retrieve sufficient content. Try a different query."
+        return NO_CONTENT_REPORT
 
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise EnvironmentError("GROQ_API_KEY is not set.")
+    compress = COMPRESS_DEFAULT if compress is None else compress
+    if compress:
+        chunks = _compress(user_query, chunks, deep_mode, stats)
+    profile, messages, sources = _prepare(user_query, chunks, deep_mode, compressed=compress)
+    if stream_container is not None:
+        body = stream_container.write_stream(llm.stream(profile, messages))
+        return _with_sources(str(body).strip(), sources)
+    response = llm.invoke(profile, messages)
+    return _with_sources(response.content.strip(), sources)
 
-    # Set env var so ChatGroq picks it up automatically — works on all versions
-    os.environ["GROQ_API_KEY"] = api_key
+async def synthesize_report_async(user_query: str, chunks: list[dict], deep_mode: bool = False,
+                                  compress: bool | None = None, stats: dict | None = None) -> str:
+    """Same as synthesize_report() but awaits the LLM instead of blocking a thread."""
+    if not chunks:
+        return NO_CONTENT_REPORT
 
-    from langchain_groq import ChatGroq
+    compress = COMPRESS_DEFAULT if compress is None else compress
+    if compress:
+        # Sentence scoring runs MiniLM — keep it off the event loop
+        chunks = await asyncio.to_thread(_compress, user_query, chunks, deep_mode, stats)
+    profile, messages, sources = _prepare(user_query, chunks, deep_mode, compressed=compress)
+    response = await llm.ainvoke(profile, messages)
+    return _with_sources(response.content.strip(), sources)
+
+async def stream_report_async(user_query: str, chunks: list[dict], deep_mode: bool = False,
+                              compress: bool | None = None, stats: dict | None = None):
+    """
+    Async generator over the report text as the LLM produces it. The last
+    piece is the Sources section, so the joined pieces equal what
+    synthesize_report_async() returns.
+    """
+    if not chunks:
+        yield NO_CONTENT_REPORT
+        return
+
+    compress = COMPRESS_DEFAULT if compress is None else compress
+    if compress:
+        chunks = await asyncio.to_thread(_compress, user_query, chunks, deep_mode, stats)
+    profile, messages, sources = _prepare(user_query, chunks, deep_mode, compressed=compress)
+    # Match the .strip() of the non-streamed paths: drop leading whitespace and
+    # hold trailing whitespace back until more text follows it
+    started, held = False, ""
+    async for piece in llm.astream(profile, messages):
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        text = held + piece
+        body = text.rstrip()
+        held = text[len(body):]
+        if body:
+            yield body
+    yield _with_sources("", sources)
+
+def _compress(user_query: str, chunks: list[dict], deep_mode: bool, stats: dict | None) -> list[dict]:
+    compressed, info = compress_chunks(user_query, chunks, TOKEN_BUDGET * (2 if deep_mode else 1))
+    if stats is not None:
+        stats.update(info)
+    return compressed
+
+def _prepare(user_query: str, chunks: list[dict], deep_mode: bool, compressed: bool = False):
     from langchain_core.messages import HumanMessage, SystemMessage
 
     sources: dict[str, dict] = {}
@@ -28,8 +95,12 @@ def synthesize_report(user_query: str, chunks: list[dict], deep_mode: bool = Fal
     for chunk in chunks:
         url = chunk.get("url", "")
         idx = sources.get(url, {}).get("index", "?")
-        score = chunk.get("relevance_score", 0)
-        formatted.append(f"[Source {idx} | relevance={score:.2f}]:\n{chunk['text']}")
+        if compressed:
+            # Compressed text is already ranked — the score header is wasted tokens
+            formatted.append(f"[Source {idx}]:\n{chunk['text']}")
+        else:
+            score = chunk.get("relevance_score", 0)
+            formatted.append(f"[Source {idx} | relevance={score:.2f}]:\n{chunk['text']}")
     chunks_text = "\n\n---\n\n".join(formatted)
 
     word_target = "1500-2000" if deep_mode else "600-900"
@@ -62,14 +133,10 @@ def synthesize_report(user_query: str, chunks: list[dict], deep_mode: bool = Fal
         f"Source Chunks:\n{chunks_text}\n\nWrite the report now."
     )
 
-    llm = ChatGroq(
-        model="llama-3.3-70b-versatile",
-        temperature=0.3,
-        max_tokens=3000 if deep_mode else 1800,
-    )
-    response = llm.invoke([SystemMessage(content=system), HumanMessage(content=user_prompt)])
-    report_body = response.content.strip()
+    profile = "report_deep" if deep_mode else "report"
+    return profile, [SystemMessage(content=system), HumanMessage(content=user_prompt)], sources
 
+def _with_sources(report_body: str, sources: dict[str, dict]) -> str:
     sorted_sources = sorted(sources.values(), key=lambda s: s["index"])
     sources_md = "\n".join(f"**[{s['index']}]** [{s['title']}]({s['url']})" for s in sorted_sources)
     return report_body + f"\n\n---\n\n## Sources\n\n{sources_md}"
\ No newline at end of file
@@ -2,147 +2,698 @@
 vector_store.py — Pure local embeddings, zero external API calls.
 
 Primary:  sentence-transformers all-MiniLM-L6-v2 (runs fully locally)
-Fallback: TF-IDF cosine similarity (pure numpy, no downloads needed)
-
-The HuggingFace *inference* API is never used.
+Fallback: sparse TF-IDF cosine similarity with corpus IDF (sparse_index.py,
+          pure numpy, no downloads needed)
+
+The HuggingFace *inference* API is never used. Chunk embeddings are cached
+on disk by content hash (embedding_cache.py), so only new text is encoded.
+
+Chunks live in a VectorStore: rows are L2-normalised once at insert time
+and kept as float16 by default (SYNAPSE_STORE_DTYPE = float32 | float16 |
+int8; SYNAPSE_STORE_RESCORE=1 rescores quantised shortlists exactly), so
+retrieval is a single matrix product. Stores with at least SYNAPSE_ANN_MIN_CHUNKS dense
+vectors (default 20000) also get an IVF-PQ index (ann_index.py); smaller
+ones use exact top-k via argpartition. SYNAPSE_ANN_NPROBE (default 16)
+trades recall for latency.
+
+Every store also carries a BM25 index (sparse_index.py). Retrieval mode is
+"dense", "bm25" or "hybrid" — reciprocal rank fusion of dense and BM25
+ranks, which surfaces exact-term matches (names, numbers, acronyms) that
+MiniLM blurs. SYNAPSE_RETRIEVAL_MODE sets the default (dense; bm25 and
+hybrid are opt-in per request).
+
+With SYNAPSE_EMBED_SERVER set, encoding goes to the shared embedding
+process (embed_server.py), which micro-batches requests from every worker
+on the host; if it is unreachable or serves another model, the local model
+is loaded instead.
 """
 
+import os
+import json
+import tempfile
 import numpy as np
+from multiprocessing import AuthenticationError
+
+from src import resources
+from src.cache_db import cache_path
+from src.embedding_cache import get_cache
+from src.ann_index import IVFPQIndex, exact_search, top_k as top_k_scores
+from src.sparse_index import TfidfIndex, BM25Index, count_terms
+from src.embed_server import EmbedClient
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+ANN_MIN_CHUNKS = int(os.getenv("SYNAPSE_ANN_MIN_CHUNKS", "20000"))
+ANN_NPROBE = int(os.getenv("SYNAPSE_ANN_NPROBE", "16"))
+
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+RETRIEVAL_MODE = os.getenv("SYNAPSE_RETRIEVAL_MODE", "dense")
+STORE_DTYPES = ("float32", "float16", "int8")
+STORE_DTYPE = os.getenv("SYNAPSE_STORE_DTYPE", "float16")
+STORE_RESCORE = os.getenv("SYNAPSE_STORE_RESCORE", "0") == "1"
+EMBED_SERVER = os.getenv("SYNAPSE_EMBED_SERVER", "")
+RESCORE_FACTOR = 4    # quantised stores rescore the top k × RESCORE_FACTOR exactly
+
+RRF_K = 60            # reciprocal rank fusion constant
+FUSION_DEPTH = 5      # hybrid mode fuses the top k × FUSION_DEPTH of each ranker
 
-_st_model = None          # sentence-transformers model (lazy loaded)
 _use_tfidf = False        # flipped to True if ST fails to load
+_remote_down = False      # flipped to True if the embedding server drops out
 
 
 # ── sentence-transformers (primary) ──────────────────────────────────────────
 
 def _load_st_model():
-    global _st_model, _use_tfidf
-    if _st_model is not None:
-        return _st_model
+    """
+    The process-wide encoder, loaded once through the resource registry:
+    the embedding server client when configured and reachable, else the
+    local ST model.
+    """
+    global _use_tfidf
+    if EMBED_SERVER and not _remote_down:
+        client = resources.get("embedding_client", _connect_embed_server)
+        if client is not None:
+            return client
+    model = resources.get("embedding_model", _create_st_model)
+    if model is None:
+        _use_tfidf = True
+    return model
+
+
+def _create_st_model():
     try:
         # IMPORTANT: set env vars BEFORE importing so the library never tries
         # to call the remote inference API
-        import os
         os.environ["TOKENIZERS_PARALLELISM"] = "false"
         os.environ["TRANSFORMERS_OFFLINE"] = "0"   # allow model download once
         os.environ["HF_HUB_DISABLE_IMPLICIT_TOKEN"] = "1"
 
         from sentence_transformers import SentenceTransformer
-        _st_model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
-        print("[vector_store] Loaded all-MiniLM-L6-v2 locally")
-        return _st_model
+        model = SentenceTransformer(MODEL_NAME, device="cpu")
+        print(f"[vector_store] Loaded {MODEL_NAME} locally")
+        return model
     except Exception as e:
         print(f"[vector_store] sentence-transformers failed ({e}), switching to TF-IDF")
-        _use_tfidf = True
         return None
 
 
-# ── TF-IDF fallback (pure numpy, no internet) ────────────────────────────────
-
-def _tfidf_vectorize(texts: list[str], vocab: dict | None = None):
-    """Returns (matrix, vocab) where matrix rows are L2-normalised TF-IDF vectors."""
-    import re, math
-
-    tokenize = lambda t: re.findall(r"[a-z]+", t.lower())
-
-    # Build vocab from texts if not provided
-    if vocab is None:
-        all_words: set[str] = set()
-        for t in texts:
-            all_words.update(tokenize(t))
-        vocab = {w: i for i, w in enumerate(sorted(all_words))}
-
-    n_docs = len(texts)
-    mat = np.zeros((n_docs, len(vocab)), dtype=np.float32)
+def _connect_embed_server():
+    try:
+        client = EmbedClient(EMBED_SERVER)
+    except Exception as e:
+        print(f"[vector_store] Embedding server at {EMBED_SERVER} unreachable ({str(e)[:60]}), using local model")
+        return None
+    if client.model_name != MODEL_NAME:
+        # Vectors from another model would poison the shared embedding cache
+        print(f"[vector_store] Embedding server runs {client.model_name}, expected {MODEL_NAME} — using local model")
+        return None
+    print(f"[vector_store] Using embedding server at {EMBED_SERVER}")
+    return client
 
-    # TF
-    for d, text in enumerate(texts):
-        tokens = tokenize(text)
-        for tok in tokens:
-            if tok in vocab:
-                mat[d, vocab[tok]] += 1
-        if tokens:
-            mat[d] /= len(tokens)   # normalize TF
 
-    # IDF
-    df = (mat > 0).sum(axis=0).astype(np.float32)
-    idf = np.log((n_docs + 1) / (df + 1)) + 1.0
-    mat = mat * idf
+def embed_server_stats() -> dict | None:
+    """Batching stats from the embedding server, or None when it isn't in use."""
+    if not EMBED_SERVER or _remote_down:
+        return None
+    client = resources.get("embedding_client", _connect_embed_server)
+    if client is None:
+        return None
+    try:
+        return client.stats()
+    except Exception:
+        return None
 
-    # L2 normalize
-    norms = np.linalg.norm(mat, axis=1, keepdims=True) + 1e-9
-    mat = mat / norms
 
-    return mat, vocab
+def warm_up() -> bool:
+    """Load the model and run one dummy encode. Returns False on the TF-IDF fallback."""
+    model = _load_st_model()
+    if model is None:
+        return False
+    _encode(model, ["warm-up sentence for the embedding model"])
+    return True
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
-def embed_and_store(chunks: list[dict]) -> dict:
+def embed_and_store(chunks: list[dict]) -> "VectorStore":
     if not chunks:
-        return {"embeddings": np.array([]), "chunks": [], "tfidf_vocab": None}
+        return VectorStore()
 
     texts = [c["text"] for c in chunks]
-
+    embeddings = embed_texts(texts)
+    if embeddings is not None:
+        print(f"[vector_store] Embedded {len(texts)} chunks with ST, shape={embeddings.shape}")
+    return build_store(chunks, embeddings)
+
+
+def embed_texts(texts: list[str]) -> np.ndarray | None:
+    """
+    Encode texts with the local ST model.
+    Returns None when ST is unavailable, so callers fall back to TF-IDF
+    (which needs the whole corpus and therefore can't be done per batch).
+    """
     model = _load_st_model()
+    if _use_tfidf or model is None:
+        return None
+    try:
+        cache = get_cache(MODEL_NAME, model.get_sentence_embedding_dimension())
+        if cache is None:
+            return _encode(model, texts)
+
+        # Only cache misses go to the model
+        embeddings, hit = cache.lookup(texts)
+        miss = np.flatnonzero(~hit)
+        if len(miss):
+            miss_texts = [texts[i] for i in miss]
+            fresh = _encode(model, miss_texts)
+            embeddings[miss] = fresh
+            cache.add(miss_texts, fresh)
+        print(f"[vector_store] Embedding cache: {len(texts) - len(miss)}/{len(texts)} hits")
+        return embeddings
+    except Exception as e:
+        print(f"[vector_store] ST encode failed ({e}), falling back to TF-IDF")
+        return None
 
-    if not _use_tfidf and model is not None:
+
+def _encode(model, texts: list[str]) -> np.ndarray:
+    global _remote_down
+    if isinstance(model, EmbedClient):
+        # Embedding server client — a dead server falls back to the local model for good
         try:
-            embeddings = model.encode(
-                texts,
-                show_progress_bar=False,
-                batch_size=32,
-                convert_to_numpy=True,
-            )
-            print(f"[vector_store] Embedded {len(texts)} chunks with ST, shape={embeddings.shape}")
-            return {"embeddings": np.array(embeddings), "chunks": chunks, "tfidf_vocab": None}
-        except Exception as e:
-            print(f"[vector_store] ST encode failed ({e}), falling back to TF-IDF")
-
-    # TF-IDF fallback
-    print(f"[vector_store] Using TF-IDF fallback for {len(texts)} chunks")
-    matrix, vocab = _tfidf_vectorize(texts)
-    return {"embeddings": matrix, "chunks": chunks, "tfidf_vocab": vocab}
-
-
-def retrieve_relevant_chunks(store: dict, query: str, top_k: int = 8) -> list[dict]:
-    embeddings = store.get("embeddings")
-    chunks     = store.get("chunks", [])
-    vocab      = store.get("tfidf_vocab")
-
-    if embeddings is None or len(embeddings) == 0:
-        return []
-
-    # Embed the query using the same method as the chunks
+            return np.asarray(model.encode(texts), dtype=np.float32)
+        except (OSError, EOFError, AuthenticationError) as e:
+            print(f"[vector_store] Embedding server lost ({str(e)[:60]}), loading local model")
+            _remote_down = True
+            model = _load_st_model()
+            if model is None:
+                raise
+    embeddings = model.encode(
+        texts,
+        show_progress_bar=False,
+        batch_size=32,
+        convert_to_numpy=True,
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def build_store(chunks: list[dict], embeddings: np.ndarray | None) -> "VectorStore":
+    """Assemble a store from chunks and their ST embeddings (None → TF-IDF fallback)."""
+    store = VectorStore()
+    if not chunks:
+        return store
+    if embeddings is None:
+        print(f"[vector_store] Using TF-IDF fallback for {len(chunks)} chunks")
+    store.add(chunks, embeddings)
+    return store
+
+
+def encode_normalized(texts: list[str]) -> np.ndarray | None:
+    """
+    Unit-length ST vectors for short-lived text (queries, sentences), without
+    touching the embedding cache. None if the model is unavailable.
+    """
     model = _load_st_model()
+    if _use_tfidf or model is None:
+        return None
+    try:
+        return _normalize(_encode(model, texts))
+    except Exception as e:
+        print(f"[vector_store] Encode failed ({e})")
+        return None
 
-    if not _use_tfidf and model is not None and vocab is None:
-        try:
-            q_vec = model.encode([query], convert_to_numpy=True)[0]
-        except Exception:
-            q_vec = None
-    else:
-        q_vec = None
-
-    if q_vec is None:
-        # TF-IDF path — must use same vocab
-        if vocab is None:
-            # Rebuild vocab from chunk texts (shouldn't happen but safe)
-            _, vocab = _tfidf_vectorize([c["text"] for c in chunks])
-        q_mat, _ = _tfidf_vectorize([query], vocab=vocab)
-        q_vec = q_mat[0]
-
-    # Cosine similarity
-    q_norm = q_vec / (np.linalg.norm(q_vec) + 1e-9)
-    m_norm = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9)
-    scores = m_norm @ q_norm
-
-    top_i = np.argsort(scores)[::-1][:min(top_k, len(chunks))]
-    result = []
-    for i in top_i:
-        c = chunks[i].copy()
-        c["relevance_score"] = round(float(scores[i]), 4)
-        result.append(c)
-
-    print(f"[vector_store] Retrieved {len(result)} chunks, top score={result[0]['relevance_score']}")
-    return result
\ No newline at end of file
+
+def retrieve_relevant_chunks(store: "VectorStore", query: str, top_k: int = 8, mode: str | None = None) -> list[dict]:
+    result = store.search([query], top_k, mode=mode)[0]
+    if result:
+        print(f"[vector_store] Retrieved {len(result)} chunks, top score={result[0]['relevance_score']}")
+    return result
+
+
+def retrieve_relevant_chunks_batch(store: "VectorStore", queries: list[str], top_k: int = 8,
+                                   nprobe: int | None = None, mode: str | None = None) -> list[list[dict]]:
+    """Top-k chunks for several queries at once — see VectorStore.search()."""
+    return store.search(queries, top_k, mode=mode, nprobe=nprobe)
+
+
+# ── VectorStore ──────────────────────────────────────────────────────────────
+
+class VectorStore:
+    """
+    Chunks + their unit-length embeddings + lexical indexes, for one session
+    or for a long-lived corpus.
+
+    Vectors are normalised once in add(), so a dense query is one blocked
+    matrix product. Storage dtype:
+      float32  exact, 4 bytes/dim
+      float16  2 bytes/dim, cosine error ~1e-3 (default)
+      int8     1 byte/dim + one float32 scale per row
+    With rescore=True a quantised store also keeps the float32 rows in a
+    memory-mapped spill file; the dense shortlist (top k × RESCORE_FACTOR)
+    is rescored exactly from it, and only those rows are ever paged in.
+
+    Chunk metadata is columnar: texts and chunk ids in plain lists,
+    url/title as int32 codes into de-duplicated value tables. Rows are
+    addressed by stable integer keys returned from add(), so remove()
+    never invalidates keys held by callers. A store without embeddings
+    (ST unavailable) serves "dense" queries from sparse TF-IDF instead.
+    """
+
+    __slots__ = (
+        "dtype", "rescore", "dim", "ann",
+        "_vectors", "_scales", "_exact", "_keys", "_next_key",
+        "_texts", "_chunk_ids", "_urls", "_titles", "_extra",
+        "_tfidf", "_bm25", "_lexical_stale",
+    )
+
+    def __init__(self, dtype: str = STORE_DTYPE, rescore: bool = STORE_RESCORE):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown store dtype {dtype!r} (expected one of {', '.join(STORE_DTYPES)})")
+        self.dtype = dtype
+        self.rescore = rescore and dtype != "float32"
+        self.dim: int | None = None
+        self.ann: IVFPQIndex | None = None
+
+        self._vectors: np.ndarray | None = None     # (n, dim) in self.dtype; None → lexical-only
+        self._scales = np.zeros(0, dtype=np.float32)  # int8 only: per-row dequantisation scale
+        self._exact: _ExactRows | None = None
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._next_key = 0
+
+        self._texts: list[str] = []
+        self._chunk_ids: list[str] = []
+        self._urls = _Column()
+        self._titles = _Column()
+        self._extra: dict[str, list] = {}
+
+        self._tfidf: TfidfIndex | None = None
+        self._bm25: BM25Index | None = None
+        self._lexical_stale = False
+
+    # ─── Mutation ────────────────────────────────────────────────────────────
+
+    def add(self, chunks: list[dict], embeddings: np.ndarray | None = None) -> np.ndarray:
+        """
+        Append chunks (and their embeddings, for a dense store).
+
+        Returns:
+            The new rows' keys, for remove()
+        """
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        if len(self) and (embeddings is None) != (self._vectors is None):
+            raise ValueError("Cannot mix chunks with and without embeddings in one VectorStore")
+        if embeddings is not None and len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks")
+
+        start = len(self)
+        if embeddings is not None:
+            self._append_vectors(_normalize(embeddings))
+
+        keys = np.arange(self._next_key, self._next_key + len(chunks), dtype=np.int64)
+        self._next_key += len(chunks)
+        self._keys = np.concatenate([self._keys, keys])
+
+        for key in self._extra:
+            self._extra[key].extend([None] * len(chunks))
+        for i, c in enumerate(chunks):
+            self._texts.append(c["text"])
+            self._chunk_ids.append(c.get("chunk_id", ""))
+            for key, value in c.items():
+                if key not in _CORE_FIELDS:
+                    self._extra.setdefault(key, [None] * (start + len(chunks)))[start + i] = value
+        self._urls.extend(c.get("url", "") for c in chunks)
+        self._titles.extend(c.get("title", "") for c in chunks)
+        self._lexical_stale = True
+
+        if self._vectors is not None:
+            if self.ann is not None:
+                self.ann.add(self._float_rows(np.arange(start, len(self))), ids=np.arange(start, len(self)))
+            elif len(self) >= ANN_MIN_CHUNKS:
+                self.build_ann_index()
+        return keys
+
+    def remove(self, keys) -> int:
+        """Delete rows by key. Returns how many rows were removed."""
+        drop = np.isin(self._keys, np.asarray(list(keys) if not isinstance(keys, np.ndarray) else keys))
+        n_drop = int(drop.sum())
+        if not n_drop:
+            return 0
+        keep = ~drop
+        if self._vectors is not None:
+            self._vectors = self._vectors[keep]
+            if self.dtype == "int8":
+                self._scales = self._scales[keep]
+            if self._exact is not None:
+                self._exact.keep(keep)
+        if self.ann is not None:
+            mapping = np.full(len(keep), -1, dtype=np.int64)
+            mapping[keep] = np.arange(int(keep.sum()))
+            self.ann.remap(mapping)
+
+        self._keys = self._keys[keep]
+        rows = np.flatnonzero(keep).tolist()
+        self._texts = [self._texts[i] for i in rows]
+        self._chunk_ids = [self._chunk_ids[i] for i in rows]
+        self._urls.keep(keep)
+        self._titles.keep(keep)
+        for key, column in self._extra.items():
+            self._extra[key] = [column[i] for i in rows]
+        self._lexical_stale = True
+        return n_drop
+
+    def build_ann_index(self, **params) -> IVFPQIndex:
+        """
+        Build (or rebuild) the IVF-PQ index over the dense rows.
+        `params` are passed to IVFPQIndex (nlist, m, nprobe, rerank_factor, ...).
+        """
+        if self._vectors is None:
+            raise ValueError("ANN index needs a store with embeddings")
+        params.setdefault("nprobe", ANN_NPROBE)
+        self.ann = IVFPQIndex(**params).build(self._float_rows(np.arange(len(self))))
+        print(f"[vector_store] Built ANN index over {self.ann.ntotal} chunks (nlist={self.ann.nlist}, m={self.ann.m})")
+        return self.ann
+
+    # ─── Search ──────────────────────────────────────────────────────────────
+
+    def search(self, queries: list[str], top_k: int = 8, mode: str | None = None,
+               nprobe: int | None = None) -> list[list[dict]]:
+        """
+        Top-k chunks for several queries at once: one encode call and one
+        matrix product (or one batched ANN search) for the whole batch.
+
+        Args:
+            mode: "dense" (embeddings / TF-IDF cosine), "bm25", or "hybrid"
+                  (reciprocal rank fusion of both). Default: RETRIEVAL_MODE.
+
+        Returns:
+            One list of chunk dicts (with "relevance_score") per query.
+            relevance_score is the dense cosine in dense and hybrid mode
+            (hybrid results also carry "fusion_score"). bm25 mode never
+            touches the model: it returns only chunks sharing a query term,
+            with the raw "bm25_score" and a relevance_score of that score
+            divided by the query's best one, so it stays in (0, 1].
+        """
+        mode = (mode or RETRIEVAL_MODE).lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r} (expected one of {', '.join(RETRIEVAL_MODES)})")
+        if not len(self) or not queries:
+            return [[] for _ in queries]
+
+        self._refresh_lexical()
+        k = min(top_k, len(self))
+        dense = None if mode == "bm25" else self._dense_search(queries, k, nprobe, mode)
+
+        if dense is None:
+            scores, ids = top_k_scores(self._bm25.score(queries), k)
+            results = []
+            for row_scores, row_ids in zip(scores, ids):
+                keep = (row_ids >= 0) & (row_scores > 0)    # no query term at all — not a match
+                row_scores, row_ids = row_scores[keep], row_ids[keep]
+                best = row_scores.max() if len(row_scores) else 1.0
+                hits = self._collect(row_ids, row_scores / best)
+                for c, b in zip(hits, row_scores):
+                    c["bm25_score"] = round(float(b), 4)
+                results.append(hits)
+            return results
+        if mode == "dense":
+            scores, ids, _ = dense
+            return [self._collect(row_ids, row_scores) for row_scores, row_ids in zip(scores, ids)]
+
+        # Hybrid: fuse the dense and BM25 rankings, report dense cosine as relevance
+        d_scores, d_ids, similarity = dense
+        b_scores, b_ids = top_k_scores(self._bm25.score(queries), d_ids.shape[1])
+        b_ids[b_scores <= 0] = -1          # no query term at all — not a lexical match
+        results = []
+        for qi in range(len(queries)):
+            fused, fusion = _reciprocal_rank_fusion([d_ids[qi], b_ids[qi]], k)
+            hits = self._collect(fused, similarity(qi, fused))
+            for c, f in zip(hits, fusion):
+                c["fusion_score"] = round(float(f), 5)
+            results.append(hits)
+        return results
+
+    def chunk(self, row: int) -> dict:
+        """Materialise one row as the chunk dict it was added as."""
+        c = {
+            "text": self._texts[row],
+            "url": self._urls.get(row),
+            "title": self._titles.get(row),
+            "chunk_id": self._chunk_ids[row],
+        }
+        for key, column in self._extra.items():
+            if column[row] is not None:
+                c[key] = column[row]
+        return c
+
+    @property
+    def chunks(self) -> list[dict]:
+        return [self.chunk(i) for i in range(len(self))]
+
+    @property
+    def keys(self) -> np.ndarray:
+        return self._keys.copy()
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes of the vector, index and code arrays (not the texts)."""
+        total = self._keys.nbytes + self._scales.nbytes + self._urls.codes.nbytes + self._titles.codes.nbytes
+        if self._vectors is not None:
+            total += self._vectors.nbytes
+        if self.ann is not None:
+            total += self.ann.codes.nbytes + self.ann.ids.nbytes
+        for index in (self._tfidf, self._bm25):
+            if index is not None:
+                total += index.nbytes
+        return total
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    # ─── Persistence ─────────────────────────────────────────────────────────
+
+    def save(self, path: str) -> None:
+        """Write the store to directory `path` (lexical indexes are rebuilt on load)."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "keys": self._keys, "scales": self._scales,
+            "url_codes": self._urls.codes, "title_codes": self._titles.codes,
+        }
+        if self._vectors is not None:
+            arrays["vectors"] = self._vectors
+        np.savez(os.path.join(path, "arrays.npz"), **arrays)
+        if self._exact is not None:
+            np.save(os.path.join(path, "exact.npy"), self._exact.rows(slice(None)))
+        if self.ann is not None:
+            self.ann.save(os.path.join(path, "ann.npz"))
+        with open(os.path.join(path, "store.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "dtype": self.dtype, "rescore": self.rescore, "dim": self.dim, "next_key": self._next_key,
+                "texts": self._texts, "chunk_ids": self._chunk_ids,
+                "urls": self._urls.values, "titles": self._titles.values, "extra": self._extra,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorStore":
+        with open(os.path.join(path, "store.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(dtype=meta["dtype"], rescore=meta["rescore"])
+        store.dim = meta["dim"]
+        store._next_key = meta["next_key"]
+        store._texts, store._chunk_ids, store._extra = meta["texts"], meta["chunk_ids"], meta["extra"]
+
+        with np.load(os.path.join(path, "arrays.npz")) as data:
+            store._keys, store._scales = data["keys"], data["scales"]
+            store._urls = _Column(meta["urls"], data["url_codes"])
+            store._titles = _Column(meta["titles"], data["title_codes"])
+            store._vectors = data["vectors"] if "vectors" in data.files else None
+        if store.rescore and store._vectors is not None:
+            store._exact = _ExactRows(store.dim)
+            store._exact.append(np.load(os.path.join(path, "exact.npy")))
+        if os.path.exists(os.path.join(path, "ann.npz")):
+            store.ann = IVFPQIndex.load(os.path.join(path, "ann.npz"))
+        store._lexical_stale = True
+        return store
+
+    # ─── Internal helpers ────────────────────────────────────────────────────
+
+    def _append_vectors(self, vectors: np.ndarray):
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            if self.rescore:
+                self._exact = _ExactRows(self.dim)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim {vectors.shape[1]} != store dim {self.dim}")
+
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0 + 1e-12
+            stored = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales = np.concatenate([self._scales, scales.astype(np.float32)])
+        else:
+            stored = vectors.astype(self.dtype)
+        self._vectors = stored if self._vectors is None else np.concatenate([self._vectors, stored])
+        if self._exact is not None:
+            self._exact.append(vectors)
+
+    def _float_rows(self, rows) -> np.ndarray:
+        """Rows as float32: exact when a spill file exists, else dequantised."""
+        if self._exact is not None:
+            return self._exact.rows(rows)
+        out = self._vectors[rows].astype(np.float32)
+        if self.dtype == "int8":
+            out *= self._scales[rows, None]
+        return out
+
+    def _dense_scores(self, q_mat: np.ndarray) -> np.ndarray:
+        """(n_queries, n) cosine scores from the stored rows, upcast block by block."""
+        n = len(self)
+        out = np.empty((len(q_mat), n), dtype=np.float32)
+        for start in range(0, n, _SCORE_BLOCK):
+            block = self._vectors[start:start + _SCORE_BLOCK]
+            scores = q_mat @ (block if self.dtype == "float32" else block.astype(np.float32)).T
+            if self.dtype == "int8":
+                scores *= self._scales[start:start + _SCORE_BLOCK]
+            out[:, start:start + _SCORE_BLOCK] = scores
+        return out
+
+    def _dense_search(self, queries: list[str], k: int, nprobe: int | None, mode: str):
+        """
+        Dense top-k (hybrid mode fetches a deeper candidate list for fusion).
+
+        Returns:
+            (scores, ids, similarity) where similarity(qi, rows) gives the dense
+            score of any rows for query qi — or None if no dense model is usable
+        """
+        depth = min(len(self), max(k * FUSION_DEPTH, k)) if mode == "hybrid" else k
+
+        if self._vectors is None:
+            full = self._tfidf.score(queries)
+            scores, ids = top_k_scores(full, depth)
+            return scores, ids, lambda qi, rows: full[qi, rows]
+
+        q_mat = encode_normalized(queries)
+        if q_mat is None:
+            return None
+        similarity = lambda qi, rows: self._float_rows(rows) @ q_mat[qi]
+
+        if self.ann is not None and q_mat.shape[1] == self.ann.dim:
+            scores, ids = self.ann.search(q_mat, depth, nprobe=nprobe, vectors=_RowView(self._float_rows))
+            return scores, ids, similarity
+
+        shortlist = min(len(self), depth * RESCORE_FACTOR) if self._exact is not None else depth
+        scores, ids = top_k_scores(self._dense_scores(q_mat), shortlist)
+        if self._exact is not None:
+            exact = np.stack([similarity(qi, ids[qi]) for qi in range(len(q_mat))])
+            order = np.argsort(-exact, axis=1)[:, :depth]
+            scores, ids = np.take_along_axis(exact, order, axis=1), np.take_along_axis(ids, order, axis=1)
+        return scores, ids, similarity
+
+    def _refresh_lexical(self):
+        if not self._lexical_stale and self._bm25 is not None:
+            return
+        counts = count_terms(self._texts)
+        self._bm25 = BM25Index.build(self._texts, counts=counts)
+        self._tfidf = TfidfIndex.build(self._texts, counts=counts) if self._vectors is None else None
+        self._lexical_stale = False
+
+    def _collect(self, ids: np.ndarray, scores: np.ndarray) -> list[dict]:
+        hits = []
+        for score, i in zip(scores, ids):
+            if i < 0:
+                continue
+            c = self.chunk(int(i))
+            c["relevance_score"] = round(float(score), 4)
+            hits.append(c)
+        return hits
+
+
+_CORE_FIELDS = {"text", "url", "title", "chunk_id"}
+_SCORE_BLOCK = 65536
+
+
+class _Column:
+    """Dictionary-encoded string column: int32 codes into a table of distinct values."""
+
+    __slots__ = ("values", "codes", "_index")
+
+    def __init__(self, values: list | None = None, codes: np.ndarray | None = None):
+        self.values = list(values or [])
+        self.codes = codes if codes is not None else np.zeros(0, dtype=np.int32)
+        self._index = {v: i for i, v in enumerate(self.values)}
+
+    def extend(self, items):
+        new = [self._index.setdefault(v, len(self._index)) for v in items]
+        self.values.extend(list(self._index)[len(self.values):])
+        self.codes = np.concatenate([self.codes, np.asarray(new, dtype=np.int32)])
+
+    def keep(self, mask: np.ndarray):
+        self.codes = self.codes[mask]
+
+    def get(self, row: int):
+        return self.values[self.codes[row]]
+
+
+class _ExactRows:
+    """Append-only float32 rows in an anonymous temp file, read through np.memmap."""
+
+    __slots__ = ("dim", "_file", "_map", "_n")
+
+    def __init__(self, dim: int):
+        spill_dir = cache_path("stores")
+        os.makedirs(spill_dir, exist_ok=True)
+        self.dim = dim
+        self._file = tempfile.TemporaryFile(dir=spill_dir)
+        self._map = np.zeros((0, dim), dtype=np.float32)
+        self._n = 0
+
+    def append(self, vectors: np.ndarray):
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._file.flush()
+        self._n += len(vectors)
+        self._remap()
+
+    def rows(self, rows) -> np.ndarray:
+        return np.asarray(self._map[rows], dtype=np.float32)
+
+    def keep(self, mask: np.ndarray):
+        kept = np.array(self._map[mask])
+        self._map = None
+        self._file.seek(0)
+        self._file.truncate()
+        self._n = 0
+        self.append(kept)
+
+    def _remap(self):
+        if self._n:
+            self._map = np.memmap(self._file, dtype=np.float32, mode="r", shape=(self._n, self.dim))
+        else:
+            self._map = np.zeros((0, self.dim), dtype=np.float32)
+
+
+class _RowView:
+    """Lets IVFPQIndex rerank against rows the store materialises on demand."""
+
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def __getitem__(self, rows):
+        return self._fn(rows)
+
+
+def _reciprocal_rank_fusion(rankings: list[np.ndarray], k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    RRF: each list contributes 1 / (RRF_K + rank) to every id it ranks.
+    Returns the top-k fused ids and their fused scores.
+    """
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking[ranking >= 0].tolist(), start=1):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank)
+    best = sorted(fused.items(), key=lambda kv: -kv[1])[:k]
+    return np.array([i for i, _ in best], dtype=np.int64), np.array([f for _, f in best])
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-9)
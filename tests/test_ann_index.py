@@ -0,0 +1,67 @@
+import numpy as np
+
+from src.ann_index import IVFPQIndex, exact_search, top_k
+
+
+def _clustered(n: int, dim: int = 32, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    x = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, dim))
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(1).normal(size=(5, 200)).astype(np.float32)
+    top_scores, top_ids = top_k(scores, 10)
+
+    assert np.array_equal(top_ids, np.argsort(-scores, axis=1)[:, :10])
+    assert np.allclose(top_scores, -np.sort(-scores, axis=1)[:, :10])
+
+
+def test_ivfpq_recall_against_brute_force():
+    vectors = _clustered(5000)
+    queries = _clustered(50, seed=1)
+    _, truth = exact_search(vectors, queries, 10)
+
+    index = IVFPQIndex(m=16, nprobe=16).build(vectors)
+    _, approx_ids = index.search(queries, 10)
+    _, reranked_ids = index.search(queries, 10, vectors=vectors)
+
+    assert _recall(approx_ids, truth) >= 0.8
+    assert _recall(reranked_ids, truth) >= 0.9
+
+
+def test_ivfpq_save_load_round_trip(tmp_path):
+    vectors = _clustered(2000)
+    queries = _clustered(10, seed=2)
+    index = IVFPQIndex().build(vectors)
+    path = str(tmp_path / "ann.npz")
+    index.save(path)
+
+    loaded = IVFPQIndex.load(path)
+    expected = index.search(queries, 5, vectors=vectors)
+    actual = loaded.search(queries, 5, vectors=vectors)
+
+    assert loaded.ntotal == index.ntotal
+    assert np.array_equal(actual[1], expected[1])
+    assert np.allclose(actual[0], expected[0])
+
+
+def test_ivfpq_add_and_remap():
+    vectors = _clustered(2000)
+    index = IVFPQIndex(nprobe=64).build(vectors[:1500]).add(vectors[1500:])
+    assert index.ntotal == 2000
+
+    # Drop the first 100 rows: survivors shift down by 100, dropped ids disappear
+    mapping = np.arange(2000) - 100
+    mapping[:100] = -1
+    index.remap(mapping)
+    _, ids = index.search(vectors[1900], 10, vectors=vectors[100:])
+
+    assert index.ntotal == 1900
+    assert ids[0, 0] == 1800
+    assert index.ids.min() >= 0
@@ -0,0 +1,54 @@
+import pytest
+
+from src import compressor
+from src.compressor import compress_chunks, split_sentences
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("The dose is 5. Patients improved quickly. Take vitamin D. It helps bones.",
+     ["The dose is 5.", "Patients improved quickly.", "Take vitamin D.", "It helps bones."]),
+    ("John F. Kennedy spoke in Berlin. The crowd cheered.",
+     ["John F. Kennedy spoke in Berlin.", "The crowd cheered."]),
+    ("See Fig. 3 for details. Dr. Smith agreed.", ["See Fig. 3 for details.", "Dr. Smith agreed."]),
+    ("She said no. It ended there.", ["She said no.", "It ended there."]),
+    ("U.S. officials met on Monday! Was it useful? Nobody knows.",
+     ["U.S. officials met on Monday!", "Was it useful?", "Nobody knows."]),
+    ("", []),
+])
+def test_split_sentences(text, expected):
+    assert split_sentences(text) == expected
+
+
+@pytest.fixture(autouse=True)
+def lexical_scoring(monkeypatch):
+    """Score sentences with TF-IDF so the tests never load the embedding model."""
+    monkeypatch.setattr(compressor, "encode_normalized", lambda texts: None)
+
+
+CHUNKS = [
+    {"url": "https://a.example", "text": "Vitamin D helps calcium absorption. The weather was mild that year. "
+                                         "Bone density rose with vitamin D."},
+    {"url": "https://b.example", "text": "Stock markets closed higher. Traders were optimistic about earnings."},
+    {"url": "https://c.example", "text": "Low vitamin D is linked to weaker bones in older adults."},
+]
+
+
+def test_compress_keeps_relevant_sentences_in_order():
+    compressed, stats = compress_chunks("vitamin D bones", CHUNKS, token_budget=35)
+
+    assert [c["url"] for c in compressed] == ["https://a.example", "https://c.example"]
+    assert compressed[0]["text"] == "Vitamin D helps calcium absorption. Bone density rose with vitamin D."
+    assert sum(len(c["text"]) for c in compressed) <= 35 * compressor.CHARS_PER_TOKEN
+    assert stats["sentences_kept"] == "3/6"
+    assert stats["compression_ratio"] > 1
+
+
+def test_compress_under_budget_returns_chunks_unchanged():
+    compressed, stats = compress_chunks("vitamin D", CHUNKS, token_budget=10_000)
+    assert compressed is CHUNKS
+    assert stats["compression_ratio"] == 1.0
+
+
+def test_compress_keeps_best_sentence_when_budget_is_tiny():
+    compressed, _ = compress_chunks("stock markets", CHUNKS, token_budget=1)
+    assert [c["text"] for c in compressed] == ["Stock markets closed higher."]
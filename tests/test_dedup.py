@@ -0,0 +1,64 @@
+import zlib
+
+from src import dedup
+from src.dedup import NearDuplicateFilter, dedup_chunks, dedup_pages
+
+
+ARTICLE = (
+    "Researchers at the university reported that a daily walk of thirty minutes lowered "
+    "blood pressure in older adults over a twelve month trial. The effect was strongest "
+    "in participants who had not exercised before, and it persisted after the study ended. "
+    "The authors caution that the sample was small and call for a larger follow up study "
+    "across several countries before changing clinical guidance."
+)
+OTHER = (
+    "The central bank left interest rates unchanged on Thursday, citing slowing inflation "
+    "and a cooling labour market. Analysts expect the first cut early next year, although "
+    "several board members argued that wage growth remains too strong to ease policy now. "
+    "Markets rallied modestly after the announcement while the currency weakened slightly."
+)
+
+
+def test_minhash_matches_exact_integer_reference():
+    text = ARTICLE + " " + OTHER
+    sig = dedup._minhash(text)
+
+    shingles = set(dedup._shingles(dedup._WORD_RE.findall(text.lower())))
+    xs = [zlib.crc32(s.encode()) for s in shingles]
+    p = int(dedup._PRIME)
+    expected = [
+        min((int(a) * x + int(b)) % p for x in xs)
+        for a, b in zip(dedup._PERM_A, dedup._PERM_B)
+    ]
+    assert sig.tolist() == expected
+
+
+def test_near_duplicate_pages_are_dropped():
+    pages = [
+        {"url": "https://a.example/story", "status": "success", "text": ARTICLE},
+        {"url": "https://b.example/amp/story", "status": "success", "text": ARTICLE.upper().replace(". ", " —\n")},
+        {"url": "https://c.example/markets", "status": "success", "text": OTHER},
+    ]
+    kept = dedup_pages(pages, NearDuplicateFilter(enabled=True))
+
+    assert [p["url"] for p in kept] == ["https://a.example/story", "https://c.example/markets"]
+    assert pages[1]["duplicate_of"] == "https://a.example/story"
+
+
+def test_near_duplicate_chunks_are_dropped_and_mirrors_recorded():
+    chunks = [
+        {"url": "https://a.example/story", "text": ARTICLE},
+        {"url": "https://b.example/copy", "text": ARTICLE.replace("Researchers", "Scientists")},
+        {"url": "https://c.example/markets", "text": OTHER},
+    ]
+    dedup_filter = NearDuplicateFilter(enabled=True)
+    kept = dedup_chunks(chunks, dedup_filter)
+
+    assert [c["url"] for c in kept] == ["https://a.example/story", "https://c.example/markets"]
+    assert kept[0]["mirror_urls"] == ["https://b.example/copy"]
+    assert dedup_filter.chunks_removed == 1
+
+
+def test_disabled_filter_keeps_everything():
+    chunks = [{"url": "https://a.example", "text": ARTICLE}, {"url": "https://b.example", "text": ARTICLE}]
+    assert len(NearDuplicateFilter(enabled=False).filter_chunks(chunks)) == 2
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from src import cache_db
+from src.embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_db, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def test_add_then_lookup():
+    cache = EmbeddingCache(MODEL, DIM)
+    texts = [f"chunk {i}" for i in range(20)]
+    vectors = _vectors(20)
+    cache.add(texts[:10], vectors[:10])
+
+    found, hit = cache.lookup(texts)
+
+    assert hit.tolist() == [True] * 10 + [False] * 10
+    assert np.array_equal(found[:10], vectors[:10])
+    assert not found[10:].any()
+
+
+def test_duplicates_are_stored_once():
+    cache = EmbeddingCache(MODEL, DIM)
+    vectors = _vectors(3)
+    cache.add(["a", "b", "a"], vectors)
+    cache.add(["b", "c"], _vectors(2, seed=1))
+
+    found, hit = cache.lookup(["a", "b", "c"])
+
+    assert len(cache) == 3
+    assert hit.all()
+    assert np.array_equal(found[:2], vectors[:2])
+
+
+def test_reopen_and_merge_across_instances():
+    writer = EmbeddingCache(MODEL, DIM)
+    reader = EmbeddingCache(MODEL, DIM)
+    first, second = _vectors(50), _vectors(50, seed=1)
+    writer.add([f"first {i}" for i in range(50)], first)
+    # Keys from a second batch interleave with the first in the sorted index
+    reader.add([f"second {i}" for i in range(50)], second)
+
+    reopened = EmbeddingCache(MODEL, DIM)
+    texts = [f"first {i}" for i in range(50)] + [f"second {i}" for i in range(50)]
+    for cache in (writer, reader, reopened):
+        found, hit = cache.lookup(texts)
+        assert hit.all()
+        assert np.array_equal(found, np.concatenate([first, second]))
+
+
+def test_other_dim_starts_over():
+    EmbeddingCache(MODEL, DIM).add(["a"], _vectors(1))
+    cache = EmbeddingCache(MODEL, DIM * 2)
+    assert len(cache) == 0
+    assert not cache.lookup(["a"])[1].any()
+
+
+def test_truncated_vector_file_is_ignored_and_repaired():
+    cache = EmbeddingCache(MODEL, DIM)
+    cache.add(["a", "b"], _vectors(2))
+    with open(os.path.join(cache.dir, "vectors.f32"), "r+b") as f:
+        f.truncate(DIM * 4)
+
+    reopened = EmbeddingCache(MODEL, DIM)
+    assert not reopened.lookup(["a", "b"])[1].any()
+
+    vectors = _vectors(2, seed=1)
+    reopened.add(["a", "b"], vectors)
+    found, hit = EmbeddingCache(MODEL, DIM).lookup(["a", "b"])
+    assert hit.all()
+    assert np.array_equal(found, vectors)
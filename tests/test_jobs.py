@@ -0,0 +1,64 @@
+import asyncio
+
+from src.jobs import JobManager, CANCELLED, DONE
+
+
+def test_stop_with_running_job_returns():
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=4, ttl=60)
+        await manager.start()
+
+        async def sleeper(job):
+            await asyncio.sleep(60)
+
+        job = manager.submit(sleeper)
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(manager.stop(), 3)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == CANCELLED
+
+
+def test_cancelled_job_does_not_stop_worker():
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=4, ttl=60)
+        await manager.start()
+
+        async def sleeper(job):
+            await asyncio.sleep(60)
+
+        async def quick(job):
+            return "ok"
+
+        slow = manager.submit(sleeper)
+        await asyncio.sleep(0.05)
+        manager.cancel(slow.id)
+        fast = manager.submit(quick)
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(manager.stop(), 3)
+        return slow, fast
+
+    slow, fast = asyncio.run(scenario())
+    assert slow.status == CANCELLED
+    assert fast.status == DONE and fast.result == "ok"
+
+
+def test_cancel_after_task_finished_stays_cancelled():
+    async def scenario():
+        manager = JobManager(workers=1, max_queue=4, ttl=60)
+        await manager.start()
+
+        async def finishes_as_cancelled(job):
+            # DELETE arrives after this task is done but before the worker resumes
+            asyncio.get_running_loop().call_soon(manager.cancel, job.id)
+            return "ok"
+
+        job = manager.submit(finishes_as_cancelled)
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(manager.stop(), 3)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == CANCELLED
+    assert job.result is None
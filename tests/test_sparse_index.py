@@ -0,0 +1,63 @@
+import numpy as np
+
+from src.sparse_index import BM25Index, TfidfIndex, count_terms, tokenize
+
+DOCS = [
+    "Vitamin D supports bone health and calcium absorption.",
+    "Calcium and vitamin D together reduce fracture risk in older adults.",
+    "Interest rates were left unchanged by the central bank.",
+    "Bone density scans measure calcium content in bone.",
+    "",
+]
+QUERIES = ["vitamin D bone", "central bank rates", "calcium calcium fracture", "quantum chromodynamics"]
+
+
+def _dense_tfidf(texts: list[str], queries: list[str]) -> np.ndarray:
+    """Straightforward dense TF-IDF cosine with the index's corpus-level IDF."""
+    vocab = sorted({tok for t in texts for tok in tokenize(t)})
+    col = {w: i for i, w in enumerate(vocab)}
+
+    def tf(text):
+        tokens = tokenize(text)
+        row = np.zeros(len(vocab))
+        for tok in tokens:
+            if tok in col:
+                row[col[tok]] += 1
+        return row / max(len(tokens), 1)
+
+    docs = np.array([tf(t) for t in texts])
+    idf = np.log((len(texts) + 1) / ((docs > 0).sum(axis=0) + 1)) + 1
+    d = docs * idf
+    q = np.array([tf(t) for t in queries]) * idf
+    d /= np.linalg.norm(d, axis=1, keepdims=True) + 1e-9
+    q /= np.linalg.norm(q, axis=1, keepdims=True) + 1e-9
+    return q @ d.T
+
+
+def test_tfidf_matches_dense_reference():
+    scores = TfidfIndex.build(DOCS).score(QUERIES)
+    assert scores.shape == (len(QUERIES), len(DOCS))
+    assert np.allclose(scores, _dense_tfidf(DOCS, QUERIES), atol=1e-5)
+
+
+def test_bm25_ranks_matching_documents_first():
+    scores = BM25Index.build(DOCS).score(QUERIES)
+
+    assert np.argmax(scores[0]) == 0
+    assert scores[0, 2] == 0
+    assert np.argmax(scores[1]) == 2
+    assert np.argmax(scores[2]) == 1
+    assert not scores[3].any()
+    assert not scores[:, 4].any()
+
+
+def test_bm25_counts_repeated_query_terms_once():
+    index = BM25Index.build(DOCS)
+    single, repeated = index.score(["calcium", "calcium calcium calcium"])
+    assert np.allclose(single, repeated)
+
+
+def test_shared_counts_give_identical_indexes():
+    counts = count_terms(DOCS)
+    assert np.allclose(TfidfIndex.build(DOCS, counts).score(QUERIES), TfidfIndex.build(DOCS).score(QUERIES))
+    assert np.allclose(BM25Index.build(DOCS, counts).score(QUERIES), BM25Index.build(DOCS).score(QUERIES))
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+from src import speculation
+
+
+RAW = [{"url": f"https://raw.example/{i}"} for i in range(4)]
+PLANNED = RAW[2:] + [{"url": "https://planned.example/0"}]
+EVERY_URL = sorted({r["url"] for r in RAW + PLANNED})
+BROKEN_URL = RAW[1]["url"]
+
+
+def test_pages_refetches_urls_lost_after_fetch(monkeypatch):
+    fetch_called = threading.Event()
+
+    def fetch_and_clean(results):
+        for result in results:
+            if result["url"] == BROKEN_URL and threading.current_thread().name == "speculative-fetch":
+                # The raw-query pump dies only after the planned fetch() has
+                # skipped the URLs it already claimed
+                fetch_called.wait(5)
+                raise RuntimeError("database is locked")
+            yield {"url": result["url"], "status": "success"}
+
+    monkeypatch.setattr(speculation, "search_web", lambda queries, n, use_cache: RAW)
+    monkeypatch.setattr(speculation, "iter_fetch_and_clean", fetch_and_clean)
+
+    spec = speculation.SpeculativeFetch("query")
+    spec.results()
+    spec.fetch(PLANNED)
+    fetch_called.set()
+
+    assert sorted(page["url"] for page in spec.pages()) == EVERY_URL
+
+
+def test_async_pages_refetches_urls_lost_after_fetch(monkeypatch):
+    pumps: list[asyncio.Task] = []
+
+    async def search(queries, n, use_cache):
+        return RAW
+
+    async def fetch_and_clean(results):
+        for result in results:
+            await asyncio.sleep(0.01)
+            if result["url"] == BROKEN_URL and asyncio.current_task() in pumps:
+                raise RuntimeError("database is locked")
+            yield {"url": result["url"], "status": "success"}
+
+    monkeypatch.setattr(speculation, "search_web_async", search)
+    monkeypatch.setattr(speculation, "iter_fetch_and_clean_async", fetch_and_clean)
+
+    async def scenario():
+        spec = speculation.AsyncSpeculativeFetch("query")
+        await spec.results()
+        spec.fetch(PLANNED)
+        pumps.extend(spec._tasks)
+        return sorted([page["url"] async for page in spec.pages()])
+
+    assert asyncio.run(scenario()) == EVERY_URL
+
+
+def test_pages_does_not_refetch_delivered_urls(monkeypatch):
+    calls = []
+
+    def fetch_and_clean(results):
+        calls.append(len(results))
+        for result in results:
+            yield {"url": result["url"], "status": "success"}
+
+    monkeypatch.setattr(speculation, "search_web", lambda queries, n, use_cache: RAW)
+    monkeypatch.setattr(speculation, "iter_fetch_and_clean", fetch_and_clean)
+
+    spec = speculation.SpeculativeFetch("query")
+    spec.results()
+    spec.fetch(PLANNED)
+
+    assert sorted(page["url"] for page in spec.pages()) == EVERY_URL
+    assert sorted(calls) == [1, 4]
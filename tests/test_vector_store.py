@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from src import cache_db, vector_store
+from src.vector_store import VectorStore
+
+DIM = 16
+
+
+def _chunks(n: int) -> list[dict]:
+    return [
+        {"text": f"chunk number {i} about topic {i % 5}", "url": f"https://site{i % 3}.example/{i}",
+         "title": f"Page {i % 3}", "chunk_id": f"c{i}", "page": i % 7}
+        for i in range(n)
+    ]
+
+
+def _embeddings(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def queries(monkeypatch, tmp_path):
+    """Query vectors served without a model; spill files go to a temp cache dir."""
+    monkeypatch.setattr(cache_db, "CACHE_DIR", str(tmp_path / "cache"))
+    q = vector_store._normalize(_embeddings(3, seed=1))
+    monkeypatch.setattr(vector_store, "encode_normalized", lambda texts: q[:len(texts)])
+    return ["q0", "q1", "q2"], q
+
+
+def _ranking(store: VectorStore, texts: list[str], k: int = 5) -> list[list[str]]:
+    return [[c["chunk_id"] for c in hits] for hits in store.search(texts, k, mode="dense")]
+
+
+def _brute_force(embeddings: np.ndarray, q: np.ndarray, k: int = 5) -> list[list[str]]:
+    scores = q @ vector_store._normalize(embeddings).T
+    return [[f"c{i}" for i in np.argsort(-row)[:k]] for row in scores]
+
+
+@pytest.mark.parametrize("dtype,rescore", [("float32", False), ("float16", False), ("int8", False), ("int8", True)])
+def test_dense_search_matches_brute_force(queries, dtype, rescore):
+    texts, q = queries
+    embeddings = _embeddings(200)
+    store = VectorStore(dtype=dtype, rescore=rescore)
+    store.add(_chunks(200), embeddings)
+
+    results = store.search(texts, 5, mode="dense")
+    exact = q @ vector_store._normalize(embeddings).T
+    for qi, hits in enumerate(results):
+        rows = [int(c["chunk_id"][1:]) for c in hits]
+        assert np.allclose([c["relevance_score"] for c in hits], exact[qi, rows], atol=0.02)
+    if dtype == "float32" or rescore:
+        assert _ranking(store, texts) == _brute_force(embeddings, q)
+
+
+@pytest.mark.parametrize("dtype,rescore", [("float16", False), ("int8", True)])
+def test_save_load_round_trip(queries, tmp_path, dtype, rescore):
+    texts, _ = queries
+    store = VectorStore(dtype=dtype, rescore=rescore)
+    keys = store.add(_chunks(120), _embeddings(120))
+    store.remove(keys[:10])
+    store.save(str(tmp_path / "store"))
+
+    loaded = VectorStore.load(str(tmp_path / "store"))
+
+    assert len(loaded) == len(store) == 110
+    assert np.array_equal(loaded.keys, store.keys)
+    assert loaded.chunks == store.chunks
+    assert _ranking(loaded, texts) == _ranking(store, texts)
+    # Keys keep counting from where the saved store stopped
+    assert loaded.add(_chunks(1), _embeddings(1, seed=2))[0] == 120
+
+
+def test_remove_keeps_other_keys_valid(queries):
+    texts, q = queries
+    embeddings = _embeddings(50)
+    store = VectorStore(dtype="float32")
+    keys = store.add(_chunks(50), embeddings)
+
+    best = _brute_force(embeddings, q, k=1)[0][0]
+    assert store.remove([keys[int(best[1:])]]) == 1
+    assert store.remove([keys[int(best[1:])]]) == 0
+
+    assert len(store) == 49
+    assert best not in _ranking(store, texts, k=49)[0]
+    assert [c["chunk_id"] for c in store.chunks] == [f"c{i}" for i in range(50) if f"c{i}" != best]
+
+
+def test_lexical_store_round_trip(queries, tmp_path):
+    store = VectorStore()
+    store.add([{"text": "vitamin d and bone health"}, {"text": "interest rates held steady"}])
+    store.save(str(tmp_path / "lexical"))
+    loaded = VectorStore.load(str(tmp_path / "lexical"))
+
+    for s in (store, loaded):
+        hits = s.search(["bone health"], 1, mode="dense")[0]
+        assert hits[0]["text"] == "vitamin d and bone health"
+
+
+def test_add_rejects_mixed_dense_and_lexical_rows(queries):
+    store = VectorStore()
+    store.add(_chunks(3), _embeddings(3))
+    with pytest.raises(ValueError):
+        store.add(_chunks(1))
+
+
+def test_ann_store_round_trip(queries, tmp_path):
+    texts, _ = queries
+    store = VectorStore(dtype="float32")
+    store.add(_chunks(400), _embeddings(400))
+    store.build_ann_index(nlist=8, m=4)
+    store.save(str(tmp_path / "ann"))
+
+    loaded = VectorStore.load(str(tmp_path / "ann"))
+
+    assert loaded.ann is not None and loaded.ann.ntotal == 400
+    assert _ranking(loaded, texts) == _ranking(store, texts)